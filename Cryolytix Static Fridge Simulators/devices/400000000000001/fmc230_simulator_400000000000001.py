@@ -2,16 +2,29 @@ import time
 import json
 import random
 import ssl
+import logging
+import os
+import sys
 import paho.mqtt.client as mqtt
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))  # shared fleetsim package
+from fleetsim import checkpoint, logs, metrics, profiling
+
 # MQTT Setup
 BROKER = "app.cryolytix.com"
 PORT = 8883
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9100"))  # Prometheus /metrics, 0 to disable
+PUBLISH_INTERVAL = 30  # seconds
+DEVICE_TYPE = "static_freezer"
+FREEZER_STATE = ("current_temp", "compressor_on", "current_humidity", "compressor_temp",
+                 "power_consumption", "compressor_start_time", "is_startup_surge", "now")  # checkpointed per freezer
+logger = logging.getLogger("static_freezer")
 
 # Certificate paths
-ca_cert_path = "../rootCA.pem"
-client_cert_path = "certs/400000000000001_chain.pem"
-client_key_path = "certs/400000000000001.key"
+DEVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+ca_cert_path = os.path.join(DEVICE_DIR, "..", "rootCA.pem")
+client_cert_path = os.path.join(DEVICE_DIR, "certs", "400000000000001_chain.pem")
+client_key_path = os.path.join(DEVICE_DIR, "certs", "400000000000001.key")
 
 # Fridge Definitions
 FRIDGES = [
@@ -52,7 +65,8 @@ class IceCreamFreezerSimulator:
         self.warming_rate = 0.08     # °C per 30s when compressor off
         self.temp_variation = 0.1    # Small random variations
 
-        # State tracking
+        # State tracking, timed on a simulated clock that moves 30 s per cycle
+        self.now = 0.0
         self.compressor_start_time = 0
         self.is_startup_surge = False
 
@@ -68,7 +82,7 @@ class IceCreamFreezerSimulator:
         if random.random() < 0.05:
             # Door opening causes humidity spike
             humidity_change += random.uniform(5.0, 15.0)
-            print(f"{time.strftime('%H:%M:%S')} - Door opened! Humidity spike")
+            logger.info("Door opened! Humidity spike")
 
         self.current_humidity += humidity_change
 
@@ -86,7 +100,7 @@ class IceCreamFreezerSimulator:
                 # Rapid heating during startup
                 temp_increase = self.compressor_heat_rate * 2
                 # End startup surge after 2 minutes
-                if time.time() - self.compressor_start_time > 120:
+                if self.now - self.compressor_start_time > 120:
                     self.is_startup_surge = False
             else:
                 temp_increase = self.compressor_heat_rate
@@ -132,7 +146,7 @@ class IceCreamFreezerSimulator:
             if self.current_temp <= self.min_temp:
                 self.current_temp = self.min_temp
                 self.compressor_on = False
-                print(f"{time.strftime('%H:%M:%S')} - Compressor OFF (reached min: {self.current_temp:.1f}°C)")
+                logger.info("Compressor OFF (reached min: %.1f°C)", self.current_temp)
 
         else:
             # Compressor is off - temperature increases
@@ -142,15 +156,16 @@ class IceCreamFreezerSimulator:
             if self.current_temp >= self.max_temp:
                 self.current_temp = self.max_temp
                 self.compressor_on = True
-                self.compressor_start_time = time.time()
+                self.compressor_start_time = self.now
                 self.is_startup_surge = True
-                print(f"{time.strftime('%H:%M:%S')} - Compressor ON (reached max: {self.current_temp:.1f}°C)")
+                logger.info("Compressor ON (reached max: %.1f°C)", self.current_temp)
 
         return self.current_temp
 
     def generate_sensor_readings(self):
         """Generate complete sensor readings package"""
         # Update all sensor values
+        self.now += PUBLISH_INTERVAL
         temperature = self.simulate_temperature_cycle()
         humidity = self.simulate_humidity()
         compressor_temp = self.simulate_compressor_temperature()
@@ -162,7 +177,7 @@ class IceCreamFreezerSimulator:
             "compressor_temperature": round(compressor_temp, 1),
             "power_consumption": round(power_usage, 1),
             "compressor_status": "ON" if self.compressor_on else "OFF",
-            "compressor_runtime": round((time.time() - self.compressor_start_time) / 60, 1) if self.compressor_on else 0
+            "compressor_runtime": round((self.now - self.compressor_start_time) / 60, 1) if self.compressor_on else 0
         }
 
 # Initialize freezer simulators for each fridge
@@ -173,12 +188,14 @@ for fridge in FRIDGES:
 # MQTT Callbacks
 def on_connect(client, userdata, flags, rc):
     if rc == 0:
-        print(f"Connected {userdata['imei']} to Cryolytix via MQTT and X.509 Auth!")
+        metrics.tracker(DEVICE_TYPE).connected(userdata["imei"])
+        logger.info("Connected %s to Cryolytix via MQTT and X.509 Auth!", userdata["imei"])
     else:
-        print(f"Connection failed for {userdata['imei']}: {rc}")
+        logger.error("Connection failed for %s: %s", userdata["imei"], rc)
 
 def on_publish(client, userdata, mid):
-    print(f"Message {mid} published for {userdata['imei']}!")
+    metrics.tracker(DEVICE_TYPE).acked(userdata["imei"], mid)
+    logger.info("Message %s published for %s!", mid, userdata["imei"], extra={"device": userdata["imei"]})
 
 def generate_packet(fridge):
     lat, lng = fridge["lat"], fridge["lng"]
@@ -232,61 +249,66 @@ def generate_packet(fridge):
     }
     return packet
 
-# Create clients per device
-clients = {}
-for fridge in FRIDGES:
-    # ✅ Fixed client_id syntax
-    client = mqtt.Client(client_id=fridge['imei'])
-    # ✅ Added user data for callbacks
-    client.user_data_set({"imei": fridge["imei"]})
-    client.on_connect = on_connect
-    client.on_publish = on_publish
-
-    # Configure TLS/SSL
-    client.tls_set(
-        ca_certs=ca_cert_path,
-        certfile=client_cert_path,
-        keyfile=client_key_path,
-        tls_version=ssl.PROTOCOL_TLSv1_2
-    )
-
-    client.connect(BROKER, PORT, 60)
-    client.loop_start()
-    clients[fridge["imei"]] = client
-
-# Main Loop
-try:
-    print("Starting enhanced freezer simulator with realistic temperature cycles...")
-    print("Monitoring: Chamber Temp, Humidity, Compressor Temp, Power Usage")
-    print("-" * 80)
-
-    while True:
-        for fridge in FRIDGES:
-            client = clients[fridge["imei"]]
-            topic = "v1/devices/me/telemetry"
-            packet = generate_packet(fridge)
-            payload = json.dumps(packet)
-            result = client.publish(topic, payload)
-            result.wait_for_publish()
-
-            # Enhanced status display
-            simulator = freezer_simulators[fridge["imei"]]
-            sensor_data = simulator.generate_sensor_readings()
-
-            status = (
-                f"{time.strftime('%H:%M:%S')} | "
-                f"Chamber: {sensor_data['chamber_temperature']:5.1f}°C | "
-                f"Humidity: {sensor_data['chamber_humidity']:5.1f}% | "
-                f"Compressor: {sensor_data['compressor_temperature']:5.1f}°C | "
-                f"Power: {sensor_data['power_consumption']:5.1f}W | "
-                f"Status: {sensor_data['compressor_status']}"
-            )
-            print(status)
-
-        time.sleep(30)
-
-except KeyboardInterrupt:
-    print("Simulator stopped by user")
-    for client in clients.values():
-        client.loop_stop()
-        client.disconnect()
\ No newline at end of file
+def main():
+    logs.setup_logging("static_freezer")
+    metrics.start_http_server(METRICS_PORT)
+    profiling.start_from_argv(DEVICE_TYPE)
+    checkpoint.resume(checkpoint.from_argv(), freezer_simulators, FREEZER_STATE)
+
+    # Create clients per device
+    clients = {}
+    for fridge in FRIDGES:
+        # ✅ Fixed client_id syntax
+        client = mqtt.Client(client_id=fridge['imei'])
+        # ✅ Added user data for callbacks
+        client.user_data_set({"imei": fridge["imei"]})
+        client.on_connect = on_connect
+        client.on_publish = on_publish
+
+        # Configure TLS/SSL
+        client.tls_set(
+            ca_certs=ca_cert_path,
+            certfile=client_cert_path,
+            keyfile=client_key_path,
+            tls_version=ssl.PROTOCOL_TLSv1_2
+        )
+
+        client.connect(BROKER, PORT, 60)
+        client.loop_start()
+        clients[fridge["imei"]] = client
+
+    # Main Loop
+    ticker = metrics.TickTimer(DEVICE_TYPE, PUBLISH_INTERVAL)
+    try:
+        logger.info("Starting enhanced freezer simulator with realistic temperature cycles...")
+        logger.info("Monitoring: Chamber Temp, Humidity, Compressor Temp, Power Usage")
+
+        while True:
+            for fridge in FRIDGES:
+                client = clients[fridge["imei"]]
+                topic = "v1/devices/me/telemetry"
+                packet = generate_packet(fridge)
+                payload = json.dumps(packet)
+                result = metrics.tracker(DEVICE_TYPE).publish(client, fridge["imei"], topic, payload)
+                result.wait_for_publish()
+
+                # Enhanced status display
+                simulator = freezer_simulators[fridge["imei"]]
+                sensor_data = simulator.generate_sensor_readings()
+                logger.info(
+                    "Chamber: %5.1f°C | Humidity: %5.1f%% | Compressor: %5.1f°C | Power: %5.1fW | Status: %s",
+                    sensor_data["chamber_temperature"], sensor_data["chamber_humidity"],
+                    sensor_data["compressor_temperature"], sensor_data["power_consumption"],
+                    sensor_data["compressor_status"], extra={"device": fridge["imei"]}
+                )
+
+            ticker.wait()
+
+    except KeyboardInterrupt:
+        logger.info("Simulator stopped by user")
+        for client in clients.values():
+            client.loop_stop()
+            client.disconnect()
+
+if __name__ == "__main__":
+    main()
@@ -3,16 +3,28 @@ import json
 import random
 import ssl
 import argparse
+import logging
+import os
 import sys
 import paho.mqtt.client as mqtt
 from enum import Enum
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))  # shared fleetsim package
+from fleetsim import checkpoint, logs, metrics, profiling
+
 # MQTT Setup
 BROKER = "demo.cryolytix.com"
 PORT = 8883
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9100"))  # Prometheus /metrics, 0 to disable
+PUBLISH_INTERVAL = 30  # seconds
+DEVICE_TYPE = "static_freezer"
+FREEZER_STATE = ("cycles_since_start", "normal_operation.current_temp", "normal_operation.compressor_on",
+                 "normal_operation.compressor_temp", "normal_operation.humidity")  # checkpointed per freezer
+logger = logging.getLogger("static_freezer")
 
 # Certificate paths
-ca_cert_path = "../rootCA.pem"
+DEVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+ca_cert_path = os.path.join(DEVICE_DIR, "..", "rootCA.pem")
 
 # Failure Scenarios Enum
 class FailureScenario(Enum):
@@ -360,19 +372,20 @@ def generate_packet(fridge_config, sensor_data):
 
 def on_connect(client, userdata, flags, rc):
     if rc == 0:
-        print(f"✅ Connected to {userdata['name']}")
-        print(f"   📍 Location: {userdata['city']}, {userdata['province']}")
-        print(f"   🔧 Scenario: {userdata['scenario'].value}")
-        print(f"   📡 IMEI: {userdata['imei']}")
+        metrics.tracker(DEVICE_TYPE).connected(userdata["imei"])
+        logger.info("✅ Connected to %s", userdata["name"])
+        logger.info("   📍 Location: %s, %s", userdata["city"], userdata["province"])
+        logger.info("   🔧 Scenario: %s", userdata["scenario"].value)
+        logger.info("   📡 IMEI: %s", userdata["imei"])
     else:
-        print(f"❌ Connection failed: {rc}")
+        logger.error("❌ Connection failed: %s", rc)
 
 def on_publish(client, userdata, mid):
-    pass
+    metrics.tracker(DEVICE_TYPE).acked(userdata["imei"], mid)
 
-def run_simulator(fridge_config):
-    print(f"\n🚀 Starting Individual Simulator")
-    print("=" * 60)
+def run_simulator(fridge_config, args=None):
+    logs.setup_logging("static_freezer")
+    logger.info("🚀 Starting Individual Simulator")
 
     # Create simulator
     simulator = IceCreamFreezerSimulator(fridge_config["scenario"])
@@ -384,8 +397,8 @@ def run_simulator(fridge_config):
     client.on_publish = on_publish
 
     # Configure TLS/SSL
-    client_cert_path = f"certs/{fridge_config['imei']}_chain.pem"
-    client_key_path = f"certs/{fridge_config['imei']}.key"
+    client_cert_path = os.path.join(DEVICE_DIR, "certs", f"{fridge_config['imei']}_chain.pem")
+    client_key_path = os.path.join(DEVICE_DIR, "certs", f"{fridge_config['imei']}.key")
 
     try:
         client.tls_set(
@@ -397,13 +410,18 @@ def run_simulator(fridge_config):
         client.connect(BROKER, PORT, 60)
         client.loop_start()
     except Exception as e:
-        print(f"❌ SSL/TLS Error: {e}")
-        print(f"   Make sure certificates exist in ./certs/ directory:")
-        print(f"   - {client_cert_path}")
-        print(f"   - {client_key_path}")
+        logger.error("❌ SSL/TLS Error: %s", e)
+        logger.error("   Make sure certificates exist in ./certs/ directory:")
+        logger.error("   - %s", client_cert_path)
+        logger.error("   - %s", client_key_path)
         return
 
     # Main loop
+    metrics.start_http_server(METRICS_PORT)
+    if args is not None:
+        profiling.start_from_args(DEVICE_TYPE, args)
+        checkpoint.resume(checkpoint.from_args(args), {fridge_config["imei"]: simulator}, FREEZER_STATE)
+    ticker = metrics.TickTimer(DEVICE_TYPE, PUBLISH_INTERVAL)
     try:
         cycle_count = 0
         while True:
@@ -413,26 +431,22 @@ def run_simulator(fridge_config):
             payload = json.dumps(packet)
 
             topic = "v1/devices/me/telemetry"
-            result = client.publish(topic, payload)
+            result = metrics.tracker(DEVICE_TYPE).publish(client, fridge_config["imei"], topic, payload)
             result.wait_for_publish()
 
             status_emoji = "✅" if sensor_data["efficiency"] in ["EXCELLENT", "GOOD"] else "⚠️" if sensor_data["efficiency"] == "FAIR" else "🚨"
 
-            status = (
-                f"{status_emoji} Cycle {cycle_count} | "
-                f"Temp: {sensor_data['chamber_temperature']:5.1f}°C | "
-                f"Hum: {sensor_data['chamber_humidity']:3.0f}% | "
-                f"Comp: {sensor_data['compressor_temperature']:4.0f}°C | "
-                f"Power: {sensor_data['power_consumption']:4.0f}W | "
-                f"Status: {sensor_data['compressor_status']:>3} | "
-                f"Eff: {sensor_data['efficiency']:>8}"
+            logger.info(
+                "%s Cycle %d | Temp: %5.1f°C | Hum: %3.0f%% | Comp: %4.0f°C | Power: %4.0fW | Status: %3s | Eff: %8s",
+                status_emoji, cycle_count, sensor_data["chamber_temperature"], sensor_data["chamber_humidity"],
+                sensor_data["compressor_temperature"], sensor_data["power_consumption"],
+                sensor_data["compressor_status"], sensor_data["efficiency"], extra={"device": fridge_config["imei"]}
             )
-            print(status)
 
-            time.sleep(30)
+            ticker.wait()
 
     except KeyboardInterrupt:
-        print(f"\n🛑 Stopping {fridge_config['name']}")
+        logger.info("🛑 Stopping %s", fridge_config["name"])
         client.loop_stop()
         client.disconnect()
 
@@ -448,6 +462,8 @@ def main():
     parser = argparse.ArgumentParser(description='Ice Cream Freezer Simulator')
     parser.add_argument('--profile', type=str, help='Location profile name')
     parser.add_argument('--list', action='store_true', help='List all available profiles')
+    profiling.add_arguments(parser, flag='--profile-run')  # --profile already selects the location profile
+    checkpoint.add_arguments(parser)
 
     args = parser.parse_args()
 
@@ -458,7 +474,7 @@ def main():
     if args.profile:
         if args.profile in LOCATION_PROFILES:
             fridge_config = LOCATION_PROFILES[args.profile]
-            run_simulator(fridge_config)
+            run_simulator(fridge_config, args)
         else:
             print(f"❌ Profile '{args.profile}' not found.")
             print("   Use --list to see available profiles.")
@@ -472,7 +488,7 @@ def main():
             profile_name = input("\nEnter profile name: ").strip()
             if profile_name in LOCATION_PROFILES:
                 fridge_config = LOCATION_PROFILES[profile_name]
-                run_simulator(fridge_config)
+                run_simulator(fridge_config, args)
             else:
                 print(f"❌ Profile '{profile_name}' not found.")
         except KeyboardInterrupt:
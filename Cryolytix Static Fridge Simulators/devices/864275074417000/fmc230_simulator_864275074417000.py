@@ -2,16 +2,27 @@ import time
 import json
 import random
 import ssl
+import logging
+import os
+import sys
 import paho.mqtt.client as mqtt
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))  # shared fleetsim package
+from fleetsim import logs, metrics, profiling
+
 # MQTT Setup
 BROKER = "app.cryolytix.com"
 PORT = 8883
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9100"))  # Prometheus /metrics, 0 to disable
+PUBLISH_INTERVAL = 30  # seconds
+DEVICE_TYPE = "static_freezer"
+logger = logging.getLogger("static_freezer")
 
 # Certificate paths
-ca_cert_path = "../rootCA.pem"
-client_cert_path = "certs/864275075764186_chain.pem"
-client_key_path = "certs/864275075764186.key"
+DEVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+ca_cert_path = os.path.join(DEVICE_DIR, "..", "rootCA.pem")
+client_cert_path = os.path.join(DEVICE_DIR, "certs", "864275075764186_chain.pem")
+client_key_path = os.path.join(DEVICE_DIR, "certs", "864275075764186.key")
 
 
 # Fridge Definitions
@@ -24,12 +35,14 @@ FRIDGES = [
 # MQTT Callbacks
 def on_connect(client, userdata, flags, rc):
     if rc == 0:
-        print(f"Connected {userdata['imei']} to Cryolytix via MQTT and X.509 Auth!")
+        metrics.tracker(DEVICE_TYPE).connected(userdata["imei"])
+        logger.info("Connected %s to Cryolytix via MQTT and X.509 Auth!", userdata["imei"])
     else:
-        print(f"Connection failed for {userdata['imei']}: {rc}")
+        logger.error("Connection failed for %s: %s", userdata["imei"], rc)
 
 def on_publish(client, userdata, mid):
-    print(f"Message {mid} published for {userdata['imei']}!")
+    metrics.tracker(DEVICE_TYPE).acked(userdata["imei"], mid)
+    logger.info("Message %s published for %s!", mid, userdata["imei"], extra={"device": userdata["imei"]})
 
 
 
@@ -67,42 +80,51 @@ def generate_packet(fridge):
     }
     return packet
 
-# Create clients per device
-clients = {}
-for fridge in FRIDGES:
-    # ✅ Fixed client_id syntax
-    client = mqtt.Client(client_id=fridge['imei'])
-    # ✅ Added user data for callbacks
-    client.user_data_set({"imei": fridge["imei"]})
-    client.on_connect = on_connect
-    client.on_publish = on_publish
-
-    # Configure TLS/SSL
-    client.tls_set(
-        ca_certs=ca_cert_path,
-        certfile=client_cert_path,
-        keyfile=client_key_path,
-        tls_version=ssl.PROTOCOL_TLSv1_2
-    )
-
-    client.connect(BROKER, PORT, 60)
-    client.loop_start()
-    clients[fridge["imei"]] = client
-
-# Main Loop
-try:
-    while True:
-        for fridge in FRIDGES:
-            client = clients[fridge["imei"]]
-            topic = "v1/devices/me/telemetry"
-            packet = generate_packet(fridge)
-            payload = json.dumps(packet)
-            result = client.publish(topic, payload)
-            result.wait_for_publish()
-            print(f"Published to {topic}: {payload[:100]}...")
-        time.sleep(30)
-except KeyboardInterrupt:
-    print("Simulator stopped by user")
-    for client in clients.values():
-        client.loop_stop()
-        client.disconnect()
\ No newline at end of file
+def main():
+    logs.setup_logging("static_freezer")
+    metrics.start_http_server(METRICS_PORT)
+    profiling.start_from_argv(DEVICE_TYPE)
+
+    # Create clients per device
+    clients = {}
+    for fridge in FRIDGES:
+        # ✅ Fixed client_id syntax
+        client = mqtt.Client(client_id=fridge['imei'])
+        # ✅ Added user data for callbacks
+        client.user_data_set({"imei": fridge["imei"]})
+        client.on_connect = on_connect
+        client.on_publish = on_publish
+
+        # Configure TLS/SSL
+        client.tls_set(
+            ca_certs=ca_cert_path,
+            certfile=client_cert_path,
+            keyfile=client_key_path,
+            tls_version=ssl.PROTOCOL_TLSv1_2
+        )
+
+        client.connect(BROKER, PORT, 60)
+        client.loop_start()
+        clients[fridge["imei"]] = client
+
+    # Main Loop
+    ticker = metrics.TickTimer(DEVICE_TYPE, PUBLISH_INTERVAL)
+    try:
+        while True:
+            for fridge in FRIDGES:
+                client = clients[fridge["imei"]]
+                topic = "v1/devices/me/telemetry"
+                packet = generate_packet(fridge)
+                payload = json.dumps(packet)
+                result = metrics.tracker(DEVICE_TYPE).publish(client, fridge["imei"], topic, payload)
+                result.wait_for_publish()
+                logger.info("Published to %s: %.100s...", topic, payload, extra={"device": fridge["imei"]})
+            ticker.wait()
+    except KeyboardInterrupt:
+        logger.info("Simulator stopped by user")
+        for client in clients.values():
+            client.loop_stop()
+            client.disconnect()
+
+if __name__ == "__main__":
+    main()
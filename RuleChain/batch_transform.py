@@ -0,0 +1,221 @@
+import argparse
+import json
+import math
+import os
+import re
+import time
+
+import numpy as np
+
+# Batch version of the rule chain (flatten_packet.js -> rename_telemetry.js -> convert_units.js).
+# Packets are pivoted into one column per IO ID and every rename / unit conversion is applied
+# to whole columns at once instead of walking each message dict.
+
+RULECHAIN_DIR = os.path.dirname(os.path.abspath(__file__))
+RENAME_SCRIPT = os.path.join(RULECHAIN_DIR, "rename_telemetry.js")
+MAPPING_PATTERN = re.compile(r'"([^"]+)"\s*:\s*"([^"]+)"')
+
+# Same conversions as convert_units.js: telemetry name -> (divisor, sentinel kept as-is)
+CONVERSIONS = {
+    "eye_temp": (100, None),  # m°C to °C
+    "eye_temp_2": (100, None),
+    "eye_temp_3": (100, None),
+    "eye_temp_4": (100, None),
+    "ble_temp_1": (100, 32767),  # m°C to °C, skip inactive
+    "ble_temp_2": (100, 32767),
+    "ble_temp_3": (100, 32767),
+    "ble_temp_4": (100, 32767),
+    "external_voltage": (1000, None),  # mV to V
+    "battery_voltage": (1000, None),  # mV to V
+    "battery_current": (1000, None),  # mA to A
+    "eye_battery_voltage": (1000, None),  # mV to V
+    "eye_battery_voltage_2": (1000, None),
+    "eye_battery_voltage_3": (1000, None),
+    "eye_battery_voltage_4": (1000, None),
+}
+
+
+def load_renames(path=RENAME_SCRIPT):
+    """Read the IO ID -> telemetry name table straight from rename_telemetry.js"""
+    with open(path, "r", encoding="utf-8") as f:
+        source = f.read()
+    block = source[source.index("var mappings"):]
+    block = block[:block.index("};")]
+    return dict(MAPPING_PATTERN.findall(block))
+
+
+RENAMES = load_renames()
+
+
+def read_packets(path):
+    """Read a JSON file holding one packet, a list of packets, JSON lines or concatenated packets"""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    decoder = json.JSONDecoder()
+    packets = []
+    pos = 0
+    while True:
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+        if pos >= len(text):
+            break
+        obj, pos = decoder.raw_decode(text, pos)
+        packets.extend(obj if isinstance(obj, list) else [obj])
+    return packets
+
+
+# Column building
+def to_column(values):
+    column = np.array(values)
+    if column.dtype.kind == "U":
+        return np.array(values, dtype=object)
+    if column.dtype != object:
+        return column
+    present = np.array([v for v in values if v is not None])
+    if present.dtype.kind not in "iuf":
+        return column
+    return np.array(values, dtype=np.float64)  # missing values become NaN
+
+
+def load_columns(packets):
+    """Pivot the state.reported record of every packet into one array per IO ID"""
+    rows = len(packets)
+    # Packets from the same device profile share a key layout, so group them by layout and
+    # transpose each group in one go instead of looking up every key of every record
+    layouts = {}
+    for row, packet in enumerate(packets):
+        state = packet.get("state")
+        record = state["reported"] if state and state.get("reported") else packet
+        layout = layouts.get(tuple(record))
+        if layout is None:
+            layout = layouts[tuple(record)] = ([], [])
+        layout[0].append(row)
+        layout[1].append(record.values())
+
+    pieces = {}
+    for keys, (layout_rows, values) in layouts.items():
+        index = np.array(layout_rows)
+        for key, column in zip(keys, zip(*values)):
+            pieces.setdefault(key, []).append((index, to_column(column)))
+
+    columns = {}
+    for key, parts in pieces.items():
+        if len(parts) == 1 and len(parts[0][0]) == rows:
+            columns[key] = parts[0][1]
+            continue
+        if all(part.dtype.kind in "iuf" for _, part in parts):
+            column = np.full(rows, np.nan)
+        else:
+            column = np.full(rows, None, dtype=object)
+        for index, part in parts:
+            column[index] = part
+        columns[key] = column
+    return columns
+
+
+# Rule chain steps
+def rename_columns(columns):
+    return {RENAMES.get(key, key): column for key, column in columns.items()}
+
+
+def convert_columns(columns):
+    for name, (divisor, sentinel) in CONVERSIONS.items():
+        column = columns.get(name)
+        if column is None or column.dtype == object:
+            continue
+        converted = column / divisor
+        if sentinel is not None:
+            converted = np.where(column == sentinel, column, converted)
+        columns[name] = converted
+
+    location = columns.get("location")
+    if location is not None:
+        text = np.where(np.equal(location, None), "nan,nan", location).astype(str)
+        parts = np.char.partition(text, ",")
+        columns["latitude"] = parts[:, 0].astype(np.float64)
+        columns["longitude"] = parts[:, 2].astype(np.float64)
+    return columns
+
+
+def transform_batch(packets):
+    """Flatten, rename and convert a whole batch of packets, returning columns"""
+    return convert_columns(rename_columns(load_columns(packets)))
+
+
+def columns_to_json(columns):
+    """Columnar output with missing values as null"""
+    output = {}
+    for name, column in columns.items():
+        values = column.tolist()
+        if column.dtype.kind == "f":
+            values = [None if math.isnan(v) else v for v in values]
+        output[name] = values
+    return output
+
+
+# Per-message reference (what the three JS scripts do for one message)
+def transform_packet(packet):
+    state = packet.get("state")
+    data = state["reported"] if state and state.get("reported") else packet
+    renamed = {RENAMES.get(key, key): value for key, value in data.items()}
+    converted = {}
+    for key, value in renamed.items():
+        conversion = CONVERSIONS.get(key)
+        if conversion and value != conversion[1]:
+            value = value / conversion[0]
+        converted[key] = value
+    lat, lng = converted["location"].split(",")[:2]
+    converted["latitude"] = float(lat)
+    converted["longitude"] = float(lng)
+    return converted
+
+
+def compare(packets):
+    start = time.perf_counter()
+    expected = [transform_packet(packet) for packet in packets]
+    per_message = time.perf_counter() - start
+
+    start = time.perf_counter()
+    columns = transform_batch(packets)
+    batch = time.perf_counter() - start
+
+    output = columns_to_json(columns)
+    mismatches = 0
+    for row, record in enumerate(expected):
+        for key, value in record.items():
+            if output[key][row] != value and not (isinstance(value, float) and abs(output[key][row] - value) < 1e-9):
+                mismatches += 1
+    print(f"Rows: {len(packets)} | Columns: {len(columns)}")
+    print(f"Per-message: {per_message * 1000:.1f} ms | Batch: {batch * 1000:.1f} ms | Speedup: {per_message / batch:.1f}x")
+    print(f"Mismatched values: {mismatches}")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar batch version of the RuleChain telemetry scripts")
+    parser.add_argument("inputs", nargs="+", help="JSON / JSON lines files with state.reported packets")
+    parser.add_argument("-o", "--output", help="Write the columnar result to this JSON file")
+    parser.add_argument("--repeat", type=int, default=1, help="Repeat the input packets to build a larger batch")
+    parser.add_argument("--compare", action="store_true", help="Check against the per-message transform and time both")
+    args = parser.parse_args()
+
+    packets = []
+    for path in args.inputs:
+        packets.extend(read_packets(path))
+    packets = packets * args.repeat
+
+    if args.compare:
+        raise SystemExit(1 if compare(packets) else 0)
+
+    columns = transform_batch(packets)
+    result = {"rows": len(packets), "columns": columns_to_json(columns)}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False)
+        print(f"Wrote {len(columns)} columns x {len(packets)} rows to {args.output}")
+    else:
+        print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
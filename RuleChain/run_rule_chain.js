@@ -0,0 +1,171 @@
+// Runs the RuleChain transformation scripts locally the way ThingsBoard calls them:
+// each script body becomes function(msg, metadata, msgType) and must return {msg, metadata, msgType}.
+// Packets are streamed through the scripts in script_order.txt order and per-script latency is reported.
+//
+// Usage:
+//   node run_rule_chain.js ../sample_packet.json ../sample_event_packets.json --repeat 10000
+//   python3 ../fmc230_simulator.py --dump 1000 | node run_rule_chain.js -
+//
+// Options:
+//   --repeat N      run the input packets N times (default 1)
+//   --warmup N      untimed passes over the first packets before measuring (default 1000)
+//   --out FILE      write the final messages as JSON lines
+//   --scripts a,b   run these scripts instead of script_order.txt
+
+var fs = require("fs");
+var path = require("path");
+var readline = require("readline");
+var vm = require("vm");
+
+var RULECHAIN_DIR = __dirname;
+
+function parseArgs(argv) {
+    var args = {inputs: [], repeat: 1, warmup: 1000, out: null, scripts: null};
+    for (var i = 0; i < argv.length; i++) {
+        var arg = argv[i];
+        if (arg === "--repeat") args.repeat = parseInt(argv[++i], 10);
+        else if (arg === "--warmup") args.warmup = parseInt(argv[++i], 10);
+        else if (arg === "--out") args.out = argv[++i];
+        else if (arg === "--scripts") args.scripts = argv[++i].split(",");
+        else args.inputs.push(arg);
+    }
+    return args;
+}
+
+// script_order.txt lists "1.flatten_packet.js", "2.rename_telemetry", ...
+function scriptOrder() {
+    return fs.readFileSync(path.join(RULECHAIN_DIR, "script_order.txt"), "utf8")
+        .split(/\r?\n/)
+        .map(function(line) { return line.trim().replace(/^\d+\./, ""); })
+        .filter(function(line) { return line.length > 0; })
+        .map(function(name) { return name.endsWith(".js") ? name : name + ".js"; });
+}
+
+// Each script gets its own context so globals can't leak between nodes, like separate rule nodes
+function loadScript(name) {
+    var source = fs.readFileSync(path.resolve(RULECHAIN_DIR, name), "utf8");
+    var wrapped = "(function(msg, metadata, msgType) {\n" + source + "\n})";
+    return {name: path.basename(name), fn: new vm.Script(wrapped, {filename: name}).runInNewContext({})};
+}
+
+// Split a file holding one packet, an array, JSON lines or pretty-printed packets back to back
+function splitPackets(text) {
+    var packets = [];
+    var depth = 0, start = -1, inString = false, escaped = false;
+    for (var i = 0; i < text.length; i++) {
+        var ch = text[i];
+        if (inString) {
+            if (escaped) escaped = false;
+            else if (ch === "\\") escaped = true;
+            else if (ch === "\"") inString = false;
+            continue;
+        }
+        if (ch === "\"") inString = true;
+        else if (ch === "{" || ch === "[") {
+            if (depth === 0) start = i;
+            depth++;
+        } else if (ch === "}" || ch === "]") {
+            depth--;
+            if (depth === 0) {
+                var value = text.slice(start, i + 1);
+                if (ch === "]") {
+                    JSON.parse(value).forEach(function(p) { packets.push(JSON.stringify(p)); });
+                } else {
+                    packets.push(value);
+                }
+            }
+        }
+    }
+    return packets;
+}
+
+function newStats(name) {
+    return {name: name, samples: [], totalNs: 0n, errors: 0};
+}
+
+function runChain(chain, stats, payload, timed) {
+    // ThingsBoard hands each script a freshly parsed message
+    var result = {msg: JSON.parse(payload), metadata: {deviceType: "FMC230"}, msgType: "POST_TELEMETRY_REQUEST"};
+    for (var i = 0; i < chain.length; i++) {
+        var start = process.hrtime.bigint();
+        try {
+            result = chain[i].fn(result.msg, result.metadata, result.msgType);
+        } catch (e) {
+            if (timed) stats[i].errors++;
+            return null;
+        }
+        if (timed) {
+            var elapsed = process.hrtime.bigint() - start;
+            stats[i].totalNs += elapsed;
+            stats[i].samples.push(Number(elapsed));
+        }
+    }
+    return result;
+}
+
+function percentile(sorted, p) {
+    if (sorted.length === 0) return 0;
+    return sorted[Math.min(sorted.length - 1, Math.floor(sorted.length * p))];
+}
+
+function report(stats, count, wallNs) {
+    var header = ["script", "calls", "errors", "msg/s", "p50 us", "p90 us", "p99 us", "max us"];
+    var rows = stats.map(function(s) {
+        var sorted = Float64Array.from(s.samples).sort();
+        var seconds = Number(s.totalNs) / 1e9;
+        return [s.name, String(s.samples.length), String(s.errors),
+            (seconds > 0 ? s.samples.length / seconds : 0).toFixed(0),
+            (percentile(sorted, 0.5) / 1000).toFixed(2), (percentile(sorted, 0.9) / 1000).toFixed(2),
+            (percentile(sorted, 0.99) / 1000).toFixed(2), (sorted.length ? sorted[sorted.length - 1] / 1000 : 0).toFixed(2)];
+    });
+    var widths = header.map(function(h, i) {
+        return Math.max.apply(null, [h.length].concat(rows.map(function(r) { return r[i].length; })));
+    });
+    var line = function(cols) { return cols.map(function(c, i) { return i === 0 ? c.padEnd(widths[i]) : c.padStart(widths[i]); }).join("  "); };
+    console.log(line(header));
+    rows.forEach(function(r) { console.log(line(r)); });
+    console.log("Chain: " + count + " packets in " + (Number(wallNs) / 1e6).toFixed(1) + " ms (" +
+        (count / (Number(wallNs) / 1e9)).toFixed(0) + " msg/s end to end)");
+}
+
+function main() {
+    var args = parseArgs(process.argv.slice(2));
+    var chain = (args.scripts || scriptOrder()).map(loadScript);
+    var stats = chain.map(function(s) { return newStats(s.name); });
+    var out = args.out ? fs.createWriteStream(args.out) : null;
+    var count = 0;
+    var warmed = 0;
+    var startNs = null;
+
+    function process_(payload) {
+        if (warmed < args.warmup) {
+            runChain(chain, stats, payload, false);
+            warmed++;
+        }
+        if (startNs === null) startNs = process.hrtime.bigint();
+        var result = runChain(chain, stats, payload, true);
+        count++;
+        if (out && result) out.write(JSON.stringify(result.msg) + "\n");
+    }
+
+    function finish() {
+        report(stats, count, startNs === null ? 0n : process.hrtime.bigint() - startNs);
+        if (out) out.end();
+    }
+
+    var files = args.inputs.filter(function(i) { return i !== "-"; });
+    var packets = [];
+    files.forEach(function(f) { packets = packets.concat(splitPackets(fs.readFileSync(f, "utf8"))); });
+    for (var r = 0; r < args.repeat; r++) packets.forEach(process_);
+
+    if (args.inputs.indexOf("-") === -1) {
+        finish();
+        return;
+    }
+    // Stream JSON lines from a running simulator
+    var rl = readline.createInterface({input: process.stdin});
+    rl.on("line", function(line) { if (line.trim()) process_(line); });
+    rl.on("close", finish);
+}
+
+main();
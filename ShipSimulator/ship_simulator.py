@@ -2,35 +2,28 @@ import time
 import json
 import random
 import paho.mqtt.client as mqtt
-from math import sin, cos, radians, sqrt, atan2
 import logging
 import threading
-import searoute as sr
+import os
+import sys
 
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))  # shared fleetsim package
+from fleetsim import checkpoint, geodesy, geofence, logs, metrics, profiling
 
-# Helper Functions
-def haversine(lat1, lon1, lat2, lon2):
-    dlat = radians(lat2 - lat1)
-    dlon = radians(lon2 - lon1)
-    a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1-a))
-    return EARTH_RADIUS * c
-
-def interpolate_position(start_lat, start_lng, end_lat, end_lng, fraction):
-    lat = start_lat + (end_lat - start_lat) * fraction
-    lng = start_lng + (end_lng - start_lng) * fraction
-    return lat, lng
+logger = logging.getLogger("ship_simulator")
 
 # MQTT Setup
 BROKER = "localhost"
 PORT = 1883
 TOPIC = "teltonika/{}/from"
 KNOTS_TO_KMH = 1.852
-EARTH_RADIUS = 6371  # km
 HARBOR_SPEED_KNOTS = 5  # Safe harbor speed
 MIN_STEP = 0.0001  # Very small minimum step for finer control
+PORT_RADIUS_KM = 1.0  # port geofence, about the 0.01 degrees the arrival check used to allow
+PUBLISH_INTERVAL = 10  # seconds
+DEVICE_TYPE = "ship"
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9100"))  # Prometheus /metrics, 0 to disable
+SHIP_STATE = ("position", "current_segment", "port_idx", "at_port", "docking", "docking_time", "first_start", "total_distance")
 
 # Ships with Sizes and Speeds
 SHIPS = [
@@ -49,45 +42,88 @@ SHIPS = [
 ]
 
 # Generate Routes
-for ship in SHIPS:
-    routes = []
-    port_routes = []
-    total_distance = 0
-    for i in range(len(ship["ports"])):
-        start = ship["ports"][i]
-        end = ship["ports"][(i + 1) % len(ship["ports"])]
-        route = sr.searoute([start[1], start[0]], [end[1], end[0]])
-        coords = [(coord[1], coord[0]) for coord in route.geometry["coordinates"]]
-        # Ensure at least start and end points
-        if len(coords) < 2:
-            coords = [start, end]
-        # Thin points dynamically, ensure at least 2 points
-        step = max(1, min(int(15 / (ship["speed_knots"] / 15)), len(coords) // 2))
-        thinned = [coords[j] for j in range(0, len(coords), step)]
-        if len(thinned) < 2:
-            thinned = [coords[0], coords[-1]]
-        port_routes.append(thinned)
-        routes.extend(thinned[:-1])
-        # Calculate segment distance for total route
-        if len(thinned) > 1:
-            for j in range(len(thinned) - 1):
-                total_distance += haversine(thinned[j][0], thinned[j][1], thinned[j + 1][0], thinned[j + 1][1])
+def generate_routes(ships):
+    """Build each ship's sea route between its ports; searoute is only imported when ships run"""
+    import searoute as sr
+
+    for ship in ships:
+        port_routes = []
+        total_distance = 0
+        for i in range(len(ship["ports"])):
+            start = ship["ports"][i]
+            end = ship["ports"][(i + 1) % len(ship["ports"])]
+            route = sr.searoute([start[1], start[0]], [end[1], end[0]])
+            coords = [(coord[1], coord[0]) for coord in route.geometry["coordinates"]]
+            # Ensure at least start and end points
+            if len(coords) < 2:
+                coords = [start, end]
+            # Thin points dynamically, ensure at least 2 points
+            step = max(1, min(int(15 / (ship["speed_knots"] / 15)), len(coords) // 2))
+            thinned = [coords[j] for j in range(0, len(coords), step)]
+            if len(thinned) < 2:
+                thinned = [coords[0], coords[-1]]
+            port_routes.append(thinned)
+            total_distance += geodesy.path_length(thinned)  # Segment distances for total route
+        ship["route"] = join_route(ship, port_routes)
+        ship["port_routes"] = port_routes
+        ship["total_distance"] = total_distance  # Store total route distance in km
+        ship["position"] = 0
+        ship["current_segment"] = 0
+        logger.info(f"Generated route for {ship['name']} with {len(ship['route'])} points, total distance {total_distance:.1f} km")
+
+def join_route(ship, port_routes):
+    routes = [point for thinned in port_routes for point in thinned[:-1]]
     # Only append if routes is non-empty
     if routes:
         routes.append(routes[0])  # Loop back
     else:
         routes = [ship["ports"][0]]
-    ship["route"] = routes
-    ship["port_routes"] = port_routes
-    ship["total_distance"] = total_distance  # Store total route distance in km
-    ship["position"] = 0
-    ship["current_segment"] = 0
-    logger.info(f"Generated route for {ship['name']} with {len(routes)} points, total distance {total_distance:.1f} km")
+    return routes
+
+# Checkpoints: ship state plus the generated routes, so a restart skips searoute
+def ship_snapshot(ships):
+    arrays = checkpoint.columns({ship["imei"]: ship for ship in ships}, SHIP_STATE)
+    arrays["ports"], arrays["port_counts"] = checkpoint.pack_routes([ship["ports"] for ship in ships])
+    arrays["legs"], arrays["leg_points"] = checkpoint.pack_routes([leg for ship in ships for leg in ship["port_routes"]])
+    return arrays
+
+def restore_ships(ships, arrays):
+    """Restore routes and state saved for exactly these ships and ports; False if they need generating"""
+    if arrays is None or "legs" not in arrays or arrays["key"].tolist() != [ship["imei"] for ship in ships]:
+        return False
+    saved_ports = checkpoint.unpack_routes(arrays["ports"], arrays["port_counts"])
+    if saved_ports != [[tuple(port) for port in ship["ports"]] for ship in ships]:
+        return False
+    legs = iter(checkpoint.unpack_routes(arrays["legs"], arrays["leg_points"]))
+    for ship in ships:
+        ship["port_routes"] = [next(legs) for _ in ship["ports"]]
+        ship["route"] = join_route(ship, ship["port_routes"])
+    checkpoint.restore({ship["imei"]: ship for ship in ships}, arrays, SHIP_STATE)
+    return True
+
+# Port geofences
+def port_id(port):
+    return f"{port[0]:.4f},{port[1]:.4f}"
+
+def port_geofences(ships):
+    """A geofence tracker over the ports of all ships, with one unit per ship"""
+    sites = [{"id": port_id(port), "kind": "port", "lat": port[0], "lng": port[1], "radius_km": PORT_RADIUS_KM}
+             for ship in ships for port in ship["ports"]]
+    return geofence.GeofenceTracker(geofence.GeofenceIndex(sites), [ship["imei"] for ship in ships])
+
+def publish_port_events(ship, client, crossed, point):
+    """Geozone events for every port the ship entered or left, its own or one it passes"""
+    for _, site, entered, dwell in crossed:
+        geofence.record(DEVICE_TYPE, site, entered, dwell)
+        reported = {"latlng": f"{point[0]},{point[1]}", "alt": 5, "sp": HARBOR_SPEED_KNOTS * KNOTS_TO_KMH if ship["docking"] else ship["speed_knots"] * KNOTS_TO_KMH}
+        packet = geofence.event_packet(reported, site, entered)
+        metrics.tracker(DEVICE_TYPE).publish(client, ship["imei"], TOPIC.format(ship["imei"]), json.dumps(packet))
 
 # MQTT Callbacks
 def on_connect(client, userdata, flags, rc, properties=None):
     if rc == 0:
         logger.info(f"Connected {userdata['imei']} to MQTT Broker")
+        metrics.tracker(DEVICE_TYPE).connected(userdata["imei"])
         client.subscribe(TOPIC.format(userdata["imei"]))
     else:
         logger.error(f"Connection failed for {userdata['imei']}: {rc}")
@@ -103,11 +139,15 @@ def on_disconnect(client, userdata, rc):
             time.sleep(5)
 
 def on_publish(client, userdata, mid):
+    metrics.tracker(DEVICE_TYPE).acked(userdata["imei"], mid)
     logger.debug(f"Message {mid} published for {userdata['imei']}")
 
-def simulate_ship(ship, client):
+def simulate_ship(ship, client, geofences=None):
     route = ship["route"]
     total_points = len(route) - 1
+    geofences = geofences or port_geofences([ship])
+    row = geofences.units.index(ship["imei"])
+    ticker = metrics.TickTimer(DEVICE_TYPE, PUBLISH_INTERVAL)
     while True:
         try:
             pos = int(ship["position"])
@@ -122,10 +162,11 @@ def simulate_ship(ship, client):
             segment_pos = pos % len(current_route)
             start = current_route[segment_pos]
             end = current_route[segment_pos + 1] if segment_pos + 1 < len(current_route) else current_route[-1]
-            distance = haversine(start[0], start[1], end[0], end[1])
-
             target_port = ship["ports"][(ship["port_idx"] + 1) % len(ship["ports"])]
-            at_port = abs(start[0] - target_port[0]) < 0.01 and abs(start[1] - target_port[1]) < 0.01
+            crossed = geofences.update_one(row, start[0], start[1])
+            if crossed:
+                publish_port_events(ship, client, crossed, start)
+            at_port = any(site["id"] == port_id(target_port) for site in geofences.sites_of(row))
             ship["at_port"] = at_port
 
             if at_port:
@@ -152,14 +193,14 @@ def simulate_ship(ship, client):
                 if random.random() < 0.05:
                     detour_pos = min(segment_pos + random.randint(5, 20), len(current_route) - 1)
                     end = current_route[detour_pos]
-                    distance = haversine(start[0], start[1], end[0], end[1])
 
             # Calculate realistic progress (0.1% of total distance per hour, scaled to 10s)
             hours_per_cycle = 10 / 3600  # 10 seconds = 1/360th of an hour
             distance_per_hour = speed  # km/h
             total_progress_per_hour = distance_per_hour / ship["total_distance"] * 0.1  # 0.1% of total route per hour
             fraction = min(max(total_progress_per_hour * hours_per_cycle, MIN_STEP), 1)
-            lat, lng = interpolate_position(start[0], start[1], end[0], end[1], fraction)
+            lat, lng = geodesy.scalar_slerp(start[0], start[1], end[0], end[1], fraction)
+            heading = int(round(geodesy.scalar_initial_bearing(start[0], start[1], end[0], end[1]))) % 360
             ship["position"] += fraction if fraction < 1 else 1
 
             # Force progress if stuck, but small increment
@@ -177,7 +218,7 @@ def simulate_ship(ship, client):
                         "pr": 1 if door_opens > 0 else 0,
                         "latlng": f"{lat},{lng}",
                         "alt": 5,
-                        "ang": random.randint(0, 360),
+                        "ang": heading,
                         "sp": speed,
                         "sat": random.randint(3, 15),
                         "evt": 0,
@@ -227,31 +268,47 @@ def simulate_ship(ship, client):
                     }
                 }
             }
-            client.publish(TOPIC.format(ship["imei"]), json.dumps(packet))
-            time.sleep(10)
+            metrics.tracker(DEVICE_TYPE).publish(client, ship["imei"], TOPIC.format(ship["imei"]), json.dumps(packet))
+            ticker.wait()
         except Exception as e:
             logger.error(f"Error in {ship['imei']}: {e}")
             time.sleep(10)
 
-# Setup Clients
-clients = {}
-for ship in SHIPS:
-    client = mqtt.Client(client_id=f"fmc230_{ship['imei']}")
-    client.user_data_set({"imei": ship["imei"]})
-    client.on_connect = on_connect
-    client.on_disconnect = on_disconnect
-    client.on_publish = on_publish
-    client.username_pw_set(username=ship["token"])
+def main():
+    logs.setup_logging("ship_simulator")
+    profiling.start_from_argv("ship_simulator")
+    checkpointer = checkpoint.from_argv()
+    if checkpointer and restore_ships(SHIPS, checkpointer.load()):
+        logger.info(f"Resumed {len(SHIPS)} ships and their routes from {checkpointer.path}")
+    else:
+        generate_routes(SHIPS)
+    if checkpointer:
+        checkpointer.start(lambda: ship_snapshot(SHIPS))
+
+    # Setup Clients
+    metrics.start_http_server(METRICS_PORT)
+    clients = {}
+    geofences = port_geofences(SHIPS)
+    for ship in SHIPS:
+        client = mqtt.Client(client_id=f"fmc230_{ship['imei']}")
+        client.user_data_set({"imei": ship["imei"]})
+        client.on_connect = on_connect
+        client.on_disconnect = on_disconnect
+        client.on_publish = on_publish
+        client.username_pw_set(username=ship["token"])
+        while True:
+            try:
+                client.connect(BROKER, PORT, 60)
+                client.loop_start()
+                break
+            except Exception as e:
+                logger.error(f"Initial connect failed for {ship['imei']}: {e}")
+                time.sleep(5)
+        clients[ship["imei"]] = client
+        threading.Thread(target=simulate_ship, args=(ship, client, geofences), daemon=True).start()
+
     while True:
-        try:
-            client.connect(BROKER, PORT, 60)
-            client.loop_start()
-            break
-        except Exception as e:
-            logger.error(f"Initial connect failed for {ship['imei']}: {e}")
-            time.sleep(5)
-    clients[ship["imei"]] = client
-    threading.Thread(target=simulate_ship, args=(ship, client), daemon=True).start()
+        time.sleep(60)
 
-while True:
-    time.sleep(60)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -3,11 +3,21 @@ import time
 import json
 import random
 import paho.mqtt.client as mqtt
+import logging
+import os
+import sys
 from threading import Thread
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))  # shared fleetsim package
+from fleetsim import checkpoint, geodesy, logs, metrics, profiling
+
 BROKER = "localhost"
 PORT = 1883
 PUBLISH_INTERVAL = 10  # seconds
+DEVICE_TYPE = "ship"
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9100"))  # Prometheus /metrics, 0 to disable
+SHIP_STATE = ("segment", "progress")  # checkpointed per ship
+logger = logging.getLogger("ship_simulator2")
 
 # Define ships with dummy but logical routes
 SHIPS = [
@@ -43,28 +53,24 @@ SHIPS = [
     }
 ]
 
-def haversine(lat1, lon1, lat2, lon2):
-    from math import radians, sin, cos, sqrt, atan2
-    R = 6371  # km
-    dlat = radians(lat2 - lat1)
-    dlon = radians(lon2 - lon1)
-    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
-    c = 2 * atan2(sqrt(a), sqrt(1 - a))
-    return R * c
-
-def interpolate(start, end, progress):
-    lat = start[0] + (end[0] - start[0]) * progress
-    lon = start[1] + (end[1] - start[1]) * progress
-    return lat, lon
-
 def ship_thread(ship):
     client = mqtt.Client(client_id=ship["imei"])
     client.username_pw_set(username=f"FMC230_{ship['imei']}")
 
+    tracker = metrics.tracker(DEVICE_TYPE)
+
     def on_connect(c, userdata, flags, rc):
-        print(f"{ship['name']} connected to MQTT broker." if rc == 0 else f"{ship['name']} failed to connect.")
+        if rc == 0:
+            tracker.connected(ship["imei"])
+            logger.info("%s connected to MQTT broker.", ship["name"])
+        else:
+            logger.error("%s failed to connect.", ship["name"])
+
+    def on_publish(c, userdata, mid):
+        tracker.acked(ship["imei"], mid)
 
     client.on_connect = on_connect
+    client.on_publish = on_publish
 
     connected = False
     while not connected:
@@ -73,31 +79,30 @@ def ship_thread(ship):
             client.loop_start()
             connected = True
         except Exception as e:
-            print(f"{ship['name']} MQTT connection failed. Retrying in 5s...")
+            logger.error("%s MQTT connection failed. Retrying in 5s...", ship["name"])
             time.sleep(5)
 
-    progress = 0.0
-    segment = 0
-    direction = 1
+    ticker = metrics.TickTimer(DEVICE_TYPE, PUBLISH_INTERVAL)
 
     while True:
         route = ship["route"]
-        if segment >= len(route) - 1:
-            segment = 0
-            progress = 0.0
+        if ship["segment"] >= len(route) - 1:
+            ship["segment"] = 0
+            ship["progress"] = 0.0
 
-        start = route[segment]
-        end = route[segment + 1]
-        distance = haversine(*start, *end)
+        start = route[ship["segment"]]
+        end = route[ship["segment"] + 1]
+        distance = geodesy.scalar_haversine(*start, *end)
         speed_kmh = random.uniform(20, 35)  # Ship speed
         step = (speed_kmh / 3600) / distance  # per second
-        progress += step * PUBLISH_INTERVAL
+        ship["progress"] += step * PUBLISH_INTERVAL
 
-        if progress >= 1.0:
-            segment += 1
-            progress = 0.0
+        if ship["progress"] >= 1.0:
+            ship["segment"] += 1
+            ship["progress"] = 0.0
 
-        lat, lon = interpolate(start, end, progress)
+        lat, lon = geodesy.scalar_slerp(*start, *end, ship["progress"])
+        heading = int(round(geodesy.scalar_initial_bearing(*start, *end))) % 360
         temp = random.uniform(-2, 5)
         humidity = random.randint(60, 90)
 
@@ -109,7 +114,7 @@ def ship_thread(ship):
                     "pr":  0,
                     "latlng":  f"{lat:.5f},{lon:.5f}",
                     "alt": 5,
-                    "ang": random.randint(0, 360),
+                    "ang": heading,
                     "sp": speed_kmh,
                     "sat": random.randint(3, 15),
                     "evt": 0,
@@ -160,16 +165,27 @@ def ship_thread(ship):
         }
 
         topic = f"teltonika/{ship['imei']}/from"
-        client.publish(topic, json.dumps(payload))
-        print(f"[{ship['name']}] Published to {topic}: {payload}")
-        time.sleep(PUBLISH_INTERVAL)
-
-# Start ship threads
-for ship in SHIPS:
-    t = Thread(target=ship_thread, args=(ship,))
-    t.daemon = True
-    t.start()
-
-# Keep main thread alive
-while True:
-    time.sleep(60)
\ No newline at end of file
+        tracker.publish(client, ship["imei"], topic, json.dumps(payload))
+        logger.info("[%s] Published to %s: %s", ship["name"], topic, payload, extra={"device": ship["imei"]})
+        ticker.wait()
+
+def main():
+    logs.setup_logging("ship_simulator2")
+    metrics.start_http_server(METRICS_PORT)
+    profiling.start_from_argv("ship_simulator2")
+    for ship in SHIPS:
+        ship["segment"], ship["progress"] = 0, 0.0
+    checkpoint.resume(checkpoint.from_argv(), {ship["imei"]: ship for ship in SHIPS}, SHIP_STATE)
+
+    # Start ship threads
+    for ship in SHIPS:
+        t = Thread(target=ship_thread, args=(ship,))
+        t.daemon = True
+        t.start()
+
+    # Keep main thread alive
+    while True:
+        time.sleep(60)
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,94 @@
+import argparse
+import hashlib
 import json
-import time
+import os
 import re
-from googletrans import Translator
+import sqlite3
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from itertools import islice
+from json.decoder import scanstring
+
+# Translates locale.constant-en_US.json into the language packs of every target locale
+# (locale.constant-<locale>.json) in one pass over the flattened source.
+#
+# Translation goes through a backend: "googletrans" (Google Translate, online) or "offline", a
+# local deterministic stand-in that tags each string with its language, for tests and throughput
+# benchmarks. Strings are sent many per request (joined with newlines, translated line by line)
+# and every locale's batches run together on a bounded thread pool. For online backends a shared
+# rate limiter spaces the requests: it speeds up while they succeed and halves its rate on errors.
+#
+# Each distinct English string is translated once per window of keys however many keys share it,
+# and a translation memory (SQLite, next to this script) remembers every translation by source
+# text, language and backend, so later windows and reruns only send the strings it has never seen.
+#
+# Builds are incremental: locale.manifest.json records, per locale, the hash of the English text
+# each translated key was built from. Only added or changed keys are translated and merged into
+# the existing pack, keys gone from the English file are dropped, and everything else - manual
+# fixes included - is kept as it is. A locale without a manifest entry yet trusts its current
+# pack and only fills in the keys it lacks. Failed strings stay out of the manifest, so the next
+# run retries them.
+#
+# Everything streams: the source is read a window of keys at a time, the existing packs and the
+# manifest are read a key at a time into a temporary SQLite index, and the new packs are written
+# as each window of keys is translated, so memory stays flat even for merged bundles of hundreds
+# of MB, whatever order the keys come in. The new files replace the old ones once the run completes.
+#
+# Usage:
+#   python3 translate_language_packs.py
+#   python3 translate_language_packs.py --locales sv_SE fi_FI de_DE nl_NL --workers 4 --rate 2
+#   python3 translate_language_packs.py --backend offline --no-memory --output-dir /tmp/packs
+#   python3 translate_language_packs.py --source merged.en_US.json --window 20000
+#   python3 translate_language_packs.py --no-memory    # ignore and don't update the memory
+#   python3 translate_language_packs.py --full         # retranslate every key, dropping manual fixes
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SOURCE_FILE = os.path.join(HERE, "locale.constant-en_US.json")
+LOCALES = ["sv_SE", "fi_FI"]
+LANGUAGE_CODES = {"zh_CN": "zh-cn", "zh_TW": "zh-tw", "pt_BR": "pt"}  # where the backend code isn't the locale's language part
+BATCH_SIZE = 50  # strings per request
+BATCH_CHARS = 4500  # Google rejects requests over 5000 characters
+WORKERS = 8
+ATTEMPTS = 4  # per batch, before keeping the English text
+SEPARATOR = "\n"
+MEMORY_FILE = os.path.join(HERE, "translation_memory.sqlite3")
+WINDOW = 5000  # source keys read, translated and written at a time
+READ_CHUNK = 1 << 16  # characters read from a JSON file at a time
+SCALAR_RUN = re.compile(r"[\w.+-]+")  # a number or literal runs until the next delimiter
+SCALAR_PATTERN = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?|true|false|null")
+LITERALS = {"true": True, "false": False, "null": None}
 
 # ICU pattern for pluralization and placeholders
-ICU_PLACEHOLDER_PATTERN = re.compile(r"{\\s*[\\w\\.\\#\\,\\s='\\\"|\\(\\)-]+}")
+ICU_PLACEHOLDER_PATTERN = re.compile(r"{\s*[\w.#,\s='\"|()-]+}")
 
-# Load the English source file
-with open('locale.constant-en_US.json', 'r', encoding='utf-8') as f:
-    data = json.load(f)
+def target_file(locale, output_dir=HERE):
+    return os.path.join(output_dir, f"locale.constant-{locale}.json")
 
-# Flatten nested JSON
-def flatten_json(y, prefix=''):
-    flat = {}
-    for k, v in y.items():
-        if isinstance(v, dict):
-            flat.update(flatten_json(v, f"{prefix}{k}."))
+def manifest_file(output_dir=HERE):
+    return os.path.join(output_dir, "locale.manifest.json")
+
+def language_code(locale):
+    return LANGUAGE_CODES.get(locale, locale.split("_")[0])
+
+# Flatten nested JSON: (dotted key, value) for every leaf, depth first, without building
+# intermediate dicts. Empty objects have no leaves and disappear.
+def iter_flat_items(y, prefix=''):
+    stack = [(prefix, iter(y.items()))]
+    while stack:
+        prefix, items = stack[-1]
+        for k, v in items:
+            if isinstance(v, dict):
+                stack.append((f"{prefix}{k}.", iter(v.items())))
+                break
+            yield prefix + k, v
         else:
-            flat[prefix + k] = v
-    return flat
+            stack.pop()
+
+def flatten_json(y, prefix=''):
+    return dict(iter_flat_items(y, prefix))
 
 # Unflatten back to nested JSON
 def unflatten_json(flat_dict):
@@ -31,54 +101,562 @@ def unflatten_json(flat_dict):
         d[keys[-1]] = value
     return nested
 
-# Translate the flattened JSON
-def translate_flat_json(flat_dict, target_lang):
-    translator = Translator()
-    translated = {}
-    for key, text in flat_dict.items():
-        success = False
-        for attempt in range(1):
+# Streaming JSON: language packs are read and written a key at a time, so memory stays flat
+# however large the bundle is
+def iter_json_tokens(f, chunk_size=READ_CHUNK):
+    """(kind, value) tokens of the JSON text in f: kind is one of {}[]:, for punctuation,
+    "value" for strings, numbers and literals, and "end" once the text is exhausted"""
+    buffer, pos, eof = "", 0, False
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n":
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                yield "end", None
+                return
+            buffer, pos = f.read(chunk_size), 0
+            eof = not buffer
+            continue
+        char = buffer[pos]
+        if char in "{}[]:,":
+            pos += 1
+            yield char, None
+            continue
+        if char == '"':
             try:
-                if not isinstance(text, str) or text.strip() == "":
-                    print(f"Skipping key {key}: Not a valid string ({text})")
-                    translated[key] = text
-                    break
-                if ICU_PLACEHOLDER_PATTERN.search(text) or '{{' in text or '}}' in text:
-                    print(f"Skipping key {key}: Contains ICU or placeholders → {text}")
-                    translated[key] = text
-                    break
+                value, end = scanstring(buffer, pos + 1)
+            except ValueError:  # json.JSONDecodeError; an unterminated string may just run past the buffer
+                if eof:
+                    raise
+                end = None
+        else:
+            run = SCALAR_RUN.match(buffer, pos)
+            end = run.end() if run and (run.end() < len(buffer) or eof) else None
+            if end is not None:
+                text = run.group()
+                if not SCALAR_PATTERN.fullmatch(text):
+                    raise ValueError(f"Invalid JSON value {text[:20]!r}")
+                value = LITERALS[text] if text in LITERALS else float(text) if any(c in text for c in ".eE") else int(text)
+            elif run is None:
+                raise ValueError(f"Invalid JSON at {buffer[pos:pos + 20]!r}")
+        if end is None:
+            # The token runs past the end of the buffer: read on and try again
+            more = f.read(chunk_size)
+            buffer, pos, eof = buffer[pos:] + more, 0, not more
+            continue
+        pos = end
+        yield "value", value
 
-                time.sleep(0.2)
-                translated_text = translator.translate(text, src='en', dest=target_lang).text
+def _build_value(take, kind, value):
+    """The complete value starting at token (kind, value); arrays and the objects inside them are built whole"""
+    stack = []  # [container, key of the dict member being read]
+    while True:
+        if kind in ("[", "{"):
+            container = [] if kind == "[" else {}
+            closing = "]" if kind == "[" else "}"
+            kind, value = take()
+            if kind == closing:
+                value = container
+            else:
+                stack.append([container, None])
+                if closing == "}":
+                    if kind != "value" or not isinstance(value, str):
+                        raise ValueError("Invalid JSON: object keys must be strings")
+                    stack[-1][1] = value
+                    take(":")
+                    kind, value = take()
+                continue
+        elif kind != "value":
+            raise ValueError(f"Invalid JSON: unexpected {kind!r}")
+        # value is complete: add it to the open containers, closing those that end here
+        while stack:
+            container, key = stack[-1]
+            if isinstance(container, list):
+                container.append(value)
+            else:
+                container[key] = value
+            kind, _ = take(", ]" if isinstance(container, list) else ", }")
+            if kind == ",":
+                kind, value = take()
+                if isinstance(container, dict):
+                    stack[-1][1] = value
+                    take(":")
+                    kind, value = take()
+                break
+            stack.pop()
+            value = container
+        else:
+            return value
 
-                if not isinstance(translated_text, str):
-                    raise ValueError("Translated text is not a string")
+def iter_json_leaves(f, chunk_size=READ_CHUNK):
+    """(dotted key, value) for every leaf of the JSON object in f, in file order, like
+    iter_flat_items(json.load(f)) but reading the file chunk_size characters at a time"""
+    tokens = iter_json_tokens(f, chunk_size)
 
-                translated[key] = translated_text
-                success = True
-                break
+    def take(expected=None):
+        kind, value = next(tokens)
+        if expected and kind not in expected.split():
+            raise ValueError(f"Invalid JSON: expected {expected!r}, found {kind!r}")
+        return kind, value
+
+    take("{")
+    path = []  # keys of the open objects below the top level
+    kind, key = take("value }")
+    while True:
+        if kind == "}":
+            if not path:
+                return
+            path.pop()
+        else:
+            if not isinstance(key, str):
+                raise ValueError("Invalid JSON: object keys must be strings")
+            take(":")
+            kind, value = take()
+            if kind == "{":
+                path.append(key)
+                kind, key = take("value }")
+                continue
+            yield ".".join((*path, key)), _build_value(take, kind, value)
+        kind, _ = take(", }")
+        if kind == ",":
+            kind, key = take("value")
+
+class NestedJsonWriter:
+    """Writes (dotted key, value) pairs as nested JSON, formatted like json.dump(..., indent=2,
+    ensure_ascii=False), as they arrive. Keys that share a prefix must arrive together, as they do
+    in flattened source order. `levels` nests at the first `levels` dots only, so levels=1 writes
+    {"sv_SE": {"a.b": ...}} from "sv_SE.a.b" and levels=0 one flat object.
+    Written to a temporary file that replaces `path` only when the writer closes cleanly."""
+    def __init__(self, path, levels=-1):
+        self.path = path
+        self.levels = levels  # -1: every dot
+        self.temporary = f"{path}.tmp"
+        self.f = open(self.temporary, 'w', encoding='utf-8')
+        self.f.write("{")
+        self.open_keys = []  # keys of the open objects below the top level
+        self.empty = True  # no member written yet in the innermost open object
+
+    def write(self, key, value):
+        *parents, name = key.split('.', self.levels)
+        common = 0
+        while common < min(len(parents), len(self.open_keys)) and parents[common] == self.open_keys[common]:
+            common += 1
+        while len(self.open_keys) > common:
+            self.open_keys.pop()
+            self.f.write("\n" + "  " * (len(self.open_keys) + 1) + "}")
+        for parent in parents[common:]:
+            self._member(parent)
+            self.f.write("{")
+            self.open_keys.append(parent)
+            self.empty = True
+        indent = "\n" + "  " * (len(self.open_keys) + 1)
+        self._member(name)
+        self.f.write(json.dumps(value, indent=2, ensure_ascii=False).replace("\n", indent))
+
+    def _member(self, key):
+        self.f.write(("" if self.empty else ",") + "\n" + "  " * (len(self.open_keys) + 1))
+        self.f.write(json.dumps(key, ensure_ascii=False) + ": ")
+        self.empty = False
+
+    def close(self):
+        while self.open_keys:
+            self.open_keys.pop()
+            self.f.write("\n" + "  " * (len(self.open_keys) + 1) + "}")
+        self.f.write("}" if self.empty else "\n}")
+        self.f.close()
+        os.replace(self.temporary, self.path)
+
+    def discard(self):
+        self.f.close()
+        os.remove(self.temporary)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+# Rate limiting
+class RateLimiter:
+    """Spaces requests from all workers; additive increase while they succeed, halved rate and a pause on errors"""
+    def __init__(self, rate=5.0, min_rate=0.2, max_rate=20.0, increase=0.25):
+        self.rate = rate  # requests per second
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+        self.errors = 0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + 1 / self.rate
+        if slot > now:
+            time.sleep(slot - now)
+
+    def succeeded(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def failed(self):
+        with self.lock:
+            self.errors += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            # Nobody sends again until the slowed-down interval has passed
+            self.next_slot = max(self.next_slot, time.monotonic() + 1 / self.rate)
+
+# Translation memory
+def source_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class TranslationMemory:
+    """Translations by (source text hash, target language, backend) in SQLite, shared by the worker threads"""
+    def __init__(self, path=MEMORY_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            "source_hash TEXT, target_lang TEXT, backend TEXT, source TEXT, translation TEXT, created REAL, "
+            "PRIMARY KEY (source_hash, target_lang, backend)) WITHOUT ROWID")
+        self.connection.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, texts, target_lang, backend):
+        """{text: translation} for the texts the memory already holds"""
+        hashes = {source_hash(text): text for text in texts}
+        found = {}
+        keys = list(hashes)
+        with self.lock:
+            for start in range(0, len(keys), 500):  # SQLite caps the number of query parameters
+                chunk = keys[start:start + 500]
+                rows = self.connection.execute(
+                    f"SELECT source_hash, translation FROM translations WHERE target_lang = ? AND backend = ? "
+                    f"AND source_hash IN ({','.join('?' * len(chunk))})", [target_lang, backend, *chunk])
+                found.update((hashes[digest], translation) for digest, translation in rows)
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        return found
 
-            except Exception as e:
-                print(f"Attempt {attempt+1} failed for {key}: {e} | Value: {text}")
-                time.sleep(0.5)
+    def store(self, translations, target_lang, backend):
+        now = time.time()
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?)",
+                [(source_hash(text), target_lang, backend, text, translation, now) for text, translation in translations.items()])
+            self.connection.commit()
 
-        if not success:
-            print(f"Translation ultimately failed for {key}: keeping original.")
-            translated[key] = text
+    def report(self):
+        looked_up = self.hits + self.misses
+        rate = self.hits / looked_up if looked_up else 0.0
+        return f"translation memory {os.path.basename(self.path)}: {self.hits} hits, {self.misses} misses ({rate:.1%} hit rate)"
+
+    def close(self):
+        self.connection.close()
+
+# Backends: translate(texts, target_lang) returns one translation per text (a different count
+# makes the caller split the batch) or raises; `rate_limited` backends go through the RateLimiter
+class GoogleTransBackend:
+    name = "googletrans"
+    rate_limited = True
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def translator(self):
+        """One googletrans Translator per worker thread; its HTTP client isn't shared safely"""
+        if not hasattr(self.local, "translator"):
+            from googletrans import Translator
+            self.local.translator = Translator()
+        return self.local.translator
+
+    def translate(self, texts, target_lang):
+        translated_text = self.translator().translate(SEPARATOR.join(texts), src='en', dest=target_lang).text
+        if not isinstance(translated_text, str):
+            raise ValueError("Translated text is not a string")
+        return [translated_text] if len(texts) == 1 else translated_text.split(SEPARATOR)
+
+class OfflineBackend:
+    """Deterministic stand-in: "[sv] Save" for "Save", after an optional fixed delay per request"""
+    name = "offline"
+    rate_limited = False
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def translate(self, texts, target_lang):
+        if self.latency:
+            time.sleep(self.latency)
+        return [f"[{target_lang}] {text}" for text in texts]
+
+BACKENDS = {backend.name: backend for backend in (GoogleTransBackend, OfflineBackend)}
+
+def skip_reason(text):
+    if not isinstance(text, str) or text.strip() == "":
+        return "not a valid string"
+    if ICU_PLACEHOLDER_PATTERN.search(text) or '{{' in text or '}}' in text:
+        return "contains ICU or placeholders"
+    return None
+
+def make_batches(texts, batch_size=BATCH_SIZE, batch_chars=BATCH_CHARS):
+    """Group texts into requests of at most batch_size strings and batch_chars characters"""
+    batch, chars = [], 0
+    for text in texts:
+        if SEPARATOR in text:
+            yield [text]  # would be split apart again in the response; goes on its own
+            continue
+        if batch and (len(batch) >= batch_size or chars + len(text) + 1 > batch_chars):
+            yield batch
+            batch, chars = [], 0
+        batch.append(text)
+        chars += len(text) + 1
+    if batch:
+        yield batch
+
+def translate_texts(backend, texts, target_lang, limiter=None):
+    """Translations of texts in one request, or None once every attempt has failed"""
+    for attempt in range(ATTEMPTS):
+        if limiter:
+            limiter.wait()
+        try:
+            translations = backend.translate(texts, target_lang)
+        except Exception as e:
+            if limiter:
+                limiter.failed()
+            print(f"Attempt {attempt+1} failed for {len(texts)} strings to {target_lang}: {e}")
+            continue
+        if limiter:
+            limiter.succeeded()
+        if len(translations) == len(texts):
+            return translations
+        # The translation merged or split lines: halve the batch until they line up
+        middle = len(texts) // 2
+        first = translate_texts(backend, texts[:middle], target_lang, limiter)
+        second = translate_texts(backend, texts[middle:], target_lang, limiter)
+        if first is None or second is None:
+            return None
+        return first + second
+    return None
+
+def translate_batch(backend, texts, target_lang, limiter=None, memory=None):
+    """{text: translation} for a batch, empty if it failed; only successful translations go into the memory"""
+    translations = translate_texts(backend, texts, target_lang, limiter)
+    if translations is None:
+        for text in texts:
+            print(f"Translation ultimately failed for {text[:60]!r} ({target_lang}): keeping original.")
+        return {}
+    translated = dict(zip(texts, translations))
+    if memory:
+        memory.store(translated, target_lang, backend.name)
     return translated
 
-# Start processing
-flat_data = flatten_json(data)
+# Incremental builds
+def value_hash(value):
+    return source_hash(json.dumps(value, ensure_ascii=False))[:16]
+
+class PackIndex:
+    """The existing packs and the manifest by (locale, key) in a temporary SQLite database, so any key
+    is found whatever order the source asks for it in, without holding the files in memory. The
+    hashes of the keys built this run are collected alongside and written out as the new manifest."""
+    def __init__(self):
+        self.connection = sqlite3.connect("")  # a private on-disk database, deleted when closed
+        self.connection.execute("CREATE TABLE pack (locale TEXT, key TEXT, value TEXT, PRIMARY KEY (locale, key)) WITHOUT ROWID")
+        for table in ("manifest", "built"):  # rowid keeps the file / source order for writing the manifest
+            self.connection.execute(f"CREATE TABLE {table} (locale TEXT, key TEXT, hash TEXT, PRIMARY KEY (locale, key))")
+        self.manifest_locales = []  # in manifest file order
+
+    def add_pack(self, locale, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            self.connection.executemany("INSERT OR REPLACE INTO pack VALUES (?, ?, ?)",
+                                        ((locale, key, json.dumps(value, ensure_ascii=False)) for key, value in iter_json_leaves(f)))
+
+    def add_manifest(self, path):
+        """Index a {locale: {key: hash}} manifest"""
+        def rows(leaves):
+            for key, digest in leaves:
+                locale, key = key.split('.', 1)
+                if locale not in self.manifest_locales:
+                    self.manifest_locales.append(locale)
+                yield locale, key, digest
+        with open(path, 'r', encoding='utf-8') as f:
+            self.connection.executemany("INSERT OR REPLACE INTO manifest VALUES (?, ?, ?)", rows(iter_json_leaves(f)))
+
+    def lookup(self, table, locale, keys):
+        """{key: value} for the keys `table` holds for `locale`"""
+        column = "value" if table == "pack" else "hash"
+        found = {}
+        for start in range(0, len(keys), 500):  # SQLite caps the number of query parameters
+            chunk = keys[start:start + 500]
+            found.update(self.connection.execute(
+                f"SELECT key, {column} FROM {table} WHERE locale = ? AND key IN ({','.join('?' * len(chunk))})", [locale, *chunk]))
+        if table == "pack":
+            found = {key: json.loads(value) for key, value in found.items()}
+        return found
 
-# Translate to Swedish and Finnish
-translated_sv = translate_flat_json(flat_data, 'sv')
-translated_fi = translate_flat_json(flat_data, 'fi')
+    def record(self, locale, hashes):
+        self.connection.executemany("INSERT OR REPLACE INTO built VALUES (?, ?, ?)", ((locale, key, digest) for key, digest in hashes.items()))
+
+    def write_manifest(self, path, locales):
+        """The old manifest with the entries of `locales` replaced by the keys built this run"""
+        with NestedJsonWriter(path, levels=1) as writer:
+            for locale in self.manifest_locales + [locale for locale in locales if locale not in self.manifest_locales]:
+                table = "built" if locale in locales else "manifest"
+                for key, digest in self.connection.execute(f"SELECT key, hash FROM {table} WHERE locale = ? ORDER BY rowid", [locale]):
+                    writer.write(f"{locale}.{key}", digest)
+
+    def close(self):
+        self.connection.close()
+
+def load_index(output_dir):
+    """A PackIndex holding locale.manifest.json, if there is one yet"""
+    index = PackIndex()
+    if os.path.exists(manifest_file(output_dir)):
+        index.add_manifest(manifest_file(output_dir))
+    return index
+
+class PackBuild:
+    """One locale's pack, rebuilt a window of keys at a time: the old pack and its manifest hashes
+    come from the index and the new pack is written as each window is translated"""
+    def __init__(self, locale, index, output_dir=HERE, full=False):
+        self.locale = locale
+        self.index = index
+        pack = target_file(locale, output_dir)
+        self.existing = not full and os.path.exists(pack)
+        if self.existing:
+            index.add_pack(locale, pack)
+        # No manifest entry yet: the pack is taken as up to date for every key it has
+        self.hashed = locale in index.manifest_locales
+        os.makedirs(output_dir, exist_ok=True)
+        self.pack = NestedJsonWriter(pack)
+        self.stats = Counter()
+
+    def reusable(self, window):
+        """{key: translation} from the old pack for the keys whose English text is unchanged since they were built"""
+        if not self.existing:
+            return {}
+        keys = list(window)
+        existing = self.index.lookup("pack", self.locale, keys)
+        hashes = self.index.lookup("manifest", self.locale, keys) if self.hashed else None
+        return {key: translation for key, translation in existing.items()
+                if hashes is None or hashes.get(key) == value_hash(window[key])}
+
+    def write(self, window, translated, done):
+        for key, value in translated.items():
+            self.pack.write(key, value)
+        self.index.record(self.locale, {key: value_hash(text) for key, text in window.items() if key in done})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return self.pack.__exit__(*exc_info)
+
+# Translate the flattened JSON into every target locale at once
+def translate_flat_json(flat_dict, locales, backend, workers=WORKERS, limiter=None, batch_size=BATCH_SIZE, memory=None, reuse=None, pool=None):
+    """Returns ({locale: translated flat dict}, {locale: keys now up to date}, {locale: counts});
+    `reuse` holds translations to keep per locale, `pool` an executor to share between calls"""
+    reuse = reuse or {}
+    # One pass over the source: the ICU / placeholder check runs once per string, not once per locale
+    skipped = set()
+    translatable = []
+    for key, text in flat_dict.items():
+        if skip_reason(text):
+            skipped.add(key)
+        else:
+            translatable.append(key)
+
+    with ExitStack() as stack:
+        if pool is None:
+            pool = stack.enter_context(ThreadPoolExecutor(max_workers=workers))
+        pending, known, futures, stats = {}, {}, {}, {}
+        for locale in locales:
+            kept = reuse.get(locale, {})
+            target_lang = language_code(locale)
+            pending[locale] = [key for key in translatable if key not in kept]
+            unique = list(dict.fromkeys(flat_dict[key] for key in pending[locale]))  # "Save", "Cancel"... under many keys
+            known[locale] = memory.lookup(unique, target_lang, backend.name) if memory else {}
+            missing = [text for text in unique if text not in known[locale]]
+            stats[locale] = {"kept": len(kept), "keys": len(pending[locale]), "distinct": len(unique),
+                             "memory": len(known[locale]), "sent": len(missing)}
+            futures[locale] = [pool.submit(translate_batch, backend, batch, target_lang, limiter, memory)
+                               for batch in make_batches(missing, batch_size)]
+        results, done = {}, {}
+        for locale, batches in futures.items():
+            translations = known[locale]
+            for future in batches:
+                translations.update(future.result())
+            translated = dict(flat_dict)  # keeps the source order; skipped strings stay as they are
+            translated.update(reuse.get(locale, {}))
+            done[locale] = set(reuse.get(locale, {})) | skipped
+            for key in pending[locale]:
+                text = flat_dict[key]
+                if text in translations:
+                    translated[key] = translations[text]
+                    done[locale].add(key)
+            results[locale] = translated
+    return results, done, stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Translate the English locale into language packs")
+    parser.add_argument("--locales", nargs="+", default=LOCALES, metavar="LOCALE",
+                        help=f"Target locales, e.g. sv_SE fi_FI de_DE (default: {' '.join(LOCALES)})")
+    parser.add_argument("--backend", choices=list(BACKENDS), default="googletrans")
+    parser.add_argument("--offline-latency", type=float, default=0.0, metavar="SECONDS",
+                        help="Delay per request of the offline backend, to benchmark concurrency")
+    parser.add_argument("--source", default=SOURCE_FILE, help="English source file")
+    parser.add_argument("--output-dir", default=HERE, help="Directory of the language packs and their manifest")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Requests in flight at once, across all locales")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Strings per request")
+    parser.add_argument("--window", type=int, default=WINDOW, help="Source keys translated and written at a time")
+    parser.add_argument("--rate", type=float, default=5.0, help="Starting requests per second; adapts while running")
+    parser.add_argument("--memory", default=MEMORY_FILE, help="SQLite translation memory file")
+    parser.add_argument("--no-memory", action="store_true", help="Translate everything and don't record the results")
+    parser.add_argument("--full", action="store_true", help="Rebuild every key instead of only those added or changed")
+    args = parser.parse_args()
+
+    start = time.monotonic()
+    backend = OfflineBackend(args.offline_latency) if args.backend == "offline" else BACKENDS[args.backend]()
+    limiter = RateLimiter(rate=args.rate) if backend.rate_limited else None
+    memory = None if args.no_memory else TranslationMemory(args.memory)
+
+    # Stream the English source a window of keys at a time; each window's translations are written
+    # to every pack before the next is read. The packs replace the old ones once all are complete.
+    index = load_index(args.output_dir)
+    try:
+        with open(args.source, 'r', encoding='utf-8') as f, ExitStack() as stack, ThreadPoolExecutor(max_workers=args.workers) as pool:
+            builds = [stack.enter_context(PackBuild(locale, index, args.output_dir, args.full)) for locale in args.locales]
+            leaves = iter_json_leaves(f)
+            while True:
+                window = dict(islice(leaves, max(1, args.window)))
+                if not window:
+                    break
+                reuse = {build.locale: build.reusable(window) for build in builds}
+                results, done, stats = translate_flat_json(window, args.locales, backend, args.workers, limiter,
+                                                           args.batch_size, memory, reuse, pool)
+                for build in builds:
+                    build.write(window, results[build.locale], done[build.locale])
+                    build.stats.update(stats[build.locale])
+        index.write_manifest(manifest_file(args.output_dir), args.locales)
+    finally:
+        index.close()
 
-# Unflatten and save to files
-with open('locale.constant-sv_SE.json', 'w', encoding='utf-8') as f:
-    json.dump(unflatten_json(translated_sv), f, indent=2, ensure_ascii=False)
+    for build in builds:
+        counts = build.stats
+        print(f"  {build.locale}: {counts['kept']} keys kept, {counts['keys']} to translate ({counts['distinct']} distinct strings, "
+              f"{counts['memory']} from memory, {counts['sent']} sent to {backend.name})")
+    if memory:
+        print(memory.report())
+        memory.close()
 
-with open('locale.constant-fi_FI.json', 'w', encoding='utf-8') as f:
-    json.dump(unflatten_json(translated_fi), f, indent=2, ensure_ascii=False)
+    saved = ", ".join(os.path.basename(target_file(locale, args.output_dir)) for locale in args.locales)
+    rate = f"final rate {limiter.rate:.1f} req/s, {limiter.errors} errors" if limiter else backend.name
+    print(f"✅ Translation completed in {time.monotonic() - start:.1f} s ({rate}). Files saved as {saved}")
 
-print("✅ Translation completed. Files saved as locale.constant-sv_SE.json and locale.constant-fi_FI.json")
+if __name__ == "__main__":
+    main()
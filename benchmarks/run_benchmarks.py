@@ -0,0 +1,321 @@
+import argparse
+import atexit
+import copy
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+import types
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Offline benchmarks for the simulator hot paths. Nothing connects to a broker: the simulator
+# scripts are imported with fleetsim.cli.load_script, which never runs their main(). The
+# cold_start cases time a whole `python3 -m fleetsim` process instead, up to its first packet.
+# --filter is applied before the cases are built, so a filtered run skips the setup of the rest.
+#
+# Usage:
+#   python3 benchmarks/run_benchmarks.py            # all cases, appends to benchmarks/history.jsonl
+#   python3 benchmarks/run_benchmarks.py --quick    # skip the 100k device scenarios
+#   python3 benchmarks/run_benchmarks.py --filter fleet --no-save
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "history.jsonl")
+FLEET_SIZES = (1000, 10000, 100000)
+REGRESSION_THRESHOLD = 0.10  # 10% slower than the previous run
+
+os.environ.setdefault("LOG_MODE", "quiet")  # keep simulator log lines out of the timings
+sys.path.insert(0, REPO_DIR)
+from fleetsim import checkpoint, geodesy, geofence, metrics
+from fleetsim.cli import load_script
+from fleetsim.freezer_fleet import FreezerFleet
+
+
+class TickDone(BaseException):
+    """Raised by the fake tick timer; BaseException so the simulators' except Exception doesn't swallow it"""
+
+
+class FakeMetrics:
+    """Stands in for fleetsim.metrics inside a loaded script; its tick timer stops the loop after N ticks"""
+    def __init__(self, ticks):
+        self.ticks = ticks
+
+    def __getattr__(self, name):
+        return getattr(metrics, name)
+
+    def TickTimer(self, device_type, interval):
+        return self
+
+    def wait(self):
+        self.ticks -= 1
+        if self.ticks <= 0:
+            raise TickDone()
+
+
+class NullClient:
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        return types.SimpleNamespace(mid=0, rc=0)
+
+
+def synthetic_route(ship, points_per_leg=50):
+    """Great-circle stand-in for the searoute routes built at ShipSimulator start-up"""
+    ports = ship["ports"]
+    port_routes = []
+    routes = []
+    total_distance = 0
+    for i in range(len(ports)):
+        start = ports[i]
+        end = ports[(i + 1) % len(ports)]
+        lat, lng = geodesy.slerp(start[0], start[1], end[0], end[1], np.linspace(0, 1, points_per_leg))
+        leg = list(zip(lat.tolist(), lng.tolist()))
+        port_routes.append(leg)
+        routes.extend(leg[:-1])
+        total_distance += geodesy.path_length(leg)
+    routes.append(routes[0])
+    ship["route"] = routes
+    ship["port_routes"] = port_routes
+    ship["total_distance"] = total_distance
+    ship["current_segment"] = 0
+    return ship
+
+
+def clone_fleet(devices, size):
+    return [copy.deepcopy(devices[i % len(devices)]) for i in range(size)]
+
+
+def cold_start(*args):
+    """A fresh interpreter running `python3 -m fleetsim <args>` to completion"""
+    def run():
+        subprocess.run([sys.executable, "-m", "fleetsim", *args], cwd=REPO_DIR, check=True,
+                       stdout=subprocess.DEVNULL, env=dict(os.environ, LOG_MODE="quiet"))
+    return run
+
+
+def stream_locale(translations):
+    with open(translations.SOURCE_FILE, "r", encoding="utf-8") as f:
+        for _ in translations.iter_json_leaves(f):
+            pass
+
+
+# Benchmark cases: name -> (callable, items processed per call)
+def build_cases(quick, name_filter=None):
+    """The cases whose name contains name_filter; the setup of a group of cases only runs if one of them is wanted"""
+    def wanted(*names):
+        return name_filter is None or any(name_filter in name for name in names)
+
+    fmc = load_script("fmc230_simulator.py")
+    freezer = load_script("Cryolytix Static Fridge Simulators/devices/400000000000001/fmc230_simulator_400000000000001.py")
+
+    truck = copy.deepcopy(next(f for f in fmc.FRIDGES if f["type"] == "truck"))
+    static = copy.deepcopy(next(f for f in fmc.FRIDGES if f["type"] == "static"))
+    fmc.MovingFleet([truck]).advance()
+    points = np.random.default_rng(0).uniform((-60, -180), (60, 180), (10000, 2))
+    sites = [{"id": str(i), "kind": "site", "lat": lat, "lng": lng, "radius_km": 5.0} for i, (lat, lng) in enumerate(points[:1000].tolist())]
+    geofence_index = geofence.GeofenceIndex(sites)
+    packet = fmc.generate_packet(copy.deepcopy(static))
+    freezer_sim = freezer.IceCreamFreezerSimulator()
+    checkpoint_dir = tempfile.mkdtemp(prefix="fleetsim-bench-")
+    atexit.register(shutil.rmtree, checkpoint_dir, True)
+
+    cases = {
+        "geodesy.haversine": (lambda: geodesy.haversine(-33.9249, 18.4241, -29.6641, 17.8866), 1),
+        "geodesy.scalar_haversine": (lambda: geodesy.scalar_haversine(-33.9249, 18.4241, -29.6641, 17.8866), 1),
+        "geodesy.scalar_slerp": (lambda: geodesy.scalar_slerp(-33.9249, 18.4241, -29.6641, 17.8866, 0.5), 1),
+        "geodesy.haversine.10k": (lambda: geodesy.haversine(points[:-1, 0], points[:-1, 1], points[1:, 0], points[1:, 1]), 9999),
+        "geodesy.slerp.10k": (lambda: geodesy.slerp(points[:-1, 0], points[:-1, 1], points[1:, 0], points[1:, 1], 0.5), 9999),
+        "generate_packet.static": (lambda: fmc.generate_packet(static), 1),
+        "generate_packet.truck": (lambda: fmc.generate_packet(truck), 1),
+        "generate_packet.static.minimal": (lambda: json.dumps(fmc.packet_generator("minimal")(static)), 1),
+        "generate_packet.static.eye4": (lambda: json.dumps(fmc.packet_generator("eye4")(static)), 1),
+        "json_dumps.packet": (lambda: json.dumps(packet), 1),
+        "freezer.generate_sensor_readings": (freezer_sim.generate_sensor_readings, 1),
+        "cold_start.cli_help": (cold_start("--help"), 1),
+        "cold_start.fmc230.first_packet": (cold_start("fmc230", "--dump", "1"), 1),
+    }
+
+    if wanted("simulate_ship.tick"):
+        ships = load_script("ShipSimulator/ship_simulator.py")
+        ship = synthetic_route(copy.deepcopy(ships.SHIPS[0]))
+        ship_geofences = ships.port_geofences([ship])
+
+        def ship_ticks(ticks=100):
+            ships.metrics = FakeMetrics(ticks)
+            try:
+                ships.simulate_ship(ship, NullClient(), ship_geofences)
+            except TickDone:
+                pass
+
+        cases["simulate_ship.tick"] = (ship_ticks, 100)
+
+    translate_cases = ("translate.flatten", "translate.stream_read", "translate.offline.1_locale", "translate.offline.4_locales")
+    if wanted(*translate_cases):
+        translations = load_script("Translations/translate_language_packs.py")
+        with open(translations.SOURCE_FILE, "r", encoding="utf-8") as f:
+            locale_json = json.load(f)
+        locale_strings = translations.flatten_json(locale_json)
+        offline = translations.OfflineBackend()
+        cases.update({
+            "translate.flatten": (lambda: translations.flatten_json(locale_json), len(locale_strings)),
+            "translate.stream_read": (lambda: stream_locale(translations), len(locale_strings)),
+            "translate.offline.1_locale": (
+                lambda: translations.translate_flat_json(locale_strings, ["sv_SE"], offline), len(locale_strings)),
+            "translate.offline.4_locales": (
+                lambda: translations.translate_flat_json(locale_strings, ["sv_SE", "fi_FI", "de_DE", "nl_NL"], offline),
+                4 * len(locale_strings)),
+        })
+
+    for size in FLEET_SIZES:
+        if quick and size > 10000:
+            continue
+        suffix = f"{size // 1000}k"
+
+        fmc_cases = [f"{kind}.{suffix}" for kind in ("fleet_tick.fmc230", "fleet_move.fmc230", "position_packets.fmc230",
+                                                      "positions_at.fmc230", "checkpoint.save.fmc230", "checkpoint.resume.fmc230")]
+        if wanted(*fmc_cases):
+            fleet = clone_fleet(fmc.FRIDGES, size)
+            moving = fmc.MovingFleet(fleet)
+
+            def fleet_tick(fleet=fleet, moving=moving):
+                moving.advance()
+                for fridge in fleet:
+                    json.dumps(fmc.generate_packet(fridge))
+
+            cases[f"fleet_tick.fmc230.{suffix}"] = (fleet_tick, size)
+            cases[f"fleet_move.fmc230.{suffix}"] = (moving.advance, size)
+            moving.advance()
+            moving_count = len(moving.fridges)
+            cases[f"position_packets.fmc230.{suffix}"] = (
+                lambda moving=moving: [json.dumps(packet) for _, packet in fmc.position_packets(moving, 5.0)], moving_count)
+            cases[f"positions_at.fmc230.{suffix}"] = (lambda moving=moving: moving.positions_at(5.0), moving_count)
+
+            moving_state = {str(i): fmc.prepare_fridge(fridge) for i, fridge in enumerate(fleet) if fridge["type"] != "static"}
+            fleet_file = os.path.join(checkpoint_dir, f"fmc230-{size}.npz")
+            checkpoint.save(fleet_file, checkpoint.columns(moving_state, fmc.MOVING_STATE))
+            cases[f"checkpoint.save.fmc230.{suffix}"] = (
+                lambda path=fleet_file, state=moving_state: checkpoint.save(path, checkpoint.columns(state, fmc.MOVING_STATE)), size)
+            cases[f"checkpoint.resume.fmc230.{suffix}"] = (
+                lambda path=fleet_file, state=moving_state: checkpoint.restore(state, checkpoint.load(path), fmc.MOVING_STATE), size)
+
+        if wanted(f"geofence.update.{suffix}"):
+            # Half the units around a site, moving in and out of its fence from one update to the next
+            rng = np.random.default_rng(size)
+            near = rng.integers(0, len(sites), size // 2)
+            unit_points = rng.uniform((-60, -180), (60, 180), (size, 2))
+            unit_points[:size // 2] = points[near] + rng.normal(0, 0.04, (size // 2, 2))
+            tracker = geofence.GeofenceTracker(geofence_index, range(size))
+            moves = itertools.cycle((unit_points, unit_points + 0.02))
+
+            def geofence_update(tracker=tracker, moves=moves):
+                positions = next(moves)
+                tracker.update(positions[:, 0], positions[:, 1])
+
+            cases[f"geofence.update.{suffix}"] = (geofence_update, size)
+
+        if wanted(f"fleet_tick.freezer.{suffix}"):
+            freezers = [freezer.IceCreamFreezerSimulator() for _ in range(size)]
+
+            def freezer_tick(freezers=freezers):
+                for sim in freezers:
+                    sim.generate_sensor_readings()
+
+            cases[f"fleet_tick.freezer.{suffix}"] = (freezer_tick, size)
+
+        freezer_fleet_cases = [f"{kind}.{suffix}" for kind in ("fleet_tick.freezer_fleet", "checkpoint.save.freezer_fleet",
+                                                               "checkpoint.resume.freezer_fleet")]
+        if wanted(*freezer_fleet_cases):
+            freezer_fleet = FreezerFleet(size, seed=0)
+            freezer_file = os.path.join(checkpoint_dir, f"freezer_fleet-{size}.npz")
+            checkpoint.save(freezer_file, freezer_fleet.state())
+            cases[f"fleet_tick.freezer_fleet.{suffix}"] = (freezer_fleet.step, size)
+            cases[f"checkpoint.save.freezer_fleet.{suffix}"] = (
+                lambda path=freezer_file, fleet=freezer_fleet: checkpoint.save(path, fleet.state()), size)
+            cases[f"checkpoint.resume.freezer_fleet.{suffix}"] = (
+                lambda path=freezer_file: FreezerFleet.from_state(checkpoint.load(path)), size)
+    return {name: case for name, case in cases.items() if wanted(name)}
+
+
+def measure(func, items, repeat=5):
+    """Best of `repeat` timing runs, as items processed per second"""
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    best = min([elapsed] + timer.repeat(repeat=repeat - 1, number=number))
+    return number * items / best
+
+
+# History
+def git_commit():
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, text=True).strip()
+        dirty = bool(subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_DIR, text=True).strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+
+def previous_run(host):
+    if not os.path.exists(HISTORY_FILE):
+        return None
+    last = None
+    with open(HISTORY_FILE, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                if entry.get("host") == host:
+                    last = entry
+    return last
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the simulator hot paths")
+    parser.add_argument("--quick", action="store_true", help="Skip the 100k device scenarios")
+    parser.add_argument("--filter", help="Only run cases whose name contains this text")
+    parser.add_argument("--no-save", action="store_true", help="Don't append this run to the history file")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit non-zero if any case regressed")
+    args = parser.parse_args()
+
+    commit, dirty = git_commit()
+    host = f"{platform.node()}/{platform.machine()}/py{platform.python_version()}"
+    previous = previous_run(host)
+    baseline = previous["results"] if previous else {}
+    if previous:
+        print(f"Comparing against {previous['commit']} ({previous['time']})")
+
+    results = {}
+    regressions = []
+    cases = build_cases(args.quick, args.filter)
+    for name, (func, items) in cases.items():
+        rate = measure(func, items)
+        results[name] = rate
+        line = f"{name:40} {rate:14,.0f} /s"
+        if name in baseline:
+            change = rate / baseline[name] - 1
+            line += f"  {change:+7.1%}"
+            if change < -REGRESSION_THRESHOLD:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line)
+
+    if not args.no_save:
+        entry = {
+            "commit": commit,
+            "dirty": dirty,
+            "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "host": host,
+            "results": results,
+        }
+        with open(HISTORY_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        print(f"Saved results for {commit}{' (dirty)' if dirty else ''} to {os.path.relpath(HISTORY_FILE, REPO_DIR)}")
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Shared support code for the fridge, ship and freezer simulators"""
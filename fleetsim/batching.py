@@ -0,0 +1,92 @@
+"""Multi-record payloads: buffer a device's periodic records and publish them together.
+
+A Batcher keeps up to `max_records` records per device and sends them as one payload once the
+buffer is full or its oldest record is `max_seconds` old. Two payload formats:
+  records      {"records": [reported, ...]} - the device's own records, as an FMC230 sends a buffer
+  thingsboard  [{"ts": ts, "values": {...}}, ...] - ThingsBoard's telemetry list with timestamps
+"""
+import json
+import threading
+import time
+
+from fleetsim import metrics
+
+FORMATS = ("records", "thingsboard")
+MAX_RECORDS = 10
+MAX_SECONDS = 60.0
+
+
+class Batcher:
+    def __init__(self, max_records=MAX_RECORDS, max_seconds=MAX_SECONDS, payload_format="records"):
+        if payload_format not in FORMATS:
+            raise ValueError(f"Unknown batch format {payload_format!r}, choose from {', '.join(FORMATS)}")
+        self.max_records = max(1, max_records)
+        self.max_seconds = max_seconds
+        self.payload_format = payload_format
+        self.buffers = {}  # imei -> (device, [(queued, reported), ...])
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.records = 0
+        self.payloads = 0
+        self.bytes_sent = 0
+        self.unbatched_bytes = 0
+        self.total_delay = 0.0
+        self.max_delay = 0.0
+
+    def add(self, device, packet):
+        """Buffer a periodic packet; returns a payload when this record fills the device's batch"""
+        reported = packet["state"]["reported"]
+        with self.lock:
+            self.unbatched_bytes += len(json.dumps(packet))
+            _, records = self.buffers.setdefault(device["imei"], (device, []))
+            records.append((time.monotonic(), reported))
+            if len(records) < self.max_records:
+                return None
+            del self.buffers[device["imei"]]
+        return self._payload(device, records)
+
+    def flush_due(self, force=False):
+        """Return (device, payload) for every batch whose oldest record has waited max_seconds"""
+        now = time.monotonic()
+        with self.lock:
+            due = [imei for imei, (_, records) in self.buffers.items()
+                   if force or now - records[0][0] >= self.max_seconds]
+            batches = [self.buffers.pop(imei) for imei in due]
+        return [(device, self._payload(device, records)) for device, records in batches]
+
+    def flush_device(self, imei):
+        """The payload of one device's buffered records, or None; for a device leaving the fleet"""
+        with self.lock:
+            batch = self.buffers.pop(imei, None)
+        return self._payload(*batch) if batch else None
+
+    def _payload(self, device, records):
+        if self.payload_format == "thingsboard":
+            payload = [{"ts": reported["ts"], "values": {key: value for key, value in reported.items() if key != "ts"}}
+                       for _, reported in records]
+        else:
+            payload = {"records": [reported for _, reported in records]}
+        now = time.monotonic()
+        delays = [now - queued for queued, _ in records]
+        with self.lock:
+            self.records += len(records)
+            self.payloads += 1
+            self.bytes_sent += len(json.dumps(payload))
+            self.total_delay += sum(delays)
+            self.max_delay = max([self.max_delay] + delays)
+        metrics.RECORDS_BATCHED.inc(len(records), device_type=device["type"])
+        for delay in delays:
+            metrics.BATCH_DELAY.observe(delay, device_type=device["type"])
+        return payload
+
+    def report(self):
+        with self.lock:
+            records, payloads, bytes_sent = self.records, self.payloads, self.bytes_sent
+            unbatched_bytes, total_delay, max_delay = self.unbatched_bytes, self.total_delay, self.max_delay
+        if not payloads:
+            return f"{self.payload_format} batches: nothing sent yet"
+        elapsed = time.monotonic() - self.started
+        return (f"{self.payload_format} batches: {records} records in {payloads} messages "
+                f"({records / elapsed:.1f} records/s as {payloads / elapsed:.2f} msg/s, {records / payloads:.1f} records each), "
+                f"{bytes_sent / elapsed:,.0f} B/s vs {unbatched_bytes / elapsed:,.0f} B/s unbatched, "
+                f"added latency mean {total_delay / records:.1f} s max {max_delay:.1f} s")
@@ -0,0 +1,107 @@
+"""Stand-in MQTT broker for local load tests.
+
+Speaks enough MQTT 3.1.1 and 5 for the simulators: it accepts every CONNECT, completes the QoS 1
+(PUBACK) and QoS 2 (PUBREC / PUBREL / PUBCOMP) flows, answers pings and counts what arrives. It
+routes nothing, so throughput measured against it is the client side's limit.
+
+    python3 -m fleetsim.broker --port 1883
+"""
+import argparse
+import asyncio
+import collections
+import threading
+import time
+
+CONNECT, PUBLISH, PUBREL, PINGREQ, DISCONNECT = 1, 3, 6, 12, 14
+PUBACK, PUBREC, PUBCOMP = 0x40, 0x50, 0x70
+
+
+class StandInBroker:
+    def __init__(self, host="127.0.0.1", port=1883):
+        self.host = host
+        self.port = port
+        self.received = collections.Counter()  # QoS level -> PUBLISH packets received
+        self.connections = 0
+        self.loop = None
+        self.server = None
+
+    async def _read_packet(self, reader):
+        header = (await reader.readexactly(1))[0]
+        length, multiplier = 0, 1
+        while True:
+            byte = (await reader.readexactly(1))[0]
+            length += (byte & 0x7F) * multiplier
+            multiplier *= 128
+            if not byte & 0x80:
+                break
+        return header, await reader.readexactly(length)
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                header, body = await self._read_packet(reader)
+                kind = header >> 4
+                if kind == CONNECT:
+                    name_length = int.from_bytes(body[0:2], "big")
+                    level = body[2 + name_length]
+                    writer.write(b"\x20\x03\x00\x00\x00" if level == 5 else b"\x20\x02\x00\x00")
+                elif kind == PUBLISH:
+                    qos = (header >> 1) & 0x03
+                    self.received[qos] += 1
+                    if qos:
+                        topic_length = int.from_bytes(body[0:2], "big")
+                        mid = body[2 + topic_length:4 + topic_length]
+                        writer.write(bytes((PUBACK if qos == 1 else PUBREC, 2)) + mid)
+                elif kind == PUBREL:
+                    writer.write(bytes((PUBCOMP, 2)) + body[0:2])
+                elif kind == PINGREQ:
+                    writer.write(b"\xd0\x00")
+                elif kind == DISCONNECT:
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        async with self.server:
+            await self.server.serve_forever()
+
+    def start(self):
+        """Run on a daemon thread; returns once the port is bound (port 0 picks a free one)"""
+        ready = threading.Event()
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            self.loop.call_soon(ready.set)
+            try:
+                self.loop.run_until_complete(self.serve())
+            except asyncio.CancelledError:
+                pass
+
+        threading.Thread(target=run, name="stand-in-broker", daemon=True).start()
+        ready.wait()
+        while self.server is None or not self.server.sockets:
+            time.sleep(0.01)
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in MQTT broker that acknowledges and discards every publish")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=1883)
+    args = parser.parse_args()
+    broker = StandInBroker(args.host, args.port)
+    print(f"Stand-in broker listening on {args.host}:{args.port}")
+    try:
+        asyncio.run(broker.serve())
+    except KeyboardInterrupt:
+        print(f"Received {dict(broker.received)} publishes by QoS over {broker.connections} connections")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""Periodic checkpoints of device state, so a restarted simulator carries on where it stopped.
+
+A checkpoint is one uncompressed .npz file (NumPy's zip of .npy arrays): one typed column per
+state field plus a `key` column of device IDs, and whatever extra arrays a simulator adds (the
+ship simulator stores its generated routes). It is written to a temporary file, fsynced and
+renamed over the previous one, so a crash mid-write never leaves a torn checkpoint. Loading is a
+few array reads, milliseconds even for 50k devices.
+
+Records are dicts or objects; fields are dict keys or attribute paths such as
+"normal_operation.current_temp".
+
+    --checkpoint PATH          or CHECKPOINT_FILE; restore from PATH at start and save to it periodically
+    --checkpoint-every SECONDS or CHECKPOINT_EVERY (default 60); a last checkpoint is saved at exit
+"""
+import argparse
+import atexit
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import zipfile
+
+import numpy as np
+
+CHECKPOINT_FILE = os.environ.get("CHECKPOINT_FILE")
+CHECKPOINT_EVERY = float(os.environ.get("CHECKPOINT_EVERY", "60"))  # seconds
+
+logger = logging.getLogger(__name__)
+
+
+def add_arguments(parser):
+    parser.add_argument("--checkpoint", default=CHECKPOINT_FILE, metavar="PATH",
+                        help="Resume device state from PATH if it exists and checkpoint to it periodically")
+    parser.add_argument("--checkpoint-every", type=float, default=CHECKPOINT_EVERY, metavar="SECONDS",
+                        help="Seconds between checkpoints")
+
+
+def from_args(args):
+    if not args.checkpoint:
+        return None
+    return Checkpointer(args.checkpoint, args.checkpoint_every)
+
+
+def from_argv():
+    """For simulators without their own argument parser: pick the checkpoint flags out of sys.argv"""
+    parser = argparse.ArgumentParser(add_help=False)
+    add_arguments(parser)
+    args, _ = parser.parse_known_args()
+    return from_args(args)
+
+
+# Files
+def save(path, arrays):
+    """Write arrays to path atomically"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        np.savez(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def load(path):
+    """The arrays saved at path, or None if there is no readable checkpoint"""
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            return {name: data[name] for name in data.files}
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+        logger.warning(f"Ignoring unreadable checkpoint {path}: {e}")
+        return None
+
+
+# Device records <-> columns
+def _parent(record, field):
+    """The dict or object holding the last part of a dotted field, and that part's name"""
+    *parents, name = field.split(".")
+    for parent in parents:
+        record = record[parent] if isinstance(record, dict) else getattr(record, parent)
+    return record, name
+
+
+def columns(records, fields):
+    """{key: record} -> a key column plus one array per field"""
+    keys = list(records)
+    arrays = {"key": np.array(keys, dtype=str)}
+    for field in fields:
+        values = []
+        for key in keys:
+            holder, name = _parent(records[key], field)
+            values.append(holder[name] if isinstance(holder, dict) else getattr(holder, name))
+        arrays[field] = np.array(values)
+    return arrays
+
+
+def restore(records, arrays, fields):
+    """Copy saved fields back into the records with the same key; returns how many were restored"""
+    # Records dropped from the configuration since the checkpoint are skipped
+    targets = [record for record in map(records.get, arrays["key"].tolist()) if record is not None]
+    rows = [row for row, key in enumerate(arrays["key"].tolist()) if key in records]
+    for field in fields:
+        if field not in arrays:
+            continue
+        column = arrays[field].tolist()
+        for record, row in zip(targets, rows):
+            holder, name = _parent(record, field)
+            if isinstance(holder, dict):
+                holder[name] = column[row]
+            else:
+                setattr(holder, name, column[row])
+    return len(targets)
+
+
+def pack_routes(routes):
+    """Ragged [[(lat, lng), ...], ...] -> (points, counts) arrays"""
+    counts = np.array([len(route) for route in routes], dtype=np.int64)
+    points = np.array([point for route in routes for point in route], dtype=np.float64).reshape(-1, 2)
+    return points, counts
+
+
+def unpack_routes(points, counts):
+    bounds = np.concatenate(([0], np.cumsum(counts)))
+    return [[tuple(point) for point in points[start:end].tolist()] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def _exit_on_sigterm(signum, frame):
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)  # a repeated SIGTERM must not cut the exit checkpoint short
+    sys.exit(0)
+
+
+class Checkpointer:
+    """Saves `snapshot()` to a file every `every` seconds on a daemon thread, and once more at exit"""
+    def __init__(self, path, every=CHECKPOINT_EVERY):
+        self.path = path
+        self.every = every
+        self.snapshot = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        start = time.perf_counter()
+        arrays = load(self.path)
+        if arrays is not None:
+            logger.info(f"Loaded checkpoint {self.path} ({len(arrays.get('key', ()))} devices) in {(time.perf_counter() - start) * 1e3:.1f} ms")
+        return arrays
+
+    def save(self):
+        if self.snapshot is None:
+            return
+        with self.lock:
+            start = time.perf_counter()
+            try:
+                save(self.path, self.snapshot())
+            except Exception as e:
+                logger.error(f"Checkpoint to {self.path} failed: {e}")
+                return
+        logger.debug(f"Checkpoint saved to {self.path} in {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+    def start(self, snapshot):
+        self.snapshot = snapshot
+        atexit.register(self.save)
+        # A redeploy stops the container with SIGTERM: exit normally so the atexit checkpoint runs
+        if threading.current_thread() is threading.main_thread() and signal.getsignal(signal.SIGTERM) == signal.SIG_DFL:
+            signal.signal(signal.SIGTERM, _exit_on_sigterm)
+        threading.Thread(target=self._run, name="checkpoint", daemon=True).start()
+        return self
+
+    def _run(self):
+        while True:
+            time.sleep(self.every)
+            self.save()
+
+
+def resume(checkpointer, records, fields):
+    """Restore the records from the checkpoint, if any, and start checkpointing them"""
+    if checkpointer is None:
+        return 0
+    arrays = checkpointer.load()
+    restored = restore(records, arrays, fields) if arrays is not None else 0
+    if arrays is not None:
+        logger.info(f"Resumed {restored} of {len(records)} devices from {checkpointer.path}")
+    checkpointer.start(lambda: columns(records, fields))
+    return restored
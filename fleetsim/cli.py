@@ -0,0 +1,80 @@
+"""Single entry point for the simulators and the fleetsim tools.
+
+    python3 -m fleetsim fmc230 --dump 3
+    python3 -m fleetsim ship --profile 60
+    python3 -m fleetsim static 400000000000001
+    python3 -m fleetsim broker --port 1883
+
+The simulator scripts stay where their Dockerfiles expect them and are loaded by file path only
+for the command that runs, so `--help` or a fridge scenario never imports searoute, and importing
+a simulator module opens no connections: everything with side effects lives in its main().
+"""
+import argparse
+import importlib
+import importlib.util
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATIC_DEVICES_DIR = os.path.join(REPO_DIR, "Cryolytix Static Fridge Simulators", "devices")
+
+SIMULATORS = {
+    "fmc230": ("fmc230_simulator.py", "Fridges, boats and trucks from FRIDGES (fmc230_simulator.py)"),
+    "mixed": (os.path.join("MixedSimulator", "fmc230_simulator.py"), "The MixedSimulator copy of the FMC230 simulator"),
+    "ship": (os.path.join("ShipSimulator", "ship_simulator.py"), "Ships on searoute sea routes between their ports"),
+    "ship2": (os.path.join("ShipSimulator2", "ship_simulator.py"), "Ships on fixed waypoint routes, no searoute"),
+}
+TOOLS = {
+    "broker": ("fleetsim.broker", "Stand-in MQTT broker that acknowledges and discards every publish"),
+    "qos-report": ("fleetsim.qos_report", "Throughput and delivery at QoS 0, 1 and 2 against a broker"),
+    "mqtt5-savings": ("fleetsim.mqtt5", "Per-message and fleet-wide PUBLISH bytes, MQTT 3.1.1 vs MQTT 5"),
+}
+
+
+def static_devices():
+    try:
+        return sorted(name for name in os.listdir(STATIC_DEVICES_DIR) if name.isdigit())
+    except OSError:
+        return []
+
+
+def load_script(path, name=None):
+    """Import a repository script by path (absolute or relative to the repository root) without running its main()"""
+    path = os.path.join(REPO_DIR, path)
+    spec = importlib.util.spec_from_file_location(name or os.path.splitext(os.path.basename(path))[0], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def simulator_path(command, device_id=None):
+    if command == "static":
+        return os.path.join(STATIC_DEVICES_DIR, device_id, f"fmc230_simulator_{device_id}.py")
+    return os.path.join(REPO_DIR, SIMULATORS[command][0])
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    parser = argparse.ArgumentParser(prog="python3 -m fleetsim", description="Run a simulator or a fleetsim tool; "
+                                     "arguments after the command go to it (e.g. `fmc230 --help`)")
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    for name, (_, help_text) in {**SIMULATORS, **TOOLS}.items():
+        commands.add_parser(name, help=help_text, add_help=False)
+    static = commands.add_parser("static", help="One Cryolytix static freezer device script")
+    static.add_argument("device_id", help=f"Device directory, one of {', '.join(static_devices()) or 'none found'}")
+    args, rest = parser.parse_known_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 2
+
+    if args.command in TOOLS:
+        module = importlib.import_module(TOOLS[args.command][0])
+    else:
+        path = simulator_path(args.command, getattr(args, "device_id", None))
+        if not os.path.exists(path):
+            parser.error(f"No simulator script at {path}")
+        sys.path.insert(0, os.path.dirname(path))  # scripts import their neighbours (certs, configs) relative to themselves
+        module = load_script(path, f"fleetsim_{args.command.replace('-', '_')}")
+    sys.argv = [f"fleetsim {args.command}"] + rest
+    module.main()
+    return 0
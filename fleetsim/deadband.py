@@ -0,0 +1,128 @@
+"""Report-by-exception publishing, the way FMC230 devices configured for "send on change" behave.
+
+A DeadbandFilter remembers, per device, the last value sent for every IO ID and strips the
+fields that have not moved past their deadband. Deadbands are absolute (50 = 0.5 °C for the
+m°C temperature IOs) or a percentage of the last sent value ("5%"). Every `keyframe_every`
+packets a device sends its full packet so ThingsBoard never goes long without a complete state.
+
+The byte counts in report() are estimated without serializing: each device keeps the JSON size of
+every field as last sent, and a field left out counts at that size.
+"""
+import json
+import threading
+
+from fleetsim import metrics
+
+# Header fields of every AVL record, always sent with whatever changed
+ALWAYS_SENT = ("ts", "pr", "evt")
+
+# Deadbands in the units of the reported IO values; IO IDs not listed are sent on any change
+DEFAULT_DEADBANDS = {
+    "sp": 2,          # km/h
+    "alt": 5,         # m
+    "ang": 10,        # degrees
+    "sat": 2,
+    "21": 1,          # GSM Signal
+    "113": 5,         # Battery Level (%)
+    "66": "5%",       # External Voltage
+    "67": "2%",       # Device Battery Voltage
+    "10800": 50,      # EYE Temperature 1 (m°C)
+    "10801": 100,     # EYE Temperature 2 (m°C)
+    "10804": 5,       # EYE Humidity 1 (%)
+    "10824": 100,     # EYE Battery Voltage 1 (mV)
+}
+KEYFRAME_EVERY = 30  # packets
+ENVELOPE_BYTES = len(json.dumps({"state": {"reported": {}}}))
+
+
+def parse_deadband(value):
+    """50 -> ("abs", 50.0), "5%" -> ("pct", 5.0)"""
+    if isinstance(value, str) and value.endswith("%"):
+        return "pct", float(value[:-1])
+    return "abs", float(value)
+
+
+def value_bytes(value):
+    """Length of json.dumps(value) for the flat values of a packet"""
+    if value is True or value is None:
+        return 4
+    if value is False:
+        return 5
+    if isinstance(value, (int, float)):
+        return len(repr(value))
+    if isinstance(value, str) and value.isascii() and value.isprintable() and '"' not in value and "\\" not in value:
+        return len(value) + 2
+    return len(json.dumps(value))
+
+
+def payload_bytes(field_bytes):
+    """Length of {"state": {"reported": ...}} holding fields of these sizes, each `"key": value`"""
+    return ENVELOPE_BYTES + sum(field_bytes) + 2 * max(len(field_bytes) - 1, 0)
+
+
+class DeadbandFilter:
+    def __init__(self, device_type, deadbands=None, keyframe_every=KEYFRAME_EVERY):
+        self.device_type = device_type
+        self.deadbands = {key: parse_deadband(value) for key, value in (DEFAULT_DEADBANDS if deadbands is None else deadbands).items()}
+        self.keyframe_every = keyframe_every
+        self.last_sent = {}  # device -> {io_id: value}
+        self.packets_seen = {}  # device -> count
+        self.field_bytes = {}  # device -> {io_id: JSON size of `"io_id": value` as last sent}
+        self.lock = threading.Lock()
+        self.full_messages = 0
+        self.full_bytes = 0
+        self.sent_messages = 0
+        self.sent_bytes = 0
+        self.keyframes = 0
+
+    def changed(self, key, value, last):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not isinstance(last, (int, float)):
+            return value != last
+        kind, band = self.deadbands.get(key, ("abs", 0.0))
+        delta = abs(value - last)
+        if kind == "pct":
+            return delta >= abs(last) * band / 100 if band else delta > 0
+        return delta >= band if band else delta > 0
+
+    def filter(self, device, packet):
+        """Return the packet reduced to changed fields, or None if nothing worth sending changed"""
+        reported = packet["state"]["reported"]
+        with self.lock:
+            count = self.packets_seen.get(device, 0)
+            self.packets_seen[device] = count + 1
+            last = self.last_sent.setdefault(device, {})
+            keyframe = self.keyframe_every > 0 and count % self.keyframe_every == 0
+            if keyframe:
+                out = dict(reported)
+            else:
+                out = {key: value for key, value in reported.items()
+                       if key in ALWAYS_SENT or key not in last or self.changed(key, value, last[key])}
+                if all(key in ALWAYS_SENT for key in out):
+                    out = None
+            sizes = self.field_bytes.setdefault(device, {})
+            sent_size = 0
+            if out is not None:
+                last.update((key, value) for key, value in out.items() if key not in ALWAYS_SENT)
+                sent = [len(key) + 4 + value_bytes(value) for key, value in out.items()]
+                sizes.update(zip(out, sent))
+                sent_size = payload_bytes(sent)
+            full_size = payload_bytes(sizes.values())
+            self.full_messages += 1
+            self.full_bytes += full_size
+            if out is not None:
+                self.sent_messages += 1
+                self.sent_bytes += sent_size
+            self.keyframes += keyframe
+        metrics.FULL_PACKET_BYTES.inc(full_size, device_type=self.device_type)
+        if out is None:
+            metrics.MESSAGES_SUPPRESSED.inc(device_type=self.device_type)
+        return {"state": {"reported": out}} if out is not None else None
+
+    def report(self):
+        with self.lock:
+            full_messages, full_bytes = self.full_messages, self.full_bytes
+            sent_messages, sent_bytes, keyframes = self.sent_messages, self.sent_bytes, self.keyframes
+        if not full_messages:
+            return f"{self.device_type}: no packets yet"
+        return (f"{self.device_type}: {sent_messages}/{full_messages} messages ({1 - sent_messages / full_messages:.1%} fewer publishes), "
+                f"{sent_bytes}/{full_bytes} bytes ({1 - sent_bytes / full_bytes:.1%} less bandwidth), {keyframes} keyframes")
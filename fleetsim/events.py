@@ -0,0 +1,112 @@
+"""Event records, as FMC230 devices send them when an IO crosses a threshold or changes state.
+
+An EventEngine watches the IO values of each device's periodic records. When a trigger fires
+it builds a small event packet: the AVL header with evt set to the IO ID, plus that single
+IO (see sample_event_packets.json). PublishQueue hands events out ahead of periodic packets,
+so alarm latency can be measured while the periodic load is heavy.
+"""
+import itertools
+import queue
+import time
+
+from fleetsim import metrics
+
+EVENT = 0     # publish priorities, lowest first
+PERIODIC = 1
+
+EVENT_HEADER = ("ts", "pr", "latlng", "alt", "ang", "sat", "sp")
+
+
+class Change:
+    """Fires whenever the IO value changes, e.g. a door magnet opening or closing"""
+    def __init__(self, io_id):
+        self.io_id = io_id
+
+    def fires(self, value, state):
+        fired = "value" in state and value != state["value"]
+        state["value"] = value
+        return fired
+
+
+class Rising:
+    """Fires when the IO value goes from 0 to non-zero, e.g. a low battery flag being raised"""
+    def __init__(self, io_id):
+        self.io_id = io_id
+
+    def fires(self, value, state):
+        fired = "value" in state and not state["value"] and bool(value)
+        state["value"] = value
+        return fired
+
+
+class Excursion:
+    """Fires when the IO value leaves [low, high] and again when it is back inside by `hysteresis`"""
+    def __init__(self, io_id, low, high, hysteresis=0):
+        self.io_id = io_id
+        self.low = low
+        self.high = high
+        self.hysteresis = hysteresis
+
+    def fires(self, value, state):
+        outside = state.get("outside")
+        if outside:
+            now_outside = not (self.low + self.hysteresis <= value <= self.high - self.hysteresis)
+        else:
+            now_outside = not (self.low <= value <= self.high)
+        state["outside"] = now_outside
+        return outside is not None and now_outside != outside
+
+
+# Triggers per device type; temperature limits are in m°C like the 10800 IO
+DEFAULT_TRIGGERS = {
+    "static": [Excursion("10800", -2500, -1600, 100), Change("10808"), Rising("10820"), Change("252")],
+    "truck": [Excursion("10800", -2500, -1500, 100), Change("10808"), Rising("10820"), Change("252")],
+    "boat": [Excursion("10800", -2500, -1500, 100), Change("10808"), Rising("10820"), Change("252")],
+}
+
+
+class EventEngine:
+    def __init__(self, device_type, triggers=None):
+        self.device_type = device_type
+        self.triggers = DEFAULT_TRIGGERS.get(device_type, []) if triggers is None else triggers
+        self.states = {}  # device -> one state dict per trigger
+
+    def check(self, device, packet):
+        """Return the event packets the periodic `packet` triggers"""
+        reported = packet["state"]["reported"]
+        states = self.states.get(device)
+        if states is None:
+            states = self.states[device] = [{} for _ in self.triggers]
+        events = []
+        for trigger, state in zip(self.triggers, states):
+            value = reported.get(trigger.io_id)
+            if value is None or not trigger.fires(value, state):
+                continue
+            event = {key: reported[key] for key in EVENT_HEADER if key in reported}
+            event["ts"] = int(time.time() * 1000)
+            event["evt"] = int(trigger.io_id)
+            event[trigger.io_id] = value
+            events.append({"state": {"reported": event}})
+            metrics.EVENTS_TRIGGERED.inc(device_type=self.device_type, io=trigger.io_id)
+        return events
+
+
+class PublishQueue:
+    """Priority queue of packets waiting to be published; events come out before periodic packets"""
+    def __init__(self):
+        self.queue = queue.PriorityQueue()
+        self.sequence = itertools.count()  # keeps FIFO order within a priority
+
+    def put(self, priority, device, packet):
+        self.queue.put((priority, next(self.sequence), time.monotonic(), device, packet))
+
+    def drain(self):
+        """Yield (priority, device, packet) until the queue is empty, recording how long events waited"""
+        while True:
+            try:
+                priority, _, queued, device, packet = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            if priority == EVENT:
+                metrics.EVENT_QUEUE_LATENCY.observe(time.monotonic() - queued, device_type=device["type"])
+            yield priority, device, packet
@@ -0,0 +1,131 @@
+"""Fleet definitions from a JSON file, watched and diffed while a simulator runs.
+
+The file holds a list of device dicts keyed by "imei", in the same shape as a simulator's built-in
+list (routes as [[lat, lng], ...]). FleetWatcher.poll() notices a saved file by its mtime and size
+and returns what changed since the last version it read:
+  added    devices to connect
+  removed  devices to disconnect
+  changed  imei -> {key: new value} for keys whose configured value changed; keys a simulator
+           updates at runtime (position, progress) are left alone unless the file changes them
+A file that fails to parse or validate is logged and skipped; the fleet keeps running as it was.
+Validation covers every device before a diff is returned, so a simulator never applies half a file.
+"""
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def check_moving(device):
+    """Per-type rules: anything but a static device needs a route of 2+ [lat, lng] points and a speed"""
+    if device.get("type") == "static":
+        return
+    label = f"{device.get('type', 'device')} {device['imei']}"
+    route = device.get("route")
+    if not isinstance(route, (list, tuple)) or len(route) < 2:
+        raise ValueError(f"{label} needs a route of at least 2 points")
+    for point in route:
+        if not isinstance(point, (list, tuple)) or len(point) != 2 or not all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in point):
+            raise ValueError(f"{label} has a route point that is not [lat, lng]: {point!r}")
+    speeds = [key for key in ("speed_kmh", "speed_knots") if key in device]
+    if not speeds:
+        raise ValueError(f"{label} needs speed_kmh or speed_knots")
+    if not all(isinstance(device[key], (int, float)) and not isinstance(device[key], bool) for key in speeds):
+        raise ValueError(f"{label} has a speed that is not a number")
+
+
+def load_fleet(path, required=("imei",), validate=None):
+    """The devices in the fleet file; `validate(device)` raises ValueError for a device the simulator can't run"""
+    with open(path, "r", encoding="utf-8") as f:
+        devices = json.load(f)
+    if not isinstance(devices, list):
+        raise ValueError("the fleet file must hold a list of devices")
+    seen = set()
+    for index, device in enumerate(devices):
+        missing = [key for key in required if key not in device]
+        if missing:
+            raise ValueError(f"device {index} is missing {', '.join(missing)}")
+        if device["imei"] in seen:
+            raise ValueError(f"duplicate imei {device['imei']}")
+        seen.add(device["imei"])
+        if isinstance(device.get("route"), list):
+            device["route"] = [tuple(point) if isinstance(point, list) else point for point in device["route"]]
+        if validate:
+            validate(device)
+    return devices
+
+
+def save_fleet(path, devices, keys=None):
+    """Write devices (only `keys` of each, when given) as a fleet file"""
+    records = [{key: value for key, value in device.items() if keys is None or key in keys} for device in devices]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(records, f, indent=2)
+        f.write("\n")
+
+
+class FleetDiff:
+    def __init__(self, added=(), removed=(), changed=None):
+        self.added = list(added)
+        self.removed = list(removed)
+        self.changed = changed or {}
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+    def __str__(self):
+        return f"{len(self.added)} added, {len(self.removed)} removed, {len(self.changed)} changed"
+
+
+def diff(old, new):
+    """What turns the device list `old` into `new`"""
+    old_by_imei = {device["imei"]: device for device in old}
+    new_by_imei = {device["imei"]: device for device in new}
+    added = [device for imei, device in new_by_imei.items() if imei not in old_by_imei]
+    removed = [device for imei, device in old_by_imei.items() if imei not in new_by_imei]
+    changed = {}
+    for imei, device in new_by_imei.items():
+        previous = old_by_imei.get(imei)
+        if previous is None:
+            continue
+        updates = {key: value for key, value in device.items() if previous.get(key) != value}
+        if updates:
+            changed[imei] = updates
+    return FleetDiff(added, removed, changed)
+
+
+class FleetWatcher:
+    def __init__(self, path, required=("imei",), validate=None):
+        self.path = path
+        self.required = required
+        self.validate = validate
+        self.signature = None
+        self.devices = []
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self):
+        """Read the file for the first time; returns its devices"""
+        self.signature = self._signature()
+        self.devices = load_fleet(self.path, self.required, self.validate)
+        return self.devices
+
+    def poll(self):
+        """A FleetDiff when the file changed since the last read, otherwise None"""
+        signature = self._signature()
+        if signature is None or signature == self.signature:
+            return None
+        self.signature = signature
+        try:
+            devices = load_fleet(self.path, self.required, self.validate)
+        except (OSError, ValueError) as e:  # json.JSONDecodeError is a ValueError
+            logger.error(f"Ignoring fleet file {self.path}: {e}")
+            return None
+        changes = diff(self.devices, devices)
+        self.devices = devices
+        return changes
@@ -0,0 +1,226 @@
+"""Fleet-level version of IceCreamFreezerSimulator for tens of thousands of freezers.
+
+Every unit's state lives in NumPy arrays (struct of arrays) and one call to step() advances all of
+them by one 30 s cycle with masked operations, following the same rules as the per-object
+simulator: compressor hysteresis between min_temp and max_temp, a 2 minute start-up surge, door
+openings that spike humidity, and idle / running / peak power draw. Time is simulated, so a
+step does not depend on the wall clock.
+"""
+import numpy as np
+
+# Per-unit parameters and their IceCreamFreezerSimulator defaults; each can be overridden with a
+# scalar or an array holding one value per freezer
+PARAMETERS = {
+    "min_temp": -23.0,              # °C - compressor turns off
+    "max_temp": -17.0,              # °C - compressor turns on
+    "min_humidity": 40.0,
+    "max_humidity": 60.0,
+    "compressor_min_temp": 20.0,    # °C when running normally
+    "compressor_max_temp": 65.0,    # °C under load
+    "compressor_heat_rate": 8.0,    # °C per 30s when running
+    "compressor_cool_rate": 3.0,    # °C per 30s when off
+    "idle_power": 50.0,             # Watts - control systems, lights
+    "running_power": 350.0,         # Watts - compressor running
+    "peak_power": 450.0,            # Watts - startup surge
+    "cooling_rate": 0.15,           # °C per 30s when compressor running
+    "warming_rate": 0.08,           # °C per 30s when compressor off
+    "temp_variation": 0.1,          # Small random variations
+    "door_open_probability": 0.05,  # per cycle
+}
+
+STEP_SECONDS = 30.0
+SURGE_SECONDS = 120.0
+SWITCH_TOLERANCE = 1e-9  # °C, so a bound reached exactly despite float drift switches on that tick
+STATE = ("current_temp", "current_humidity", "compressor_temp", "power_consumption",
+         "compressor_on", "is_startup_surge", "compressor_start_time", "door_opened")
+
+
+class FreezerFleet:
+    """`count` freezers stepped together; keyword arguments override PARAMETERS per fleet or per unit"""
+    def __init__(self, count, seed=None, **overrides):
+        unknown = set(overrides) - set(PARAMETERS)
+        if unknown:
+            raise ValueError(f"Unknown freezer parameters: {', '.join(sorted(unknown))}")
+        self.count = count
+        self.rng = np.random.default_rng(seed)
+        for name, default in PARAMETERS.items():
+            value = np.asarray(overrides.get(name, default), dtype=np.float64)
+            setattr(self, name, np.broadcast_to(value, (count,)).copy())
+        if (self.min_temp >= self.max_temp).any():
+            raise ValueError("min_temp must be below max_temp for every freezer")
+
+        self.now = 0.0  # simulated seconds since start
+        self.current_temp = np.full(count, -20.0)
+        self.current_humidity = np.full(count, 50.0)
+        self.compressor_temp = np.full(count, 25.0)
+        self.power_consumption = np.zeros(count)
+        self.compressor_on = np.zeros(count, dtype=bool)
+        self.is_startup_surge = np.zeros(count, dtype=bool)
+        self.compressor_start_time = np.zeros(count)
+        self.door_opened = np.zeros(count, dtype=bool)
+
+    def step(self, seconds=STEP_SECONDS):
+        """Advance every freezer by one cycle"""
+        self.now += seconds
+        rng = self.rng
+        n = self.count
+
+        # Chamber temperature and compressor hysteresis
+        on = self.compressor_on
+        variation = rng.uniform(-1.0, 1.0, n) * self.temp_variation
+        temp = np.where(on, self.current_temp - (self.cooling_rate + variation),
+                        self.current_temp + (self.warming_rate + variation))
+        switch_off = on & (temp <= self.min_temp + SWITCH_TOLERANCE)
+        switch_on = ~on & (temp >= self.max_temp - SWITCH_TOLERANCE)
+        temp = np.where(switch_off, self.min_temp, temp)
+        temp = np.where(switch_on, self.max_temp, temp)
+        self.current_temp = temp
+        on = (on & ~switch_off) | switch_on
+        self.compressor_on = on
+        self.compressor_start_time = np.where(switch_on, self.now, self.compressor_start_time)
+        self.is_startup_surge |= switch_on
+
+        # Humidity: rises while off, falls while running, spikes when a door opens
+        change = np.where(on, rng.uniform(-1.0, 0.5, n), rng.uniform(0.5, 1.5, n))
+        self.door_opened = rng.random(n) < self.door_open_probability
+        change += np.where(self.door_opened, rng.uniform(5.0, 15.0, n), 0.0)
+        self.current_humidity = np.clip(self.current_humidity + change, self.min_humidity, self.max_humidity)
+
+        # Compressor temperature: double heating during the surge, which ends after 2 minutes
+        surge = on & self.is_startup_surge
+        heating = np.where(surge, self.compressor_heat_rate * 2, self.compressor_heat_rate)
+        self.is_startup_surge = surge & ~(self.now - self.compressor_start_time > SURGE_SECONDS)
+        self.compressor_temp = np.where(
+            on,
+            np.minimum(self.compressor_temp + heating, self.compressor_max_temp),
+            np.maximum(self.compressor_temp - self.compressor_cool_rate, self.compressor_min_temp),
+        )
+
+        # Power draw
+        running = self.running_power + rng.uniform(-20.0, 20.0, n)
+        self.power_consumption = np.where(on, np.where(self.is_startup_surge, self.peak_power, running), self.idle_power)
+        return self
+
+    def advance(self, seconds):
+        """Jump every freezer forward by `seconds` in closed form.
+
+        Over whole 30 s ticks this gives what step() would with the random variation left out. Between
+        events the temperatures move by the same amount every tick, so each pass of the loop jumps
+        every unit through the ticks before its next event (a compressor switch when the chamber
+        reaches min_temp or max_temp, or the end of the start-up surge) and then runs that tick. The
+        cost is the number of state transitions, not the number of ticks. Humidity follows its mean
+        drift and a door opening anywhere in the interval adds one spike. A remainder shorter than a
+        tick moves the temperatures part of the way, without events.
+        """
+        seconds = float(seconds)
+        n = self.count
+        start = self.now
+        ticks = int(seconds // STEP_SECONDS)
+        remaining = np.full(n, float(ticks))
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            while True:
+                active = remaining > 0
+                if not active.any():
+                    break
+                on = self.compressor_on
+                surge = on & self.is_startup_surge
+                now = start + (ticks - remaining) * STEP_SECONDS
+
+                # Tick of each unit's next event, counting the next tick as 1
+                to_switch = np.ceil(np.where(on, (self.current_temp - self.min_temp - SWITCH_TOLERANCE) / self.cooling_rate,
+                                             (self.max_temp - SWITCH_TOLERANCE - self.current_temp) / self.warming_rate))
+                to_switch = np.maximum(np.nan_to_num(to_switch, nan=np.inf), 1.0)
+                to_surge_end = np.where(surge, np.maximum(np.floor((self.compressor_start_time + SURGE_SECONDS - now) / STEP_SECONDS) + 1, 1.0),
+                                        np.inf)
+                event = np.where(active, np.minimum(np.minimum(to_switch, to_surge_end), remaining), 0.0)
+
+                # The ticks before it, all alike
+                self._drift(np.maximum(event - 1, 0.0), on, surge)
+
+                # The event tick, as step() runs it
+                switch_off = active & on & (to_switch == event)
+                switch_on = active & ~on & (to_switch == event)
+                self._drift(active.astype(np.float64), on, surge, chamber_only=True)
+                self.current_temp = np.where(switch_off, self.min_temp, np.where(switch_on, self.max_temp, self.current_temp))
+                on = (on & ~switch_off) | switch_on
+                self.compressor_on = on
+                tick_time = now + event * STEP_SECONDS
+                self.compressor_start_time = np.where(switch_on, tick_time, self.compressor_start_time)
+                surge = on & (self.is_startup_surge | switch_on)
+                self._drift(active.astype(np.float64), on, surge, compressor_only=True)
+                self.is_startup_surge = np.where(active, surge & ~(tick_time - self.compressor_start_time > SURGE_SECONDS),
+                                                 self.is_startup_surge)
+                remaining -= event
+
+        partial = seconds / STEP_SECONDS - ticks
+        if partial > 0:
+            on = self.compressor_on
+            self._drift(np.full(n, partial), on, on & self.is_startup_surge)
+            self.current_temp = np.clip(self.current_temp, self.min_temp, self.max_temp)
+
+        door_ticks = max(ticks, 1)
+        self.door_opened = self.rng.binomial(door_ticks, np.clip(self.door_open_probability, 0.0, 1.0)) > 0
+        spike = np.where(self.door_opened, self.rng.uniform(5.0, 15.0, n), 0.0)
+        self.current_humidity = np.clip(self.current_humidity + spike, self.min_humidity, self.max_humidity)
+
+        self.now = start + seconds
+        self.power_consumption = np.where(self.compressor_on, np.where(self.is_startup_surge, self.peak_power, self.running_power),
+                                          self.idle_power)
+        return self
+
+    def _drift(self, ticks, on, surge, chamber_only=False, compressor_only=False):
+        """Move each unit's temperatures and humidity by `ticks` ticks of its mean per-tick change"""
+        if not compressor_only:
+            self.current_temp = np.where(on, self.current_temp - self.cooling_rate * ticks, self.current_temp + self.warming_rate * ticks)
+        if chamber_only:
+            return
+        self.current_humidity = np.clip(self.current_humidity + np.where(on, -0.25, 1.0) * ticks, self.min_humidity, self.max_humidity)
+        heating = np.where(surge, self.compressor_heat_rate * 2, self.compressor_heat_rate)
+        self.compressor_temp = np.where(
+            on,
+            np.minimum(self.compressor_temp + heating * ticks, self.compressor_max_temp),
+            np.maximum(self.compressor_temp - self.compressor_cool_rate * ticks, self.compressor_min_temp),
+        )
+
+    def state(self):
+        """Per-unit state and parameters as arrays, for fleetsim.checkpoint.save"""
+        arrays = {name: getattr(self, name) for name in STATE}
+        for name in PARAMETERS:
+            values = getattr(self, name)
+            arrays[name] = values[:1] if values.size and values.min() == values.max() else values  # one value when fleet-wide
+        arrays["now"] = np.array(self.now)
+        return arrays
+
+    @classmethod
+    def from_state(cls, arrays, seed=None):
+        """A fleet carrying on from a saved state()"""
+        fleet = cls(len(arrays["current_temp"]), seed, **{name: arrays[name] for name in PARAMETERS if name in arrays})
+        for name in STATE:
+            setattr(fleet, name, arrays[name].copy())
+        fleet.now = float(arrays["now"])
+        return fleet
+
+    def generate_sensor_readings(self):
+        """Step once and return the readings as arrays, like IceCreamFreezerSimulator.generate_sensor_readings"""
+        self.step()
+        return self.readings()
+
+    def readings(self):
+        return {
+            "chamber_temperature": np.round(self.current_temp, 1),
+            "chamber_humidity": np.round(self.current_humidity, 1),
+            "compressor_temperature": np.round(self.compressor_temp, 1),
+            "power_consumption": np.round(self.power_consumption, 1),
+            "compressor_on": self.compressor_on.copy(),
+            "compressor_runtime": np.where(self.compressor_on, np.round((self.now - self.compressor_start_time) / 60, 1), 0.0),
+        }
+
+    def telemetry(self):
+        """EYE IO values for the freezer fields of the static freezer packet"""
+        readings = self.readings()
+        return {
+            "10800": (readings["chamber_temperature"] * 100).astype(np.int64),     # EYE Inside Temperature 1 (m°C)
+            "10804": readings["chamber_humidity"].astype(np.int64),                # EYE Humidity 1 (%)
+            "10801": (readings["compressor_temperature"] * 100).astype(np.int64),  # EYE Compressor Temperature 1 (m°C)
+        }
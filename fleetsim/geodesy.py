@@ -0,0 +1,150 @@
+"""Great-circle geometry for the simulators, on NumPy arrays.
+
+All functions take degrees and accept scalars or arrays. RouteSet holds the routes of a whole
+fleet in flat arrays with the trig of every point (radians, cos(lat), unit vector) and the
+length, angle and bearing of every segment computed once, so a tick only does the per-vehicle
+work: pick the segment, slerp along it and read the cached bearing.
+
+The scalar_* functions do the same for one pair of points with `math`, for the per-ship threads
+that move one vehicle at a time, where a NumPy call on scalars costs more than the trig itself.
+"""
+import math
+
+import numpy as np
+
+EARTH_RADIUS = 6371.0  # km
+
+
+def unit_vectors(lat, lng):
+    """Cartesian unit vectors (..., 3) for points in degrees"""
+    lat = np.radians(lat)
+    lng = np.radians(lng)
+    cos_lat = np.cos(lat)
+    return np.stack((cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)), axis=-1)
+
+
+def _to_lat_lng(vectors):
+    x, y, z = vectors[..., 0], vectors[..., 1], vectors[..., 2]
+    return np.degrees(np.arctan2(z, np.hypot(x, y))), np.degrees(np.arctan2(y, x))
+
+
+def _haversine(lat1, lng1, cos_lat1, lat2, lng2, cos_lat2):
+    a = np.sin((lat2 - lat1) / 2) ** 2 + cos_lat1 * cos_lat2 * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))  # central angle, radians
+
+
+def _bearing(lat1, lng1, cos_lat1, lat2, lng2, cos_lat2):
+    dlng = lng2 - lng1
+    y = np.sin(dlng) * cos_lat2
+    x = cos_lat1 * np.sin(lat2) - np.sin(lat1) * cos_lat2 * np.cos(dlng)
+    return np.degrees(np.arctan2(y, x)) % 360
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    """Great-circle distance in km"""
+    lat1, lng1, lat2, lng2 = np.radians(lat1), np.radians(lng1), np.radians(lat2), np.radians(lng2)
+    return EARTH_RADIUS * _haversine(lat1, lng1, np.cos(lat1), lat2, lng2, np.cos(lat2))
+
+
+def initial_bearing(lat1, lng1, lat2, lng2):
+    """Compass heading (0-360 degrees) leaving point 1 towards point 2, as reported in `ang`"""
+    lat1, lng1, lat2, lng2 = np.radians(lat1), np.radians(lng1), np.radians(lat2), np.radians(lng2)
+    return _bearing(lat1, lng1, np.cos(lat1), lat2, lng2, np.cos(lat2))
+
+
+def _slerp(start, end, omega, sin_omega, fraction):
+    fraction = np.asarray(fraction, dtype=np.float64)[..., None]
+    omega = omega[..., None]
+    sin_omega = sin_omega[..., None]
+    short = sin_omega < 1e-12  # coincident points: nothing to interpolate
+    safe = np.where(short, 1.0, sin_omega)
+    vectors = np.where(short, start + (end - start) * fraction,
+                       (np.sin((1 - fraction) * omega) * start + np.sin(fraction * omega) * end) / safe)
+    return _to_lat_lng(vectors)
+
+
+def slerp(lat1, lng1, lat2, lng2, fraction):
+    """Point `fraction` of the way along the great circle from point 1 to point 2"""
+    start = unit_vectors(lat1, lng1)
+    end = unit_vectors(lat2, lng2)
+    omega = np.arccos(np.clip(np.sum(start * end, axis=-1), -1.0, 1.0))
+    return _slerp(start, end, omega, np.sin(omega), fraction)
+
+
+def scalar_haversine(lat1, lng1, lat2, lng2):
+    """haversine() for one pair of points, as a float"""
+    lat1, lng1, lat2, lng2 = math.radians(lat1), math.radians(lng1), math.radians(lat2), math.radians(lng2)
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return EARTH_RADIUS * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def scalar_initial_bearing(lat1, lng1, lat2, lng2):
+    """initial_bearing() for one pair of points, as a float"""
+    lat1, lng1, lat2, lng2 = math.radians(lat1), math.radians(lng1), math.radians(lat2), math.radians(lng2)
+    dlng = lng2 - lng1
+    y = math.sin(dlng) * math.cos(lat2)
+    x = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(dlng)
+    return math.degrees(math.atan2(y, x)) % 360
+
+
+def scalar_slerp(lat1, lng1, lat2, lng2, fraction):
+    """slerp() for one pair of points, as a (lat, lng) tuple of floats"""
+    lat1, lng1, lat2, lng2 = math.radians(lat1), math.radians(lng1), math.radians(lat2), math.radians(lng2)
+    start = (math.cos(lat1) * math.cos(lng1), math.cos(lat1) * math.sin(lng1), math.sin(lat1))
+    end = (math.cos(lat2) * math.cos(lng2), math.cos(lat2) * math.sin(lng2), math.sin(lat2))
+    omega = math.acos(min(max(sum(a * b for a, b in zip(start, end)), -1.0), 1.0))
+    sin_omega = math.sin(omega)
+    if sin_omega < 1e-12:  # coincident points: nothing to interpolate
+        x, y, z = (a + (b - a) * fraction for a, b in zip(start, end))
+    else:
+        weight1, weight2 = math.sin((1 - fraction) * omega) / sin_omega, math.sin(fraction * omega) / sin_omega
+        x, y, z = (weight1 * a + weight2 * b for a, b in zip(start, end))
+    return math.degrees(math.atan2(z, math.hypot(x, y))), math.degrees(math.atan2(y, x))
+
+
+def path_length(points):
+    """Total great-circle length in km of a [(lat, lng), ...] path"""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if len(points) < 2:
+        return 0.0
+    return float(haversine(points[:-1, 0], points[:-1, 1], points[1:, 0], points[1:, 1]).sum())
+
+
+class RouteSet:
+    """The routes of a fleet, one per vehicle, with per-point and per-segment trig cached"""
+    def __init__(self, routes):
+        routes = [np.asarray(route, dtype=np.float64).reshape(-1, 2) for route in routes]
+        if any(len(route) < 2 for route in routes):
+            raise ValueError("Every route needs at least two points")
+        counts = np.array([len(route) - 1 for route in routes])
+        points = np.concatenate(routes)
+        self.segment_counts = counts
+        self.first_segment = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+        lat = np.radians(points[:, 0])
+        lng = np.radians(points[:, 1])
+        cos_lat = np.cos(lat)
+        vectors = unit_vectors(points[:, 0], points[:, 1])
+
+        # Segment i of route r runs from point (first point of r + i) to the next one
+        point_offsets = np.concatenate(([0], np.cumsum(counts + 1)[:-1]))
+        starts = np.concatenate([np.arange(count) + offset for count, offset in zip(counts, point_offsets)])
+        ends = starts + 1
+        self.start_vectors = vectors[starts]
+        self.end_vectors = vectors[ends]
+        self.omega = _haversine(lat[starts], lng[starts], cos_lat[starts], lat[ends], lng[ends], cos_lat[ends])
+        self.sin_omega = np.sin(self.omega)
+        self.length = EARTH_RADIUS * self.omega  # km
+        self.bearing = _bearing(lat[starts], lng[starts], cos_lat[starts], lat[ends], lng[ends], cos_lat[ends])
+        self.reverse_bearing = _bearing(lat[ends], lng[ends], cos_lat[ends], lat[starts], lng[starts], cos_lat[starts])
+
+    def segments(self, progress):
+        """Flat segment index and fraction along it for each vehicle's progress (0-1 over its whole route)"""
+        scaled = np.clip(progress, 0.0, 1.0) * self.segment_counts
+        index = np.minimum(scaled.astype(np.int64), self.segment_counts - 1)
+        return self.first_segment + index, scaled - index
+
+    def positions(self, segments, fraction):
+        """(lat, lng) arrays `fraction` of the way along each segment"""
+        return _slerp(self.start_vectors[segments], self.end_vectors[segments],
+                      self.omega[segments], self.sin_omega[segments], fraction)
@@ -0,0 +1,196 @@
+"""Geofences around ports, depots and customer sites, with enter and exit events for moving units.
+
+A site is a dict with "id", "kind" ("port", "depot", "site"...), "lat", "lng" and "radius_km".
+Sites are told apart by (kind, id), so one place can be both a port and a depot.
+GeofenceIndex buckets the sites into a lat/lng grid: each site is filed under every cell its
+circle reaches, so a point only tests the few sites of its own cell - one array lookup per point
+instead of a scan over all sites, for a whole fleet at once.
+
+GeofenceTracker keeps which sites each unit is inside between ticks and turns the difference
+into events: (unit, site, entered, dwell), dwell being the seconds spent inside on exit. Event
+packets follow the FMC230 geozone records: the AVL header with evt 155 and "155" 1 on entry,
+0 on exit, plus the site's id under "geofence".
+"""
+import math
+import threading
+import time
+
+import numpy as np
+
+from fleetsim import events, geodesy, metrics
+
+CELL_DEGREES = 0.5
+GEOFENCE_IO = "155"  # FMC230 "Geofence zone" IO
+KM_PER_DEGREE = geodesy.EARTH_RADIUS * np.pi / 180
+
+
+def _dedupe(sites):
+    """Sites with distinct (kind, id), first one wins"""
+    seen = {}
+    for site in sites:
+        seen.setdefault((site["kind"], site["id"]), site)
+    return list(seen.values())
+
+
+class GeofenceIndex:
+    def __init__(self, sites, cell_degrees=CELL_DEGREES):
+        self.sites = _dedupe(sites)
+        self.cell_degrees = cell_degrees
+        self.columns = int(np.ceil(360 / cell_degrees))
+        lat = np.array([site["lat"] for site in self.sites], dtype=np.float64)
+        lng = np.array([site["lng"] for site in self.sites], dtype=np.float64)
+        radius = np.array([site["radius_km"] for site in self.sites], dtype=np.float64)
+        self.vectors = geodesy.unit_vectors(lat, lng).reshape(-1, 3)
+        self.min_cos = np.cos(radius / geodesy.EARTH_RADIUS)  # inside when the central angle's cosine is at least this
+
+        # File each site under every cell its bounding box touches, wrapping round the antimeridian
+        keys, owners = [], []
+        for index, (site_lat, site_lng, site_radius) in enumerate(zip(lat.tolist(), lng.tolist(), radius.tolist())):
+            lat_span = site_radius / KM_PER_DEGREE
+            lng_span = min(180.0, lat_span / max(np.cos(np.radians(min(abs(site_lat) + lat_span, 90.0))), 1e-9))
+            first_row, last_row = self._row(max(site_lat - lat_span, -90.0)), self._row(min(site_lat + lat_span, 90.0))
+            first_column = int(np.floor((site_lng - lng_span + 180) / cell_degrees))
+            last_column = int(np.floor((site_lng + lng_span + 180) / cell_degrees))
+            columns = {column % self.columns for column in range(first_column, min(last_column, first_column + self.columns - 1) + 1)}
+            for row in range(first_row, last_row + 1):
+                for column in columns:
+                    keys.append(row * self.columns + column)
+                    owners.append(index)
+        keys = np.array(keys, dtype=np.int64)
+        owners = np.array(owners, dtype=np.int64)
+        order = np.argsort(keys, kind="stable")
+        self.cell_sites = owners[order]  # sites grouped by cell
+        self.cell_keys, self.cell_start, self.cell_count = np.unique(keys[order], return_index=True, return_counts=True)
+        # The same grid as a dict for single points, where NumPy's per-call overhead would dominate
+        self.cells = {}
+        for key, owner in zip(keys.tolist(), owners.tolist()):
+            self.cells.setdefault(key, []).append((owner, *self.vectors[owner].tolist(), float(self.min_cos[owner])))
+
+    def _row(self, lat):
+        return int(np.floor((lat + 90) / self.cell_degrees))
+
+    def _cells(self, lat, lng):
+        rows = np.floor((lat + 90) / self.cell_degrees).astype(np.int64)
+        columns = np.floor((lng + 180) / self.cell_degrees).astype(np.int64) % self.columns
+        return rows * self.columns + columns
+
+    def query(self, lat, lng):
+        """(points, sites): index arrays of every point inside a site's fence, one entry per pair"""
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lng = np.atleast_1d(np.asarray(lng, dtype=np.float64))
+        empty = np.zeros(0, dtype=np.int64)
+        if not self.sites or not len(lat):
+            return empty, empty
+        cells = self._cells(lat, lng)
+        slot = np.minimum(np.searchsorted(self.cell_keys, cells), len(self.cell_keys) - 1)
+        hit = np.flatnonzero(self.cell_keys[slot] == cells)
+        if not len(hit):
+            return empty, empty
+        # One candidate row per (point, site filed in its cell)
+        counts = self.cell_count[slot[hit]]
+        points = np.repeat(hit, counts)
+        offsets = np.arange(len(points)) - np.repeat(np.cumsum(counts) - counts, counts)
+        sites = self.cell_sites[np.repeat(self.cell_start[slot[hit]], counts) + offsets]
+        vectors = geodesy.unit_vectors(lat[points], lng[points])
+        inside = np.einsum("ij,ij->i", vectors, self.vectors[sites]) >= self.min_cos[sites]
+        return points[inside], sites[inside]
+
+    def point_sites(self, lat, lng):
+        """Indexes of the sites whose fence contains one point"""
+        row = math.floor((lat + 90) / self.cell_degrees)
+        column = math.floor((lng + 180) / self.cell_degrees) % self.columns
+        candidates = self.cells.get(row * self.columns + column)
+        if not candidates:
+            return []
+        lat, lng = math.radians(lat), math.radians(lng)
+        x, y, z = math.cos(lat) * math.cos(lng), math.cos(lat) * math.sin(lng), math.sin(lat)
+        return [site for site, site_x, site_y, site_z, min_cos in candidates if x * site_x + y * site_y + z * site_z >= min_cos]
+
+    def sites_at(self, lat, lng):
+        """The sites whose fence contains one point"""
+        return [self.sites[site] for site in self.point_sites(lat, lng)]
+
+
+class GeofenceTracker:
+    """Which sites each of `units` (ids, e.g. IMEIs) is inside, and the events when that changes.
+
+    Membership is a sorted array of unit row * site count + site index codes with the time each
+    was entered, so a tick's changes come from array set operations rather than per-unit state.
+    """
+    def __init__(self, index, units, previous=None):
+        self.index = index
+        self.units = list(units)
+        self.site_count = max(1, len(index.sites))
+        self.lock = threading.Lock()
+        self.codes = np.zeros(0, dtype=np.int64)
+        self.since = np.zeros(0, dtype=np.float64)  # time each code was entered
+        if previous is not None:
+            # Carry membership over from a tracker of the old fleet, so a reload doesn't re-enter everything
+            rows = {unit: row for row, unit in enumerate(self.units)}
+            sites = {(site["kind"], site["id"]): site_index for site_index, site in enumerate(index.sites)}
+            carried = {}
+            for code, entered in zip(previous.codes.tolist(), previous.since.tolist()):
+                unit = previous.units[code // previous.site_count]
+                site = previous.index.sites[code % previous.site_count]
+                if unit in rows and (site["kind"], site["id"]) in sites:
+                    carried[rows[unit] * self.site_count + sites[site["kind"], site["id"]]] = entered
+            self.codes = np.array(sorted(carried), dtype=np.int64)
+            self.since = np.array([carried[code] for code in self.codes.tolist()], dtype=np.float64)
+
+    def update(self, lat, lng, rows=None, now=None):
+        """Positions of all units, or of the units at `rows`; returns [(unit, site, entered, dwell), ...]"""
+        now = time.time() if now is None else now
+        points, sites = self.index.query(lat, lng)
+        if rows is not None:
+            rows = np.atleast_1d(np.asarray(rows, dtype=np.int64))
+            points = rows[points]
+        codes = np.unique(points * self.site_count + sites)
+        with self.lock:
+            left = ~np.isin(self.codes, codes, assume_unique=True)
+            if rows is not None:
+                left &= np.isin(self.codes // self.site_count, rows)
+            entered = codes[~np.isin(codes, self.codes, assume_unique=True)]
+            exits, dwell = self.codes[left], now - self.since[left]
+            merged = np.concatenate((self.codes[~left], entered))
+            order = np.argsort(merged, kind="stable")
+            self.codes = merged[order]
+            self.since = np.concatenate((self.since[~left], np.full(len(entered), now)))[order]
+        changes = [(code, False, duration) for code, duration in zip(exits.tolist(), dwell.tolist())]
+        changes += [(code, True, 0.0) for code in entered.tolist()]
+        return [(self.units[code // self.site_count], self.index.sites[code % self.site_count], is_entry, duration)
+                for code, is_entry, duration in changes]
+
+    def seed(self, lat, lng, rows=None, now=None):
+        """Take the sites at these positions as already entered, without events, e.g. for units resumed mid-route"""
+        self.update(lat, lng, rows, now)
+
+    def update_one(self, row, lat, lng, now=None):
+        """update() for a single unit, e.g. from its own thread"""
+        codes = sorted(row * self.site_count + site for site in self.index.point_sites(lat, lng))
+        with self.lock:
+            first, last = np.searchsorted(self.codes, (row * self.site_count, (row + 1) * self.site_count))
+            if self.codes[first:last].tolist() == codes:
+                return []
+        return self.update([lat], [lng], rows=[row], now=now)
+
+    def sites_of(self, row):
+        """The sites unit `row` is inside"""
+        with self.lock:
+            first, last = np.searchsorted(self.codes, (row * self.site_count, (row + 1) * self.site_count))
+            return [self.index.sites[code % self.site_count] for code in self.codes[first:last].tolist()]
+
+
+def record(device_type, site, entered, dwell):
+    metrics.GEOFENCE_EVENTS.inc(device_type=device_type, kind=site["kind"], event="enter" if entered else "exit")
+    if not entered:
+        metrics.GEOFENCE_DWELL.observe(dwell, device_type=device_type, kind=site["kind"])
+
+
+def event_packet(reported, site, entered):
+    """A geozone event record from the header fields of a unit's current `reported` values"""
+    event = {key: reported[key] for key in events.EVENT_HEADER if key in reported}
+    event["ts"] = int(time.time() * 1000)
+    event["evt"] = int(GEOFENCE_IO)
+    event[GEOFENCE_IO] = 1 if entered else 0
+    event["geofence"] = site["id"]
+    return {"state": {"reported": event}}
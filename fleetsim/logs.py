@@ -0,0 +1,113 @@
+"""Queue-backed logging for the simulators.
+
+Publishing threads (and paho's network threads) only put records on a bounded queue; a
+background listener formats and writes them, so terminal I/O never stalls a publish loop.
+
+LOG_MODE selects what reaches the console:
+  full     every record
+  sampled  one in LOG_SAMPLE_EVERY records per device, plus fleet summaries
+  summary  no per-device records, only start-up messages, warnings and fleet summaries
+  quiet    nothing at all (benchmarks)
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from fleetsim import metrics
+
+LOG_MODE = os.environ.get("LOG_MODE", "full")
+SAMPLE_EVERY = int(os.environ.get("LOG_SAMPLE_EVERY", "100"))
+SUMMARY_INTERVAL = float(os.environ.get("LOG_SUMMARY_INTERVAL", "60"))  # seconds, 0 to disable
+QUEUE_SIZE = 10000
+LOG_FORMAT = "%(asctime)s %(levelname)s %(message)s"
+
+
+class DeviceSampler(logging.Filter):
+    """Passes one in `every` records per device (records logged with extra={"device": imei}).
+
+    every <= 0 drops all per-device records. Warnings and errors always pass.
+    """
+    def __init__(self, every):
+        super().__init__()
+        self.every = every
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        device = getattr(record, "device", None)
+        if device is None or record.levelno >= logging.WARNING:
+            return True
+        if self.every <= 0:
+            return False
+        with self.lock:
+            count = self.counts.get(device, 0)
+            self.counts[device] = count + 1
+        return count % self.every == 0
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands records to the listener unformatted and drops them rather than block when the queue is full"""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _summarize(logger, handler, interval):
+    previous = {}
+    while True:
+        time.sleep(interval)
+        generated = metrics.MESSAGES_GENERATED.snapshot()
+        published = metrics.MESSAGES_PUBLISHED.snapshot()
+        inflight = metrics.INFLIGHT.snapshot()
+        parts = []
+        for device_type, total in sorted(generated.items()):
+            rate = (total - previous.get(device_type, 0)) / interval
+            parts.append(f"{device_type}: {total} sent ({rate:.1f}/s), {published.get(device_type, 0)} acked, "
+                         f"{inflight.get(device_type, 0)} in flight")
+        previous = generated
+        if parts:
+            logger.info("Fleet totals | %s | %d log lines dropped", " | ".join(parts), handler.dropped)
+
+
+def setup_logging(name, mode=None):
+    """Route all logging through the background writer and return the simulator's logger"""
+    mode = mode or LOG_MODE
+    logger = logging.getLogger(name)
+    if mode == "quiet":
+        logging.disable(logging.CRITICAL)
+        return logger
+
+    log_queue = queue.Queue(QUEUE_SIZE)
+    handler = NonBlockingQueueHandler(log_queue)
+    if mode == "sampled":
+        handler.addFilter(DeviceSampler(SAMPLE_EVERY))
+    elif mode == "summary":
+        handler.addFilter(DeviceSampler(0))
+
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(LOG_FORMAT))
+    listener = QueueListener(log_queue, console, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(logging.INFO)
+
+    if mode != "full" and SUMMARY_INTERVAL > 0:
+        threading.Thread(target=_summarize, args=(logger, handler, SUMMARY_INTERVAL),
+                         name="log-summary", daemon=True).start()
+    return logger
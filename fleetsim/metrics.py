@@ -0,0 +1,302 @@
+"""Prometheus text-format metrics for the simulators, served from a background HTTP thread.
+
+Counters are totals; Grafana gets per-second rates with rate(), e.g.
+rate(sim_messages_published_total[1m]) by (device_type).
+"""
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MQTT_ERR_SUCCESS = 0  # paho.mqtt.client return codes, kept here so metrics has no paho dependency
+MQTT_ERR_QUEUE_SIZE = 15
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+OVERRUN_BUCKETS = (0.01, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DWELL_BUCKETS = (60, 300, 900, 1800, 3600, 7200, 10800, 21600, 86400)
+
+REGISTRY = []
+IMPORTED = time.monotonic()
+
+logger = logging.getLogger(__name__)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple((name, labels[name]) for name in self.label_names)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self.lock:
+            return {dict(key).get("device_type", ""): value for key, value in self.values.items()}
+
+    def render(self):
+        with self.lock:
+            items = list(self.values.items())
+        return [f"{self.name}{_format_labels(key)} {value}" for key, value in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Counter):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += 1
+            state[2] += value
+
+    def render(self):
+        with self.lock:
+            items = [(key, (list(counts), count, total)) for key, (counts, count, total) in self.values.items()]
+        lines = []
+        for key, (counts, count, total) in items:
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', bound),))} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+        return lines
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help_text}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Simulator metrics
+MESSAGES_GENERATED = Counter("sim_messages_generated_total", "Packets generated and handed to the MQTT client", ("device_type",))
+MESSAGES_PUBLISHED = Counter("sim_messages_published_total", "Publishes confirmed by on_publish (PUBACK for QoS 1)", ("device_type",))
+BYTES_SENT = Counter("sim_bytes_sent_total", "Topic and payload bytes handed to the MQTT client", ("device_type",))
+PUBLISH_LATENCY = Histogram("sim_publish_latency_seconds", "Time from publish() to on_publish", ("device_type",))
+INFLIGHT = Gauge("sim_inflight_messages", "Publishes waiting for on_publish", ("device_type",))
+MESSAGES_RETRIED = Counter("sim_messages_retried_total", "QoS 1/2 publishes still unacknowledged at a reconnect, resent by paho", ("device_type",))
+MESSAGES_DROPPED = Counter("sim_messages_dropped_total", "Publishes lost: QoS 0 without a connection, full queue, or unsent at disconnect", ("device_type",))
+RECONNECTS = Counter("sim_reconnects_total", "Broker reconnections after the first connect", ("device_type",))
+FULL_PACKET_BYTES = Counter("sim_full_packet_bytes_total", "Payload bytes of the full packets before report-by-exception filtering", ("device_type",))
+MESSAGES_SUPPRESSED = Counter("sim_messages_suppressed_total", "Packets not published because no field moved past its deadband", ("device_type",))
+EVENTS_TRIGGERED = Counter("sim_events_triggered_total", "Event records generated, by triggering IO ID", ("device_type", "io"))
+EVENT_QUEUE_LATENCY = Histogram("sim_event_queue_seconds", "Time an event record waited in the publish queue", ("device_type",))
+RECORDS_BATCHED = Counter("sim_records_batched_total", "Records sent inside multi-record payloads", ("device_type",))
+BATCH_DELAY = Histogram("sim_batch_delay_seconds", "Time a record waited in its device's batch before publish", ("device_type",), OVERRUN_BUCKETS)
+TICK_OVERRUN = Histogram("sim_tick_overrun_seconds", "Time a tick ran past its reporting interval", ("device_type",), OVERRUN_BUCKETS)
+GEOFENCE_EVENTS = Counter("sim_geofence_events_total", "Geofence entries and exits, by site kind", ("device_type", "kind", "event"))
+GEOFENCE_DWELL = Histogram("sim_geofence_dwell_seconds", "Time a unit spent inside a geofence, recorded on exit", ("device_type", "kind"), DWELL_BUCKETS)
+COLD_START = Gauge("sim_cold_start_seconds", "Time from process start to the first publish")
+
+
+def process_uptime():
+    """Seconds since the process started: /proc on Linux, otherwise since this module was imported"""
+    try:
+        with open("/proc/self/stat") as f:
+            started_ticks = int(f.read().rsplit(")", 1)[1].split()[19])  # field 22, starttime
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - started_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.monotonic() - IMPORTED
+
+
+_cold_start_lock = threading.Lock()
+_cold_start = None
+
+
+def first_publish():
+    """Record the cold start once, at the first publish of any device type"""
+    global _cold_start
+    if _cold_start is not None:
+        return
+    with _cold_start_lock:
+        if _cold_start is not None:
+            return
+        _cold_start = process_uptime()
+    COLD_START.set(round(_cold_start, 3))
+    logger.info("First publish %.2f s after process start", _cold_start)
+
+
+class PublishTracker:
+    """Matches publish() calls with on_publish callbacks for one device type.
+
+    Besides sent and acked, counts messages paho will send again (QoS 1/2 still unacknowledged
+    when a device reconnects) and messages that are lost (a QoS 0 publish without a connection,
+    a full queue, or QoS 0 still unsent when the connection drops).
+    """
+    def __init__(self, device_type):
+        self.device_type = device_type
+        self.lock = threading.Lock()
+        self.pending = {}  # (device, mid) -> (start, qos)
+        self.early_acks = set()
+        self.connected_devices = set()
+
+    def publish(self, client, device, topic, payload, **kwargs):
+        start = time.monotonic()
+        info = client.publish(topic, payload, **kwargs)
+        first_publish()
+        qos = kwargs.get("qos", 0)
+        MESSAGES_GENERATED.inc(device_type=self.device_type)
+        BYTES_SENT.inc(len(topic) + len(payload), device_type=self.device_type)
+        # paho keeps QoS 1/2 messages published while disconnected (rc MQTT_ERR_NO_CONN) for the reconnect
+        if info.rc == MQTT_ERR_QUEUE_SIZE or (info.rc != MQTT_ERR_SUCCESS and qos == 0):
+            MESSAGES_DROPPED.inc(device_type=self.device_type)
+            return info
+        key = (device, info.mid)
+        with self.lock:
+            # on_publish can run on the network thread before publish() has returned
+            if key in self.early_acks:
+                self.early_acks.discard(key)
+                acked = True
+            else:
+                self.pending[key] = (start, qos)
+                acked = False
+            INFLIGHT.set(len(self.pending), device_type=self.device_type)
+        if acked:
+            self._record_ack(time.monotonic() - start)
+        return info
+
+    def acked(self, device, mid):
+        key = (device, mid)
+        with self.lock:
+            entry = self.pending.pop(key, None)
+            if entry is None:
+                self.early_acks.add(key)
+            INFLIGHT.set(len(self.pending), device_type=self.device_type)
+        if entry is not None:
+            self._record_ack(time.monotonic() - entry[0])
+
+    def _record_ack(self, latency):
+        MESSAGES_PUBLISHED.inc(device_type=self.device_type)
+        PUBLISH_LATENCY.observe(latency, device_type=self.device_type)
+
+    def inflight(self):
+        with self.lock:
+            return len(self.pending)
+
+    def connected(self, device):
+        with self.lock:
+            seen = device in self.connected_devices
+            self.connected_devices.add(device)
+            resent = sum(1 for (pending_device, _), (_, qos) in self.pending.items() if pending_device == device and qos > 0)
+        if seen:
+            RECONNECTS.inc(device_type=self.device_type)
+        if resent:
+            MESSAGES_RETRIED.inc(resent, device_type=self.device_type)
+
+    def disconnected(self, device):
+        with self.lock:
+            lost = [key for key, (_, qos) in self.pending.items() if key[0] == device and qos == 0]
+            for key in lost:
+                del self.pending[key]
+            INFLIGHT.set(len(self.pending), device_type=self.device_type)
+        if lost:
+            MESSAGES_DROPPED.inc(len(lost), device_type=self.device_type)
+
+
+_trackers = {}
+_trackers_lock = threading.Lock()
+
+
+def tracker(device_type):
+    with _trackers_lock:
+        if device_type not in _trackers:
+            _trackers[device_type] = PublishTracker(device_type)
+        return _trackers[device_type]
+
+
+TICK_HOOKS = []  # called once per tick, e.g. by the profiler
+
+
+class TickTimer:
+    """Sleeps until the next reporting deadline and records how far a tick ran past it"""
+    def __init__(self, device_type, interval):
+        self.device_type = device_type
+        self.interval = interval
+        self.deadline = time.monotonic() + interval
+
+    def wait(self):
+        for hook in TICK_HOOKS:
+            hook()
+        delay = self.deadline - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+            self.deadline += self.interval
+        else:
+            TICK_OVERRUN.observe(-delay, device_type=self.device_type)
+            self.deadline = time.monotonic() + self.interval
+
+
+# HTTP endpoint
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, host="0.0.0.0"):
+    """Serve /metrics on a daemon thread; port 0 disables the endpoint"""
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        # Several simulators on one host: only the first gets the default port
+        logger.warning("Metrics endpoint disabled, cannot bind port %s: %s", port, e)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
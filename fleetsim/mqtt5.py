@@ -0,0 +1,126 @@
+"""MQTT 5 transport options for the simulator clients.
+
+Session holds one client's MQTT 5 state:
+  topic aliases     the first publish after a connect carries the topic plus alias 1; later QoS 0 publishes send
+                    an empty topic and the alias, saving len("teltonika/<imei>/from") bytes per message. QoS 1/2
+                    publishes keep the full topic: paho resends them unchanged after a reconnect, when the
+                    broker has forgotten the alias
+  receive maximum   paho's in-flight window is capped at the broker's Receive Maximum from CONNACK
+  message expiry    the broker drops telemetry nobody picked up within MESSAGE_EXPIRY seconds
+  session expiry    the broker keeps the session SESSION_EXPIRY seconds after a disconnect, so a
+                    reconnect with clean_start=False resumes it
+
+Run `python3 -m fleetsim.mqtt5 --devices 100000` for the per-message and fleet-wide byte savings.
+"""
+import argparse
+import threading
+
+import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+
+SESSION_EXPIRY = 3600  # seconds
+MESSAGE_EXPIRY = 60  # seconds, a few reporting intervals
+MAX_INFLIGHT = 20  # paho's default window, lowered further if the broker's Receive Maximum is smaller
+
+
+def create_client(client_id, mqtt5=False):
+    if mqtt5:
+        return mqtt.Client(client_id=client_id, protocol=mqtt.MQTTv5)
+    return mqtt.Client(client_id=client_id)
+
+
+class Session:
+    def __init__(self, session_expiry=SESSION_EXPIRY, message_expiry=MESSAGE_EXPIRY, max_inflight=MAX_INFLIGHT):
+        self.session_expiry = session_expiry
+        self.message_expiry = message_expiry
+        self.max_inflight = max_inflight
+        self.lock = threading.Lock()
+        self.alias_maximum = 0
+        self.aliases = {}  # topic -> alias
+        self.announced = set()  # aliases the broker has seen with their topic on this connection
+
+    def connect(self, client, host, port=1883, keepalive=60):
+        properties = Properties(PacketTypes.CONNECT)
+        properties.SessionExpiryInterval = self.session_expiry
+        client.connect(host, port, keepalive, clean_start=False, properties=properties)
+
+    def connected(self, client, properties):
+        """Call from on_connect: aliases start over on every connection, limits come from CONNACK"""
+        broker_receive_maximum = getattr(properties, "ReceiveMaximum", 65535)
+        client.max_inflight_messages_set(min(self.max_inflight, broker_receive_maximum))
+        self.reset_aliases(getattr(properties, "TopicAliasMaximum", 0))
+
+    def reset_aliases(self, alias_maximum):
+        """Forget every alias; publish_args() may run on other threads, so the state only changes under the lock"""
+        with self.lock:
+            self.alias_maximum = alias_maximum
+            self.aliases = {}
+            self.announced = set()
+
+    def publish_args(self, topic, qos=0):
+        """Topic and properties for the next publish to `topic`"""
+        properties = Properties(PacketTypes.PUBLISH)
+        if self.message_expiry:
+            properties.MessageExpiryInterval = self.message_expiry
+        if qos:
+            return topic, properties
+        with self.lock:
+            alias = self.aliases.get(topic)
+            if alias is None and len(self.aliases) < self.alias_maximum:
+                alias = self.aliases[topic] = len(self.aliases) + 1
+            if alias is not None:
+                properties.TopicAlias = alias
+                if alias in self.announced:
+                    topic = ""
+                else:
+                    self.announced.add(alias)
+        return topic, properties
+
+
+# Byte accounting
+def _varint_size(value):
+    size = 1
+    while value >= 128:
+        value //= 128
+        size += 1
+    return size
+
+
+def publish_packet_size(topic, payload_size, qos=0, properties=None):
+    """Bytes on the wire for one PUBLISH; properties=None is MQTT 3.1.1, a Properties object MQTT 5"""
+    remaining = 2 + len(topic.encode("utf-8")) + (2 if qos else 0) + payload_size
+    if properties is not None:
+        remaining += len(properties.pack())
+    return 1 + _varint_size(remaining) + remaining
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-message and fleet-wide PUBLISH bytes, MQTT 3.1.1 vs MQTT 5")
+    parser.add_argument("--devices", type=int, default=100000)
+    parser.add_argument("--interval", type=float, default=10, help="Seconds between publishes per device")
+    parser.add_argument("--payload", type=int, nargs="+", default=[279, 731], metavar="BYTES",
+                        help="Payload sizes to compare (defaults: minimal and full FMC230 packets)")
+    parser.add_argument("--qos", type=int, default=0, choices=(0, 1, 2))
+    parser.add_argument("--message-expiry", type=int, default=MESSAGE_EXPIRY, help="0 to leave out the expiry property")
+    args = parser.parse_args()
+
+    topic = "teltonika/356938035643809/from"
+    session = Session(message_expiry=args.message_expiry)
+    session.reset_aliases(1)
+    first_topic, first_properties = session.publish_args(topic, args.qos)
+    aliased_topic, aliased_properties = session.publish_args(topic, args.qos)
+    rate = args.devices / args.interval
+
+    print(f"{args.devices:,} devices every {args.interval:g} s = {rate:,.0f} publishes/s, QoS {args.qos}, topic {topic!r}")
+    for payload in args.payload:
+        v311 = publish_packet_size(topic, payload, args.qos)
+        v5_first = publish_packet_size(first_topic, payload, args.qos, first_properties)
+        v5 = publish_packet_size(aliased_topic, payload, args.qos, aliased_properties)
+        saved = v311 - v5
+        print(f"  payload {payload:5} B: MQTT 3.1.1 {v311} B, MQTT 5 first {v5_first} B then {v5} B per message "
+              f"({saved:+} B, {saved / v311:.1%}); fleet saves {saved * rate / 1e3:,.1f} kB/s, {saved * rate * 86400 / 1e9:,.2f} GB/day")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Profiling run mode for the simulators (--profile).
+
+A background thread samples the stacks of every thread (publish loops, paho network threads,
+lock waits included) for a fixed window and writes them in collapsed "folded" format, ready
+for flamegraph.pl or speedscope. tracemalloc snapshots are taken every N simulator ticks and
+the top allocators, and what grew between the first and last snapshot, are written alongside.
+"""
+import argparse
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+from fleetsim import metrics
+
+SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+TRACEMALLOC_FRAMES = 10
+TOP_ALLOCATORS = 25
+
+logger = logging.getLogger(__name__)
+
+
+def add_arguments(parser, flag="--profile"):
+    parser.add_argument(flag, dest="profile_seconds", type=float, nargs="?", const=60.0, default=None, metavar="SECONDS",
+                        help="Profile the run for SECONDS (default 60) and write flame graph stacks and an allocation report")
+    parser.add_argument("--profile-snapshot-every", type=int, default=10, metavar="TICKS",
+                        help="Take a tracemalloc snapshot every TICKS simulator ticks while profiling")
+    parser.add_argument("--profile-dir", default="profiles", help="Directory for profiling output")
+
+
+def start_from_args(name, args):
+    if args.profile_seconds is None:
+        return None
+    profiler = SamplingProfiler(name, args.profile_seconds, args.profile_snapshot_every, args.profile_dir)
+    profiler.start()
+    return profiler
+
+
+def start_from_argv(name, flag="--profile"):
+    """For simulators without their own argument parser: pick the profiling flags out of sys.argv"""
+    parser = argparse.ArgumentParser(add_help=False)
+    add_arguments(parser, flag)
+    args, _ = parser.parse_known_args()
+    return start_from_args(name, args)
+
+
+class SamplingProfiler:
+    def __init__(self, name, seconds, snapshot_every, output_dir):
+        self.name = name
+        self.seconds = seconds
+        self.snapshot_every = max(1, snapshot_every)
+        self.output_dir = os.path.join(output_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}")
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.ticks = 0
+        self.first_snapshot = None
+        self.last_snapshot = None
+        self.lock = threading.Lock()
+        self.tracing = threading.Lock()  # tracemalloc snapshots and stop() never interleave
+
+    def start(self):
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        metrics.TICK_HOOKS.append(self.tick)
+        threading.Thread(target=self._run, name="profiler", daemon=True).start()
+        logger.info("Profiling %s for %.0f s, output in %s", self.name, self.seconds, self.output_dir)
+
+    def tick(self):
+        with self.lock:
+            self.ticks += 1
+            due = self.ticks % self.snapshot_every == 0
+        if due:
+            with self.tracing:
+                if tracemalloc.is_tracing():
+                    self._snapshot()
+
+    def _snapshot(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+        with self.lock:
+            if self.first_snapshot is None:
+                self.first_snapshot = snapshot
+            self.last_snapshot = snapshot
+
+    def _sample(self, own_ident):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}")
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)).replace(";", ",").replace(" ", "_"))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        deadline = time.monotonic() + self.seconds
+        while time.monotonic() < deadline:
+            self._sample(own_ident)
+            time.sleep(SAMPLE_INTERVAL)
+        metrics.TICK_HOOKS.remove(self.tick)
+        with self.tracing:
+            self._snapshot()
+            tracemalloc.stop()
+        self.write()
+
+    def write(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        stacks_path = os.path.join(self.output_dir, "stacks.folded")
+        with open(stacks_path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        report_path = os.path.join(self.output_dir, "top_allocators.txt")
+        with open(report_path, "w", encoding="utf-8") as f:
+            f.write(f"{self.name}: {self.samples} stack samples, {self.ticks} ticks, {self.seconds:.0f} s window\n\n")
+            f.write(f"Top {TOP_ALLOCATORS} allocation sites at end of window\n")
+            for stat in self.last_snapshot.statistics("lineno")[:TOP_ALLOCATORS]:
+                f.write(f"  {stat}\n")
+            if self.first_snapshot is not self.last_snapshot:
+                f.write(f"\nTop {TOP_ALLOCATORS} growth since first snapshot\n")
+                for stat in self.last_snapshot.compare_to(self.first_snapshot, "lineno")[:TOP_ALLOCATORS]:
+                    f.write(f"  {stat}\n")
+        logger.info("Profile written: %s, %s", stacks_path, report_path)
@@ -0,0 +1,88 @@
+"""Max sustainable publish throughput at QoS 0, 1 and 2.
+
+For each level, --clients paho clients publish FMC230-sized payloads to the broker as fast as the
+in-flight window allows for --seconds. Acknowledged messages per second is the sustainable rate;
+the tracker's retried and dropped counts show what it cost. Without --host a stand-in broker
+(fleetsim.broker) is started in-process.
+
+    python3 -m fleetsim.qos_report --clients 10 --seconds 10
+"""
+import argparse
+import time
+
+import paho.mqtt.client as mqtt
+
+from fleetsim import metrics
+from fleetsim.broker import StandInBroker
+
+PAYLOAD = b"x" * 731  # a full FMC230 packet
+
+
+def run_level(qos, host, port, clients, seconds, window):
+    device_type = f"qos{qos}"
+    tracker = metrics.PublishTracker(device_type)
+    connections = []
+    for i in range(clients):
+        client = mqtt.Client(client_id=f"qos_report_{qos}_{i}")
+        client.user_data_set(str(i))
+        client.on_connect = lambda client, device, flags, rc: tracker.connected(device)
+        client.on_publish = lambda client, device, mid: tracker.acked(device, mid)
+        client.on_disconnect = lambda client, device, rc: tracker.disconnected(device)
+        client.max_inflight_messages_set(window)
+        client.connect(host, port, 60)
+        client.loop_start()
+        connections.append(client)
+    time.sleep(0.5)
+
+    acked_before = metrics.MESSAGES_PUBLISHED.snapshot().get(device_type, 0)
+    start = time.monotonic()
+    deadline = start + seconds
+    while time.monotonic() < deadline:
+        if tracker.inflight() >= clients * window:
+            time.sleep(0.0005)
+            continue
+        for i, client in enumerate(connections):
+            tracker.publish(client, str(i), f"teltonika/qos{qos}/{i}/from", PAYLOAD, qos=qos)
+    elapsed = time.monotonic() - start
+    acked = metrics.MESSAGES_PUBLISHED.snapshot().get(device_type, 0) - acked_before
+
+    for client in connections:
+        client.disconnect()
+        client.loop_stop()
+    return {
+        "sent": metrics.MESSAGES_GENERATED.snapshot().get(device_type, 0),
+        "acked": acked,
+        "retried": metrics.MESSAGES_RETRIED.snapshot().get(device_type, 0),
+        "dropped": metrics.MESSAGES_DROPPED.snapshot().get(device_type, 0),
+        "rate": acked / elapsed,
+        "latency": metrics.PUBLISH_LATENCY.snapshot().get(device_type),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare max sustainable publish throughput per QoS level")
+    parser.add_argument("--host", help="Broker to test against (default: an in-process stand-in broker)")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--window", type=int, default=20, help="In-flight messages per client")
+    parser.add_argument("--qos", type=int, nargs="+", default=[0, 1, 2], choices=(0, 1, 2))
+    args = parser.parse_args()
+
+    host, port = args.host, args.port
+    if host is None:
+        broker = StandInBroker("127.0.0.1", 0).start()
+        host, port = broker.host, broker.port
+        print(f"Stand-in broker on {host}:{port}")
+
+    print(f"{args.clients} clients, {args.window} in flight each, {args.seconds:g} s per level")
+    for qos in args.qos:
+        result = run_level(qos, host, port, args.clients, args.seconds, args.window)
+        _, count, total = result["latency"] or (None, 0, 0.0)
+        mean_latency = total / count * 1000 if count else 0.0
+        print(f"  QoS {qos}: {result['rate']:10,.0f} msg/s acked, {result['sent']:,} sent, {result['acked']:,} acked, "
+              f"{result['retried']:,} retried, {result['dropped']:,} dropped, mean ack latency {mean_latency:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
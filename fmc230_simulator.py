@@ -1,16 +1,23 @@
 import time
 import json
 import random
-import paho.mqtt.client as mqtt
-from math import sin, cos, radians, sqrt, atan2, degrees
+import argparse
+import logging
+import os
+import sys
+import numpy as np
+from fleetsim import batching, checkpoint, deadband, events, fleet_config, geodesy, geofence, logs, metrics, mqtt5, profiling
 
 # MQTT Setup
 BROKER = "localhost" # use localhost if you want to run manually
 PORT = 1883
-client = mqtt.Client()
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9100"))  # Prometheus /metrics, 0 to disable
+PUBLISH_INTERVAL = 10  # seconds
+REPORT_EVERY = 30  # ticks between the deadband / batching reports
+MOVING_STATE = ("lat", "lng", "progress", "direction", "hold")  # checkpointed per boat and truck; ang follows on the next advance
+logger = logging.getLogger("fmc230")
 
 # Constants
-EARTH_RADIUS = 6371  # km
 KNOTS_TO_KMH = 1.852
 
 # Fridge Definitions
@@ -25,143 +32,529 @@ FRIDGES = [
 
 
 
+DEVICE_QOS = {"static": 0, "boat": 0, "truck": 0}  # device type -> MQTT QoS
+RECONNECT_KEYS = ("token", "type")  # changing these in the fleet file gives the device a new session
+SITE_RADIUS_KM = {"port": 1.0, "depot": 0.5, "site": 0.2}  # geofence radius by site kind
+STOPS_AT = {"boat": ("port",), "truck": ("depot", "site")}  # with --geofence, vehicles halt on entering these
+DWELL_SECONDS = {"port": (3600, 10800), "depot": (900, 2700), "site": (300, 900)}  # random halt per site kind
+
 # MQTT Callbacks
-def on_connect(client, userdata, flags, rc):
-    print(f"Connected {userdata['imei']} to MQTT Broker!" if rc == 0 else f"Connection failed for {userdata['imei']}: {rc}")
+def on_connect(client, userdata, flags, rc, properties=None):
+    if rc == 0:
+        if userdata.get("session"):
+            userdata["session"].connected(client, properties)
+        metrics.tracker(userdata["type"]).connected(userdata["imei"])
+        logger.info("Connected %s to MQTT Broker!", userdata["imei"])
+    else:
+        logger.error("Connection failed for %s: %s", userdata["imei"], rc)
+
+def on_disconnect(client, userdata, rc, properties=None):
+    metrics.tracker(userdata["type"]).disconnected(userdata["imei"])
+    if rc != 0:
+        logger.warning("Unexpected disconnect for %s: %s", userdata["imei"], rc)
 
 def on_publish(client, userdata, mid):
-    print(f"Message {mid} published for {userdata['imei']}!")
-
-# Helper Functions
-def haversine(lat1, lon1, lat2, lon2):
-    dlat = radians(lat2 - lat1)
-    dlon = radians(lon2 - lon1)
-    a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1-a))
-    return EARTH_RADIUS * c
-
-def interpolate_position(start_lat, start_lng, end_lat, end_lng, progress):
-    lat = start_lat + (end_lat - start_lat) * progress
-    lng = start_lng + (end_lng - end_lng) * progress
-    return lat, lng
-
-def update_position(fridge):
-    if fridge["type"] == "static":
-        return fridge["lat"], fridge["lng"]
-
-    route = fridge["route"]
-    start_idx = int(fridge["progress"] * (len(route) - 1))
-    if start_idx >= len(route) - 1:
-        fridge["direction"] *= -1
-        start_idx = len(route) - 2
-
-    start = route[start_idx]
-    end = route[start_idx + 1]
-    distance = haversine(start[0], start[1], end[0], end[1])
-    speed = fridge["speed_kmh"] if "speed_kmh" in fridge else fridge["speed_knots"] * KNOTS_TO_KMH
-    step = (speed / 3600) / distance
-    fridge["progress"] += step * fridge["direction"] * 10
-    if fridge["progress"] >= 1:
-        fridge["progress"] = 1
-    elif fridge["progress"] <= 0:
-        fridge["progress"] = 0
-    return interpolate_position(start[0], start[1], end[0], end[1], fridge["progress"] % 1)
+    metrics.tracker(userdata["type"]).acked(userdata["imei"], mid)
+    logger.info("Message %s published for %s!", mid, userdata["imei"], extra={"device": userdata["imei"]})
 
-def generate_packet(fridge):
-    lat, lng = update_position(fridge)
+# Moving fridges
+class MovingFleet:
+    """Route progress of every boat and truck in arrays, advanced together once per tick.
+
+    Each vehicle runs its route end to end and back (direction 1 / -1) at its own speed; the
+    positions, and the bearing reported as `ang`, are written back to the fridge dicts. A vehicle
+    given a halt with stop() stays put until it has run out; its remaining "hold" seconds are kept
+    in the fridge dict and make it report speed 0.
+
+    Between advances each vehicle keeps the route progress per second the next advance will move it
+    at, so positions_at() dead-reckons a position for any moment of the tick with one slerp: across
+    waypoints and up to the route end the same way advance() gets there.
+    """
+    def __init__(self, fridges):
+        self.fridges = [fridge for fridge in fridges if fridge["type"] != "static"]
+        self.rows = {fridge["imei"]: row for row, fridge in enumerate(self.fridges)}
+        if not self.fridges:
+            return
+        self.routes = geodesy.RouteSet([fridge["route"] for fridge in self.fridges])
+        self.speed = np.array([fridge["speed_kmh"] if "speed_kmh" in fridge else fridge["speed_knots"] * KNOTS_TO_KMH
+                               for fridge in self.fridges], dtype=np.float64)
+        self.progress = np.array([fridge["progress"] for fridge in self.fridges], dtype=np.float64)
+        self.direction = np.array([fridge["direction"] for fridge in self.fridges], dtype=np.float64)
+        self.hold = np.array([fridge.get("hold", 0) for fridge in self.fridges], dtype=np.float64)
+        self.moving_speed = np.zeros(len(self.fridges))
+        self.rate = np.zeros(len(self.fridges))  # route progress per second until the next advance
+
+    def stop(self, row, seconds):
+        self.hold[row] = max(self.hold[row], seconds)
+        self.fridges[row]["hold"] = float(self.hold[row])
+        self.moving_speed[row] = self.rate[row] = 0.0  # halts from now, not from the next advance
+
+    def advance(self, seconds=PUBLISH_INTERVAL):
+        if not self.fridges:
+            return
+        routes = self.routes
+        segments, _ = routes.segments(self.progress)
+        # Distance covered this tick as a share of the whole route, at the current segment's length
+        step = self.speed * seconds / 3600 / np.maximum(routes.length[segments], 1e-9) / routes.segment_counts
+        held = np.flatnonzero(self.hold > 0)
+        if len(held):
+            step[held] = 0.0
+            self.hold[held] = np.maximum(self.hold[held] - seconds, 0.0)
+            for row, remaining in zip(held.tolist(), self.hold[held].tolist()):
+                self.fridges[row]["hold"] = remaining
+        progress = self.progress + step * self.direction
+        self.direction = np.where(progress >= 1, -1.0, np.where(progress <= 0, 1.0, self.direction))
+        self.progress = np.clip(progress, 0.0, 1.0)
+
+        segments, fraction = routes.segments(self.progress)
+        lat, lng = self.lat, self.lng = routes.positions(segments, fraction)
+        ang = np.rint(np.where(self.direction > 0, routes.bearing[segments], routes.reverse_bearing[segments])).astype(np.int64) % 360
+        self.moving_speed = np.where(self.hold > 0, 0.0, self.speed)
+        self.rate = self.moving_speed * self.direction / 3600 / np.maximum(routes.length[segments], 1e-9) / routes.segment_counts
+        for fridge, *values in zip(self.fridges, lat.tolist(), lng.tolist(), ang.tolist(), self.progress.tolist(), self.direction.tolist()):
+            fridge["lat"], fridge["lng"], fridge["ang"], fridge["progress"], fridge["direction"] = values
+
+    def positions_at(self, seconds):
+        """(lat, lng) of every vehicle `seconds` after the last advance; at the end of the tick, where the next advance puts it"""
+        return self.routes.positions(*self.routes.segments(self.progress + self.rate * seconds))
+
+def position_packets(fleet, seconds):
+    """Position-only records (ts, latlng, ang, sp) for the moving fridges `seconds` into the tick, e.g. for a live map"""
+    if not fleet.fridges:
+        return
+    lat, lng = fleet.positions_at(seconds)
     ts = int(time.time() * 1000)
-    door_opens = random.randint(1, 5) if fridge["type"] == "static" else (random.randint(5, 10) if fridge["name"] == "Cruise Pantry" else random.randint(0, 2))
-    temp = (-18 + door_opens * 0.5) if fridge["type"] == "static" else (-5 + door_opens * 0.2 if fridge["name"] == "Cruise Pantry" else -20 + door_opens * 0.1)
-    humidity = random.randint(0, 95)
-    battery = random.uniform(3472, 4116)  # Device battery (DB range)
-    sensor_battery = random.uniform(2800, 3200)  # EYE Beacon battery
-    speed = 0 if fridge["type"] == "static" else (fridge["speed_knots"] * KNOTS_TO_KMH if "speed_knots" in fridge else fridge["speed_kmh"] + random.uniform(-5, 5))
-
-    packet = {
-        "state": {
-            "reported": {
-                "ts": ts,
-                "pr": 1 if door_opens > 0 else 0,
-                "latlng": f"{lat},{lng}",
-                "alt": random.randint(0, 20) if fridge["type"] != "boat" else 5,
-                "ang": random.randint(0, 360),
-                "sat": random.randint(3, 15) if fridge["type"] != "boat" or fridge.get("signal", True) else 0,
-                "sp": speed,
-                "evt": 0,
-                "17": random.randint(-369, 460),  # Axis X
-                "18": random.randint(-156, 635),  # Axis Y
-                "19": random.randint(-1052, 962),  # Axis Z
-                "239": random.randint(0, 1),  # Ignition
-                "240": 1 if speed > 0 else 0,  # Movement
-                "80": random.randint(0, 4),  # Data Mode
-                "21": random.randint(0, 5),  # GSM Signal
-                "200": random.randint(0, 2),  # Sleep Mode
-                "69": random.randint(0, 3),  # GNSS Status
-                "113": random.randint(0, 100),  # Battery Level
-                "181": random.randint(0, 500),  # GNSS PDOP
-                "182": random.randint(0, 500),  # GNSS HDOP
-                "66": random.uniform(4534, 12470),  # External Voltage
-                "206": 21014,  # GSM Area Code
-                "67": random.uniform(3472, 4116),  # Device Battery Voltage (mV)
-                "68": random.randint(0, 138),  # Battery Current
-                "25": 32767,  # BLE Temp #1 - not found
-                "26": 32767,  # BLE Temp #2 - not found
-                "27": 32767,  # BLE Temp #3 - not found
-                "28": 32767,  # BLE Temp #4 - not found
-                "86": 65535,  # BLE Humidity #1 - not found
-                "104": 65535, # BLE Humidity #2 - not found
-                "106": 65535, # BLE Humidity #3 - not found
-                "108": 65535, # BLE Humidity #4 - not found
-                "241": 65501, # Active GSM Operator
-                "199": random.randint(0, 1000),  # Trip Odometer
-                "16": random.randint(2949, 30131),  # Total Odometer
-                "636": int(random.uniform(238008613, 238008587)),  # UMTS/LTE Cell ID
-                "11": 893980000000,  # ICCID1
-                "14": 17048176,  # ICCID2
-                "387": f"{lat:.4f}+{lng:.4f}+{random.randint(0, 20) if fridge['type'] != 'boat' else 5:.3f}/",  # ISO6709
-                "10804": int(humidity),  # EYE Humidity 1 (%)
-                "10808": 1 if door_opens > 0 else 0,  # EYE Magnet 1 (0/1)
-                "10812": 1 if speed > 0 or door_opens > 0 else 0,  # EYE Movement 1 (0/1)
-                "10816": random.randint(-90, 90),  # EYE Pitch 1 (degrees)
-                "10820": 0 if sensor_battery > 3000 else 1,  # EYE Low Battery 1 (0/1)
-                "10800": int(temp * 100),  # EYE Temperature 1 (m°C)
-                "10824": int(sensor_battery),  # EYE Battery Voltage 1 (mV)
-                "10832": random.randint(-180, 180),  # EYE Roll 1 (degrees)
-                "10836": door_opens,  # EYE Movement Count 1
-                "10840": door_opens,  # EYE Magnet Count 1 (subset of opens)
-                "252": random.randint(0, 1)  # Unplug
-            }
-        }
-    }
-    if fridge["type"] == "truck" and random.random() < 0.1:
-        packet["state"]["reported"]["sp"] = 0
-        fridge["stops"] += 1
-    if fridge["name"] == "Cargo Container" and random.random() < 0.05:
-        fridge["signal"] = not fridge["signal"]
-    return packet
-
-# Create clients per device
-clients = {}
-for fridge in FRIDGES:
-    if fridge["token"]:
-        client = mqtt.Client(client_id=f"fmc230_{fridge['imei']}")  # Unique client_id per IMEI
-        client.user_data_set({"imei": fridge["imei"]})  # Pass IMEI to callbacks
-        client.on_connect = on_connect
-        client.on_publish = on_publish
-        client.username_pw_set(username=fridge["token"])  # Token as username, no password
-        client.connect(BROKER, PORT, 60)
-        client.loop_start()
-        clients[fridge["imei"]] = client
+    for fridge, lat, lng, speed in zip(fleet.fridges, lat.tolist(), lng.tolist(), fleet.moving_speed.tolist()):
+        if fridge["token"]:
+            yield fridge, {"state": {"reported": {"ts": ts, "latlng": f"{lat},{lng}", "ang": fridge["ang"], "sp": round(speed)}}}
+
+def position_steps(args):
+    """Reports per tick with --position-hz: the tick's full packets plus dead-reckoned positions in between"""
+    if not args or not args.position_hz:
+        return 1
+    return max(1, round(PUBLISH_INTERVAL * args.position_hz))
+
+# IO elements: IO ID -> function of (fridge, values) for its value. `values` holds the per-packet values in
+# SHARED_VALUES, each computed the first time a field reads it, so a generator only evaluates what its profile sends.
+SHARED_VALUES = {
+    "door_opens": lambda fridge, values: random.randint(1, 5) if fridge["type"] == "static" else (random.randint(5, 10) if fridge["name"] == "Cruise Pantry" else random.randint(0, 2)),
+    "temp": lambda fridge, values: (-18 + values["door_opens"] * 0.5) if fridge["type"] == "static" else (-5 + values["door_opens"] * 0.2 if fridge["name"] == "Cruise Pantry" else -20 + values["door_opens"] * 0.1),
+    "humidity": lambda fridge, values: random.randint(0, 95),
+    "sensor_battery": lambda fridge, values: random.uniform(2800, 3200),  # EYE Beacon battery
+    "speed": lambda fridge, values: 0 if fridge["type"] == "static" or fridge.get("hold") else (fridge["speed_knots"] * KNOTS_TO_KMH if "speed_knots" in fridge else fridge["speed_kmh"] + random.uniform(-5, 5)),
+}
+
+IO_ELEMENTS = {
+    "ts": lambda fridge, values: int(time.time() * 1000),
+    "pr": lambda fridge, values: 1 if values["door_opens"] > 0 else 0,
+    "latlng": lambda fridge, values: f"{fridge['lat']},{fridge['lng']}",
+    "alt": lambda fridge, values: random.randint(0, 20) if fridge["type"] != "boat" else 5,
+    "ang": lambda fridge, values: fridge["ang"] if "ang" in fridge else random.randint(0, 360),  # bearing for moving fridges
+    "sat": lambda fridge, values: random.randint(3, 15) if fridge["type"] != "boat" or fridge.get("signal", True) else 0,
+    "sp": lambda fridge, values: values["speed"],
+    "evt": lambda fridge, values: 0,
+    "17": lambda fridge, values: random.randint(-369, 460),  # Axis X
+    "18": lambda fridge, values: random.randint(-156, 635),  # Axis Y
+    "19": lambda fridge, values: random.randint(-1052, 962),  # Axis Z
+    "239": lambda fridge, values: random.randint(0, 1),  # Ignition
+    "240": lambda fridge, values: 1 if values["speed"] > 0 else 0,  # Movement
+    "80": lambda fridge, values: random.randint(0, 4),  # Data Mode
+    "21": lambda fridge, values: random.randint(0, 5),  # GSM Signal
+    "200": lambda fridge, values: random.randint(0, 2),  # Sleep Mode
+    "69": lambda fridge, values: random.randint(0, 3),  # GNSS Status
+    "113": lambda fridge, values: random.randint(0, 100),  # Battery Level
+    "181": lambda fridge, values: random.randint(0, 500),  # GNSS PDOP
+    "182": lambda fridge, values: random.randint(0, 500),  # GNSS HDOP
+    "66": lambda fridge, values: random.uniform(4534, 12470),  # External Voltage
+    "206": lambda fridge, values: 21014,  # GSM Area Code
+    "67": lambda fridge, values: random.uniform(3472, 4116),  # Device Battery Voltage (mV)
+    "68": lambda fridge, values: random.randint(0, 138),  # Battery Current
+    "25": lambda fridge, values: 32767,  # BLE Temp #1 - not found
+    "26": lambda fridge, values: 32767,  # BLE Temp #2 - not found
+    "27": lambda fridge, values: 32767,  # BLE Temp #3 - not found
+    "28": lambda fridge, values: 32767,  # BLE Temp #4 - not found
+    "86": lambda fridge, values: 65535,  # BLE Humidity #1 - not found
+    "104": lambda fridge, values: 65535,  # BLE Humidity #2 - not found
+    "106": lambda fridge, values: 65535,  # BLE Humidity #3 - not found
+    "108": lambda fridge, values: 65535,  # BLE Humidity #4 - not found
+    "241": lambda fridge, values: 65501,  # Active GSM Operator
+    "199": lambda fridge, values: random.randint(0, 1000),  # Trip Odometer
+    "16": lambda fridge, values: random.randint(2949, 30131),  # Total Odometer
+    "636": lambda fridge, values: int(random.uniform(238008613, 238008587)),  # UMTS/LTE Cell ID
+    "11": lambda fridge, values: 893980000000,  # ICCID1
+    "14": lambda fridge, values: 17048176,  # ICCID2
+    "387": lambda fridge, values: f"{fridge['lat']:.4f}+{fridge['lng']:.4f}+{random.randint(0, 20) if fridge['type'] != 'boat' else 5:.3f}/",  # ISO6709
+    "10804": lambda fridge, values: int(values["humidity"]),  # EYE Humidity 1 (%)
+    "10808": lambda fridge, values: 1 if values["door_opens"] > 0 else 0,  # EYE Magnet 1 (0/1)
+    "10812": lambda fridge, values: 1 if values["speed"] > 0 or values["door_opens"] > 0 else 0,  # EYE Movement 1 (0/1)
+    "10816": lambda fridge, values: random.randint(-90, 90),  # EYE Pitch 1 (degrees)
+    "10820": lambda fridge, values: 0 if values["sensor_battery"] > 3000 else 1,  # EYE Low Battery 1 (0/1)
+    "10800": lambda fridge, values: int(values["temp"] * 100),  # EYE Temperature 1 (m°C)
+    "10824": lambda fridge, values: int(values["sensor_battery"]),  # EYE Battery Voltage 1 (mV)
+    "10832": lambda fridge, values: random.randint(-180, 180),  # EYE Roll 1 (degrees)
+    "10836": lambda fridge, values: values["door_opens"],  # EYE Movement Count 1
+    "10840": lambda fridge, values: values["door_opens"],  # EYE Magnet Count 1 (subset of opens)
+    "252": lambda fridge, values: random.randint(0, 1),  # Unplug
+}
+FULL_PACKET = list(IO_ELEMENTS)
+# EYE sensors 2-4 (rename_telemetry.js maps them to eye_*_2 .. eye_*_4), keyed by the sensor 1 IO ID and
+# offset by the sensor number; all sit in the same chamber as sensor 1
+EYE_EXTRA_SENSOR = {
+    "10800": lambda fridge, values: int((values["temp"] + random.uniform(-0.5, 0.5)) * 100),  # EYE Temperature (m°C)
+    "10804": lambda fridge, values: min(95, max(0, values["humidity"] + random.randint(-3, 3))),  # EYE Humidity (%)
+    "10808": lambda fridge, values: 1 if values["door_opens"] > 0 else 0,  # EYE Magnet (0/1)
+    "10812": lambda fridge, values: 1 if values["speed"] > 0 or values["door_opens"] > 0 else 0,  # EYE Movement (0/1)
+    "10816": lambda fridge, values: random.randint(-90, 90),  # EYE Pitch (degrees)
+    "10820": lambda fridge, values: random.randint(0, 1) if values["sensor_battery"] < 2900 else 0,  # EYE Low Battery (0/1)
+    "10824": lambda fridge, values: int(values["sensor_battery"] + random.uniform(-50, 50)),  # EYE Battery Voltage (mV)
+    "10832": lambda fridge, values: random.randint(-180, 180),  # EYE Roll (degrees)
+    "10836": lambda fridge, values: values["door_opens"],  # EYE Movement Count
+    "10840": lambda fridge, values: values["door_opens"],  # EYE Magnet Count
+}
+IO_ELEMENTS = {**IO_ELEMENTS, **{str(int(io_id) + n): element for n in range(1, 4) for io_id, element in EYE_EXTRA_SENSOR.items()}}
+
+AVL_HEADER = ["ts", "pr", "latlng", "alt", "ang", "sat", "sp", "evt"]
+EYE_SENSOR_1 = ["10804", "10808", "10812", "10816", "10820", "10800", "10824", "10832", "10836", "10840"]
+
+# IO profiles: the fields a device type is configured to send
+IO_PROFILES = {
+    "full": FULL_PACKET,
+    "minimal": AVL_HEADER + ["21", "113", "10804", "182", "66", "67", "10800", "10824"],  # sample_minimal_packet.json
+    "eye4": AVL_HEADER + ["21", "113", "182", "66", "67", "252"] + EYE_SENSOR_1
+            + [str(int(io_id) + n) for n in range(1, 4) for io_id in EYE_SENSOR_1],
+}
+DEVICE_PROFILES = {"static": "full", "boat": "full", "truck": "full"}  # device type -> IO profile
+
+class PacketValues(dict):
+    """The SHARED_VALUES of one packet, computed on first use"""
+    def __init__(self, fridge):
+        super().__init__()
+        self.fridge = fridge
+
+    def __missing__(self, name):
+        value = self[name] = SHARED_VALUES[name](self.fridge, self)
+        return value
+
+def compile_generator(fields):
+    """Build a packet generator that only computes and serializes `fields`"""
+    unknown = [io_id for io_id in fields if io_id not in IO_ELEMENTS]
+    if unknown:
+        raise ValueError(f"Unknown IO elements: {', '.join(unknown)}")
+    elements = [(io_id, IO_ELEMENTS[io_id]) for io_id in fields]
+
+    def generate(fridge):
+        values = PacketValues(fridge)
+        reported = {io_id: element(fridge, values) for io_id, element in elements}
+        if fridge["type"] == "truck" and random.random() < 0.1:
+            if "sp" in reported:
+                reported["sp"] = 0
+            fridge["stops"] += 1
+        if fridge["name"] == "Cargo Container" and random.random() < 0.05:
+            fridge["signal"] = not fridge["signal"]
+        return {"state": {"reported": reported}}
+    return generate
+
+_generators = {}
+
+def packet_generator(profile):
+    if profile not in _generators:
+        _generators[profile] = compile_generator(IO_PROFILES[profile])
+    return _generators[profile]
+
+def generate_packet(fridge):
+    profile = fridge.get("profile") or DEVICE_PROFILES.get(fridge["type"], "full")
+    return packet_generator(profile)(fridge)
+
+def make_filters(args):
+    """One report-by-exception filter per device type, or None when publishing full packets"""
+    if not args.deadband:
+        return None
+    return {device_type: deadband.DeadbandFilter(device_type, keyframe_every=args.keyframe_every)
+            for device_type in sorted({fridge["type"] for fridge in FRIDGES})}
+
+def make_event_engines(args):
+    """One event engine per device type, or None when only periodic records are sent"""
+    if not args.events:
+        return None
+    return {device_type: events.EventEngine(device_type) for device_type in sorted({fridge["type"] for fridge in FRIDGES})}
+
+def geofence_sites(fridges):
+    """Customer sites at the static fridges, ports at the boats' route ends and depots at the trucks' route points"""
+    sites = []
+    for fridge in fridges:
+        if fridge["type"] == "static":
+            sites.append({"id": fridge["name"], "kind": "site", "lat": fridge["lat"], "lng": fridge["lng"]})
+        elif fridge["type"] == "boat":
+            sites.extend({"id": f"{lat:.4f},{lng:.4f}", "kind": "port", "lat": lat, "lng": lng} for lat, lng in (fridge["route"][0], fridge["route"][-1]))
+        else:
+            sites.extend({"id": f"{lat:.4f},{lng:.4f}", "kind": "depot", "lat": lat, "lng": lng} for lat, lng in fridge["route"])
+    for site in sites:
+        site["radius_km"] = SITE_RADIUS_KM[site["kind"]]
+    return sites
+
+def make_geofences(args, fleet, previous=None):
+    """A geofence tracker for the moving fridges, or None without --geofence; `previous` carries membership over a reload.
+    Vehicles it doesn't carry over start inside the sites at their current position, so a resumed run sends no entries."""
+    if not args.geofence:
+        return None
+    index = geofence.GeofenceIndex(geofence_sites(FRIDGES))
+    tracker = geofence.GeofenceTracker(index, [fridge["imei"] for fridge in fleet.fridges], previous)
+    known = set(previous.units) if previous else set()
+    rows = [row for row, fridge in enumerate(fleet.fridges) if fridge["imei"] not in known]
+    if rows:
+        lat, lng = fleet.routes.positions(*fleet.routes.segments(fleet.progress))
+        tracker.seed(lat[rows], lng[rows], rows)
+    return tracker
+
+def check_geofences(outbox, fleet, geofences):
+    """Queue geozone events for the vehicles that entered or left a site this tick, and halt those that deliver there"""
+    if not fleet.fridges:
+        return
+    for imei, site, entered, dwell in geofences.update(fleet.lat, fleet.lng):
+        row = fleet.rows[imei]
+        fridge = fleet.fridges[row]
+        geofence.record(fridge["type"], site, entered, dwell)
+        if entered and site["kind"] in STOPS_AT.get(fridge["type"], ()):
+            fleet.stop(row, random.randint(*DWELL_SECONDS[site["kind"]]))
+        reported = {"latlng": f"{fridge['lat']},{fridge['lng']}", "ang": fridge["ang"], "sp": 0 if fridge.get("hold") else int(fleet.speed[row])}
+        outbox.put(events.EVENT, fridge, geofence.event_packet(reported, site, entered))
 
-# Main Loop
-while True:
+def ticks_between(fridge):
+    """A fridge's own "interval" in seconds, as a whole number of ticks"""
+    return max(1, round(fridge.get("interval", PUBLISH_INTERVAL) / PUBLISH_INTERVAL))
+
+def queue_tick(outbox, fleet, filters=None, engines=None, tick=0, geofences=None):
+    """Move the fleet and generate one round of packets into the outbox; event records jump ahead of the periodic ones"""
+    fleet.advance()
+    if geofences:
+        check_geofences(outbox, fleet, geofences)
     for fridge in FRIDGES:
-        if fridge["token"]:  # Only if token exists
-            client = clients[fridge["imei"]]
-            topic = f"teltonika/{fridge['imei']}/from"
+        if fridge["token"] and tick % ticks_between(fridge) == 0:  # Only if token exists
             packet = generate_packet(fridge)
-            payload = json.dumps(packet)
-            result = client.publish(topic, payload)
-            result.wait_for_publish()
-            print(f"Published to {topic}: {payload[:100]}...")
-    time.sleep(10)
\ No newline at end of file
+            if engines:
+                for event in engines[fridge["type"]].check(fridge["imei"], packet):
+                    outbox.put(events.EVENT, fridge, event)
+            if filters:
+                packet = filters[fridge["type"]].filter(fridge["imei"], packet)
+                if packet is None:
+                    continue
+            outbox.put(events.PERIODIC, fridge, packet)
+
+def make_batcher(args):
+    if not args.batch:
+        return None
+    return batching.Batcher(args.batch, args.batch_seconds, args.batch_format)
+
+def publish_queue(outbox, batcher=None):
+    """Yield (fridge, payload) for everything ready to publish; events are never held back in a batch"""
+    for priority, fridge, packet in outbox.drain():
+        if batcher and priority == events.PERIODIC:
+            packet = batcher.add(fridge, packet)
+            if packet is None:
+                continue
+        yield fridge, packet
+    if batcher:
+        yield from batcher.flush_due()
+
+def dump_packets(ticks, filters=None, engines=None, batcher=None, args=None):
+    """Print packets as JSON lines without connecting, e.g. to feed RuleChain/run_rule_chain.js"""
+    outbox = events.PublishQueue()
+    fleet = MovingFleet(FRIDGES)
+    geofences = make_geofences(args, fleet) if args else None
+    steps = position_steps(args)
+    for tick in range(ticks):
+        queue_tick(outbox, fleet, filters, engines, tick, geofences)
+        for _, payload in publish_queue(outbox, batcher):
+            print(json.dumps(payload))
+        for step in range(1, steps):
+            for _, packet in position_packets(fleet, step * PUBLISH_INTERVAL / steps):
+                print(json.dumps(packet))
+    if batcher:
+        for _, payload in batcher.flush_due(force=True):
+            print(json.dumps(payload))
+        print(batcher.report(), file=sys.stderr)
+    for device_filter in (filters or {}).values():
+        print(device_filter.report(), file=sys.stderr)
+
+# Sessions
+def connect_fridge(fridge, use_mqtt5=False):
+    """Create and connect the MQTT client for one fridge; returns (client, session), session None without MQTT 5"""
+    client = mqtt5.create_client(f"fmc230_{fridge['imei']}", use_mqtt5)  # Unique client_id per IMEI
+    session = mqtt5.Session() if use_mqtt5 else None
+    client.user_data_set({"imei": fridge["imei"], "type": fridge["type"], "session": session})  # Passed to callbacks
+    client.on_connect = on_connect
+    client.on_publish = on_publish
+    client.on_disconnect = on_disconnect
+    client.username_pw_set(username=fridge["token"])  # Token as username, no password
+    if session:
+        session.connect(client, BROKER, PORT, 60)
+    else:
+        client.connect(BROKER, PORT, 60)
+    client.loop_start()
+    return client, session
+
+def publish(clients, sessions, fridge, packet):
+    client = clients[fridge["imei"]]
+    topic = f"teltonika/{fridge['imei']}/from"
+    publish_topic, options = topic, {"qos": DEVICE_QOS.get(fridge["type"], 0)}
+    if fridge["imei"] in sessions:
+        publish_topic, options["properties"] = sessions[fridge["imei"]].publish_args(topic, options["qos"])  # "" once aliased, QoS 0 only
+    payload = json.dumps(packet)
+    metrics.tracker(fridge["type"]).publish(client, fridge["imei"], publish_topic, payload, **options)
+    logger.info("Published to %s: %.100s...", topic, payload, extra={"device": fridge["imei"]})
+
+def prepare_fridge(fridge):
+    """Runtime fields a fridge from the fleet file may leave out"""
+    if fridge["type"] != "static":
+        fridge.setdefault("progress", 0)
+        fridge.setdefault("direction", 1)
+        fridge.setdefault("stops", 0)
+        fridge.setdefault("signal", True)
+        fridge.setdefault("hold", 0.0)
+    return fridge
+
+def reload_fleet(changes, clients, sessions, use_mqtt5=False, batcher=None):
+    """Apply a fleet file diff to FRIDGES in place: connect added fridges, flush and disconnect removed
+    ones, update changed ones without touching their session. Every other fridge keeps its connection."""
+    live = {fridge["imei"]: fridge for fridge in FRIDGES}
+    removed = [live[device["imei"]] for device in changes.removed if device["imei"] in live]
+    added = [dict(device) for device in changes.added]
+    for imei, updates in changes.changed.items():
+        fridge = live[imei]
+        if any(key in updates for key in RECONNECT_KEYS):
+            removed.append(fridge)
+            added.append({**fridge, **updates})
+        else:
+            fridge.update(updates)  # profile, interval, speed, route... apply from the next tick
+
+    for fridge in removed:
+        imei = fridge["imei"]
+        if batcher and imei in clients:
+            pending = batcher.flush_device(imei)
+            if pending:
+                publish(clients, sessions, fridge, pending)
+        client = clients.pop(imei, None)
+        sessions.pop(imei, None)
+        if client:
+            client.disconnect()
+            client.loop_stop()
+        FRIDGES.remove(fridge)
+    for fridge in added:
+        FRIDGES.append(prepare_fridge(fridge))
+        if fridge["token"]:
+            clients[fridge["imei"]], session = connect_fridge(fridge, use_mqtt5)
+            if session:
+                sessions[fridge["imei"]] = session
+    logger.info("Fleet reloaded: %s, %d fridges", changes, len(FRIDGES))
+
+def main():
+    parser = argparse.ArgumentParser(description="FMC230 fridge simulator")
+    parser.add_argument("--dump", type=int, metavar="TICKS", help="Print TICKS rounds of packets to stdout instead of publishing")
+    parser.add_argument("--io-profile", action="append", default=[], metavar="TYPE=PROFILE",
+                        help=f"IO profile for a device type ({', '.join(IO_PROFILES)}), e.g. static=minimal")
+    parser.add_argument("--deadband", action="store_true", help="Report by exception: only publish fields that moved past their deadband")
+    parser.add_argument("--keyframe-every", type=int, default=deadband.KEYFRAME_EVERY, metavar="PACKETS",
+                        help="With --deadband, send the full packet every PACKETS packets per device (0 to never)")
+    parser.add_argument("--events", action="store_true",
+                        help="Send event records (temperature excursion, door magnet, low battery, unplug) ahead of periodic packets")
+    parser.add_argument("--geofence", action="store_true",
+                        help="Send geozone enter/exit events at ports, depots and customer sites, and halt vehicles there")
+    parser.add_argument("--position-hz", type=float, metavar="HZ",
+                        help="Also publish dead-reckoned positions of boats and trucks HZ times a second between ticks")
+    parser.add_argument("--batch", type=int, metavar="RECORDS",
+                        help="Buffer up to RECORDS periodic records per device and publish them as one payload")
+    parser.add_argument("--batch-seconds", type=float, default=batching.MAX_SECONDS, metavar="SECONDS",
+                        help="With --batch, publish a device's buffer once its oldest record is SECONDS old")
+    parser.add_argument("--batch-format", choices=batching.FORMATS, default="records",
+                        help="With --batch, a records array or the ThingsBoard [{ts, values}] list")
+    parser.add_argument("--qos", action="append", default=[], metavar="TYPE=QOS",
+                        help="MQTT QoS (0, 1 or 2) for a device type, e.g. truck=1")
+    parser.add_argument("--mqtt5", action="store_true",
+                        help="Connect with MQTT 5: topic aliases, receive-maximum in-flight window, message and session expiry")
+    parser.add_argument("--fleet", metavar="FILE",
+                        help="Read the fridges from a JSON fleet file and apply edits to it while running")
+    parser.add_argument("--export-fleet", metavar="FILE", help="Write the built-in fridges as a fleet file and exit")
+    checkpoint.add_arguments(parser)
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    if args.export_fleet:
+        fleet_config.save_fleet(args.export_fleet, FRIDGES)
+        return
+    watcher = None
+    if args.fleet:
+        watcher = fleet_config.FleetWatcher(args.fleet, required=("imei", "name", "type", "lat", "lng", "token"),
+                                              validate=fleet_config.check_moving)
+        FRIDGES[:] = [prepare_fridge(dict(device)) for device in watcher.load()]
+    for mapping in args.io_profile:
+        device_type, _, profile = mapping.partition("=")
+        if profile not in IO_PROFILES:
+            parser.error(f"unknown IO profile {profile!r}, choose from {', '.join(IO_PROFILES)}")
+        DEVICE_PROFILES[device_type] = profile
+    for mapping in args.qos:
+        device_type, _, qos = mapping.partition("=")
+        if qos not in ("0", "1", "2"):
+            parser.error(f"invalid QoS {qos!r} for {device_type}, use 0, 1 or 2")
+        DEVICE_QOS[device_type] = int(qos)
+    filters = make_filters(args)
+    engines = make_event_engines(args)
+    batcher = make_batcher(args)
+
+    if args.dump:
+        dump_packets(args.dump, filters, engines, batcher, args)
+        return
+
+    logs.setup_logging("fmc230")
+    metrics.start_http_server(METRICS_PORT)
+    profiling.start_from_args("fmc230", args)
+    moving = {fridge["imei"]: prepare_fridge(fridge) for fridge in FRIDGES if fridge["type"] != "static"}
+    checkpoint.resume(checkpoint.from_args(args), moving, MOVING_STATE)  # before MovingFleet reads progress
+
+    # Create clients per device
+    clients = {}
+    sessions = {}
+    for fridge in FRIDGES:
+        if fridge["token"]:
+            clients[fridge["imei"]], session = connect_fridge(fridge, args.mqtt5)
+            if session:
+                sessions[fridge["imei"]] = session
+
+    # Main Loop
+    ticker = metrics.TickTimer("fmc230", PUBLISH_INTERVAL)
+    outbox = events.PublishQueue()
+    fleet = MovingFleet(FRIDGES)
+    geofences = make_geofences(args, fleet)
+    steps = position_steps(args)
+    ticks = 0
+    while True:
+        queue_tick(outbox, fleet, filters, engines, ticks, geofences)
+        tick_start = time.monotonic()
+        for fridge, packet in publish_queue(outbox, batcher):
+            publish(clients, sessions, fridge, packet)
+        for step in range(1, steps):
+            delay = tick_start + step * PUBLISH_INTERVAL / steps - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            for fridge, packet in position_packets(fleet, step * PUBLISH_INTERVAL / steps):
+                publish(clients, sessions, fridge, packet)
+        ticks += 1
+        changes = watcher.poll() if watcher else None
+        if changes:
+            reload_fleet(changes, clients, sessions, args.mqtt5, batcher)
+            fleet = MovingFleet(FRIDGES)  # progress lives in the fridge dicts, so moving vehicles carry on
+            geofences = make_geofences(args, fleet, geofences)
+            moving.clear()
+            moving.update((fridge["imei"], fridge) for fridge in FRIDGES if fridge["type"] != "static")
+            for device_type in {fridge["type"] for fridge in FRIDGES}:
+                if filters is not None and device_type not in filters:
+                    filters[device_type] = deadband.DeadbandFilter(device_type, keyframe_every=args.keyframe_every)
+                if engines is not None and device_type not in engines:
+                    engines[device_type] = events.EventEngine(device_type)
+        if ticks % REPORT_EVERY == 0:
+            for device_filter in (filters or {}).values():
+                logger.info("Report by exception | %s", device_filter.report())
+            if batcher:
+                logger.info("Batching | %s", batcher.report())
+        ticker.wait()
+
+if __name__ == "__main__":
+    main()
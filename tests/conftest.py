@@ -0,0 +1,7 @@
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)  # the shared fleetsim package
+
+from fleetsim.cli import load_script  # the same loader as the CLI and the benchmarks
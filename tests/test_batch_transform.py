@@ -0,0 +1,36 @@
+import math
+import os
+
+import numpy as np
+
+from conftest import REPO_DIR, load_script
+
+batch_transform = load_script("RuleChain/batch_transform.py")
+
+
+def sample_packets():
+    packets = []
+    for name in ("sample_packet.json", "sample_minimal_packet.json", "sample_event_packets.json"):
+        packets.extend(batch_transform.read_packets(os.path.join(REPO_DIR, name)))
+    return packets
+
+
+def test_batch_output_matches_the_per_message_transform():
+    packets = sample_packets() * 2
+    output = batch_transform.columns_to_json(batch_transform.transform_batch(packets))
+    for row, packet in enumerate(packets):
+        expected = batch_transform.transform_packet(packet)
+        for key, value in expected.items():
+            if isinstance(value, float):
+                assert math.isclose(output[key][row], value), (row, key)
+            else:
+                assert output[key][row] == value, (row, key)
+        # Fields the packet's layout doesn't have come out as null
+        assert all(output[key][row] is None for key in output if key not in expected)
+
+
+def test_inactive_ble_sensors_keep_their_sentinel():
+    packet = {"state": {"reported": {"latlng": "-33.9,18.5", "25": 32767, "26": -456}}}
+    columns = batch_transform.transform_batch([packet, packet])
+    assert columns["ble_temp_1"].tolist() == [32767, 32767]
+    assert np.allclose(columns["ble_temp_2"], -4.56)
@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import pytest
+
+from fleetsim import batching
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(batching, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def record(ts):
+    return {"state": {"reported": {"ts": ts, "10800": -2000}}}
+
+
+TRUCK = {"imei": "1", "type": "truck"}
+BOAT = {"imei": "2", "type": "boat"}
+
+
+def test_a_full_batch_is_returned_by_the_record_that_fills_it(clock):
+    batcher = batching.Batcher(max_records=3, max_seconds=60)
+    assert batcher.add(TRUCK, record(1)) is None
+    assert batcher.add(TRUCK, record(2)) is None
+    assert batcher.add(TRUCK, record(3)) == {"records": [{"ts": ts, "10800": -2000} for ts in (1, 2, 3)]}
+    assert batcher.buffers == {}
+
+
+def test_batches_flush_once_their_oldest_record_is_max_seconds_old(clock):
+    batcher = batching.Batcher(max_records=10, max_seconds=60)
+    batcher.add(TRUCK, record(1))
+    clock.now += 30
+    batcher.add(BOAT, record(2))
+    batcher.add(TRUCK, record(3))
+    clock.now += 29.9
+    assert batcher.flush_due() == []
+    clock.now += 0.1
+    assert batcher.flush_due() == [(TRUCK, {"records": [{"ts": 1, "10800": -2000}, {"ts": 3, "10800": -2000}]})]
+    clock.now += 30
+    assert [device for device, _ in batcher.flush_due()] == [BOAT]
+    assert batcher.max_delay == 60.0
+
+
+def test_force_and_per_device_flushes(clock):
+    batcher = batching.Batcher(max_records=10, max_seconds=60)
+    batcher.add(TRUCK, record(1))
+    batcher.add(BOAT, record(2))
+    assert batcher.flush_device("1") == {"records": [{"ts": 1, "10800": -2000}]}
+    assert batcher.flush_device("1") is None
+    assert [device for device, _ in batcher.flush_due(force=True)] == [BOAT]
+
+
+def test_thingsboard_format(clock):
+    batcher = batching.Batcher(max_records=2, payload_format="thingsboard")
+    batcher.add(TRUCK, record(1))
+    assert batcher.add(TRUCK, record(2)) == [{"ts": 1, "values": {"10800": -2000}}, {"ts": 2, "values": {"10800": -2000}}]
+    with pytest.raises(ValueError, match="Unknown batch format"):
+        batching.Batcher(payload_format="csv")
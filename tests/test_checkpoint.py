@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from fleetsim import checkpoint
+
+
+def test_save_and_load_round_trip_without_leaving_a_temporary_file(tmp_path):
+    path = tmp_path / "nested" / "state.npz"
+    checkpoint.save(path, {"key": np.array(["a", "b"]), "temp": np.array([-20.5, -18.0]), "on": np.array([True, False])})
+    arrays = checkpoint.load(path)
+    assert arrays["key"].tolist() == ["a", "b"]
+    assert arrays["temp"].tolist() == [-20.5, -18.0] and arrays["on"].dtype == bool
+    assert [entry.name for entry in path.parent.iterdir()] == ["state.npz"]
+
+
+def test_missing_or_unreadable_checkpoints_load_as_none(tmp_path):
+    assert checkpoint.load(tmp_path / "missing.npz") is None
+    torn = tmp_path / "torn.npz"
+    torn.write_bytes(b"PK\x03\x04 not really a zip")
+    assert checkpoint.load(torn) is None
+
+
+def test_columns_and_restore_for_dicts_and_attribute_paths(tmp_path):
+    records = {
+        "1": {"lat": 1.0, "progress": 0.25, "hold": 30.0},
+        "2": {"lat": 2.0, "progress": 0.5, "hold": 0.0},
+    }
+    path = tmp_path / "fleet.npz"
+    checkpoint.save(path, checkpoint.columns(records, ("lat", "progress", "hold")))
+
+    # "3" is new since the checkpoint and "1" was dropped; a field the checkpoint lacks is left alone
+    resumed = {"2": {"lat": 0.0, "progress": 0.0, "hold": 0.0, "speed": 5}, "3": {"lat": 9.0, "progress": 0.0, "hold": 0.0}}
+    assert checkpoint.restore(resumed, checkpoint.load(path), ("lat", "progress", "speed")) == 1
+    assert resumed == {"2": {"lat": 2.0, "progress": 0.5, "hold": 0.0, "speed": 5}, "3": {"lat": 9.0, "progress": 0.0, "hold": 0.0}}
+
+    objects = {"a": SimpleNamespace(normal=SimpleNamespace(current_temp=-19.5), on=True)}
+    arrays = checkpoint.columns(objects, ("normal.current_temp", "on"))
+    fresh = {"a": SimpleNamespace(normal=SimpleNamespace(current_temp=0.0), on=False)}
+    checkpoint.restore(fresh, arrays, ("normal.current_temp", "on"))
+    assert (fresh["a"].normal.current_temp, fresh["a"].on) == (-19.5, True)
+
+
+def test_ragged_routes_pack_into_two_arrays():
+    routes = [[(1.0, 2.0), (3.0, 4.0)], [(5.0, 6.0), (7.0, 8.0), (9.0, 10.0)]]
+    points, counts = checkpoint.pack_routes(routes)
+    assert points.shape == (5, 2) and counts.tolist() == [2, 3]
+    assert checkpoint.unpack_routes(points, counts) == routes
+
+
+def test_checkpointer_saves_the_current_snapshot(tmp_path):
+    state = {"1": {"progress": 0.1}}
+    checkpointer = checkpoint.Checkpointer(str(tmp_path / "fleet.npz"), every=3600)
+    assert checkpointer.load() is None
+    checkpointer.save()  # nothing to save before start()
+    assert checkpointer.load() is None
+    checkpointer.snapshot = lambda: checkpoint.columns(state, ("progress",))
+    state["1"]["progress"] = 0.7
+    checkpointer.save()
+    assert checkpointer.load()["progress"].tolist() == [0.7]
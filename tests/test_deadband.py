@@ -0,0 +1,72 @@
+import json
+
+from fleetsim import deadband
+
+
+def packet(**reported):
+    return {"state": {"reported": {"ts": 1, "pr": 0, "evt": 0, **reported}}}
+
+
+def test_parse_deadband():
+    assert deadband.parse_deadband(50) == ("abs", 50.0)
+    assert deadband.parse_deadband("5%") == ("pct", 5.0)
+
+
+def test_fields_inside_their_deadband_are_dropped():
+    device_filter = deadband.DeadbandFilter("static", keyframe_every=0)
+    assert device_filter.filter("a", packet(**{"10800": -2000, "66": 12000}))["state"]["reported"] == \
+        {"ts": 1, "pr": 0, "evt": 0, "10800": -2000, "66": 12000}
+    assert device_filter.filter("a", packet(**{"10800": -1951, "66": 12500})) is None  # 0.49 °C, 4.2 %
+    reported = device_filter.filter("a", packet(**{"10800": -1950, "66": 12600}))["state"]["reported"]
+    assert reported == {"ts": 1, "pr": 0, "evt": 0, "10800": -1950, "66": 12600}
+
+
+def test_changes_are_measured_from_the_last_value_sent():
+    device_filter = deadband.DeadbandFilter("static", {"10800": 50}, keyframe_every=0)
+    device_filter.filter("a", packet(**{"10800": -2000}))
+    for value in (-1980, -1960):  # creeping up never moves past 0.5 °C from -2000 ...
+        assert device_filter.filter("a", packet(**{"10800": value})) is None
+    assert device_filter.filter("a", packet(**{"10800": -1940})) is not None  # ... until it does
+
+
+def test_unlisted_and_non_numeric_fields_are_sent_on_any_change():
+    device_filter = deadband.DeadbandFilter("static", keyframe_every=0)
+    device_filter.filter("a", packet(latlng="1,2", flag=True, **{"252": 0}))
+    assert device_filter.filter("a", packet(latlng="1,2", flag=True, **{"252": 0})) is None
+    assert device_filter.filter("a", packet(latlng="1,3", flag=True, **{"252": 0}))["state"]["reported"]["latlng"] == "1,3"
+    assert device_filter.filter("a", packet(latlng="1,3", flag=False, **{"252": 0}))["state"]["reported"]["flag"] is False
+    assert device_filter.filter("a", packet(latlng="1,3", flag=False, **{"252": 1}))["state"]["reported"]["252"] == 1
+
+
+def test_keyframes_send_the_full_packet_per_device():
+    device_filter = deadband.DeadbandFilter("static", keyframe_every=3)
+    full = packet(**{"10800": -2000, "21": 3})
+    sent = [device_filter.filter(device, full) for device in ("a", "b", "a", "a", "b", "a")]
+    assert [result is not None for result in sent] == [True, True, False, False, False, True]
+    assert sent[5] == full
+    assert device_filter.keyframes == 3
+
+
+def test_report_counts_suppressed_messages_and_bytes():
+    device_filter = deadband.DeadbandFilter("static", keyframe_every=0)
+    assert device_filter.report() == "static: no packets yet"
+    for _ in range(4):
+        device_filter.filter("a", packet(**{"10800": -2000}))
+    assert device_filter.full_messages == 4 and device_filter.sent_messages == 1
+    assert device_filter.sent_bytes < device_filter.full_bytes
+    assert "1/4 messages (75.0% fewer publishes)" in device_filter.report()
+
+
+def test_value_bytes_matches_json():
+    for value in (True, False, None, 0, -2000, 12.5, 1e-07, "-33.9,18.5", 'Cargo "A"', "é", [1, 2]):
+        assert deadband.value_bytes(value) == len(json.dumps(value)), value
+
+
+def test_byte_counts_are_estimated_from_the_fields_as_last_sent():
+    device_filter = deadband.DeadbandFilter("static", keyframe_every=0)
+    full = packet(latlng="-33.9,18.5", **{"10800": -2000, "66": 12000})
+    device_filter.filter("a", full)
+    assert device_filter.full_bytes == device_filter.sent_bytes == len(json.dumps(full))
+    result = device_filter.filter("a", packet(latlng="-33.9,18.6", **{"10800": -2010, "66": 12000}))
+    assert device_filter.sent_bytes - len(json.dumps(full)) == len(json.dumps(result))
+    assert device_filter.full_bytes == 2 * len(json.dumps(full))
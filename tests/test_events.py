@@ -0,0 +1,41 @@
+from fleetsim import events
+
+
+def packet(**reported):
+    return {"state": {"reported": {"ts": 1, "pr": 0, "latlng": "1,2", "sp": 0, "evt": 0, "21": 4, **reported}}}
+
+
+def test_excursion_fires_on_leaving_and_on_coming_back_past_the_hysteresis():
+    trigger = events.Excursion("10800", -2500, -1600, hysteresis=100)
+    state = {}
+    fired = [trigger.fires(value, state) for value in (-2000, -1550, -1650, -1750, -1800, -2600)]
+    assert fired == [False, True, False, True, False, True]
+
+
+def test_change_and_rising_need_a_previous_value():
+    change, rising = events.Change("10808"), events.Rising("10820")
+    change_state, rising_state = {}, {}
+    assert [change.fires(value, change_state) for value in (1, 1, 0, 1)] == [False, False, True, True]
+    assert [rising.fires(value, rising_state) for value in (1, 0, 1, 1, 0)] == [False, False, True, False, False]
+
+
+def test_engine_builds_one_event_per_trigger_with_the_avl_header():
+    engine = events.EventEngine("static")
+    assert engine.check("a", packet(**{"10800": -2000, "10808": 0})) == []
+    [event] = engine.check("a", packet(**{"10800": -2000, "10808": 1}))
+    reported = event["state"]["reported"]
+    assert reported["evt"] == 10808 and reported["10808"] == 1
+    assert set(reported) == {"ts", "pr", "latlng", "sp", "evt", "10808"}
+    assert engine.check("b", packet(**{"10808": 1})) == []  # state is per device
+
+
+def test_events_drain_before_periodic_packets_in_fifo_order():
+    queue = events.PublishQueue()
+    fridge = {"imei": "1", "type": "static"}
+    queue.put(events.PERIODIC, fridge, "periodic 1")
+    queue.put(events.EVENT, fridge, "event 1")
+    queue.put(events.PERIODIC, fridge, "periodic 2")
+    queue.put(events.EVENT, fridge, "event 2")
+    assert [(priority, packet) for priority, _, packet in queue.drain()] == [
+        (events.EVENT, "event 1"), (events.EVENT, "event 2"), (events.PERIODIC, "periodic 1"), (events.PERIODIC, "periodic 2")]
+    assert list(queue.drain()) == []
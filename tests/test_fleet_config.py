@@ -0,0 +1,109 @@
+import copy
+import json
+import os
+
+import pytest
+
+import fmc230_simulator as fmc
+from fleetsim import fleet_config
+
+STATIC = {"imei": "1", "name": "Shop", "type": "static", "lat": -33.9, "lng": 18.4, "token": ""}
+TRUCK = {"imei": "2", "name": "Truck", "type": "truck", "lat": -33.9, "lng": 18.4, "token": "",
+         "speed_kmh": 60, "route": [[-33.9, 18.4], [-33.6, 19.0]]}
+
+
+def write(path, devices):
+    path.write_text(json.dumps(devices), encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))  # a new signature even within one mtime tick
+
+
+def watcher(path, devices):
+    write(path, devices)
+    watcher = fleet_config.FleetWatcher(str(path), required=("imei", "name", "type", "lat", "lng", "token"),
+                                        validate=fleet_config.check_moving)
+    watcher.load()
+    return watcher
+
+
+def test_diff_finds_added_removed_and_changed_keys():
+    old = [STATIC, TRUCK]
+    new = [{**TRUCK, "speed_kmh": 80}, {**STATIC, "imei": "3"}]
+    changes = fleet_config.diff(old, new)
+    assert [device["imei"] for device in changes.added] == ["3"]
+    assert [device["imei"] for device in changes.removed] == ["1"]
+    assert changes.changed == {"2": {"speed_kmh": 80}}
+    assert str(changes) == "1 added, 1 removed, 1 changed"
+    assert not fleet_config.diff(old, copy.deepcopy(old))
+
+
+def test_poll_returns_a_diff_only_when_the_file_changes(tmp_path):
+    path = tmp_path / "fleet.json"
+    fleet = watcher(path, [STATIC, TRUCK])
+    assert fleet.devices[1]["route"] == [(-33.9, 18.4), (-33.6, 19.0)]
+    assert fleet.poll() is None
+    write(path, [STATIC, {**TRUCK, "route": [[-33.9, 18.4], [-29.7, 17.9]]}])
+    assert fleet.poll().changed == {"2": {"route": [(-33.9, 18.4), (-29.7, 17.9)]}}
+
+
+@pytest.mark.parametrize("device, message", [
+    ({**STATIC, "imei": "3", "type": "truck"}, "truck 3 needs a route"),
+    ({**TRUCK, "route": [[-33.9, 18.4]]}, "needs a route of at least 2 points"),
+    ({**TRUCK, "route": [[-33.9, 18.4], [-33.6]]}, "not \\[lat, lng\\]"),
+    ({key: value for key, value in TRUCK.items() if key != "speed_kmh"}, "needs speed_kmh or speed_knots"),
+    ({**TRUCK, "speed_kmh": "fast"}, "not a number"),
+    ({key: value for key, value in TRUCK.items() if key != "token"}, "missing token"),
+    ({**STATIC, "name": "Duplicate"}, "duplicate imei 1"),
+])
+def test_incomplete_devices_reject_the_whole_file(tmp_path, caplog, device, message):
+    path = tmp_path / "fleet.json"
+    fleet = watcher(path, [STATIC, TRUCK])
+    write(path, [{**STATIC, "name": "Renamed"}, device])
+    assert fleet.poll() is None
+    assert any(record.levelname == "ERROR" for record in caplog.records)
+    with pytest.raises(ValueError, match=message):
+        fleet_config.load_fleet(str(path), fleet.required, fleet_config.check_moving)
+    assert fleet.devices[0]["name"] == "Shop"  # nothing from the rejected file is kept
+
+
+def test_a_type_change_to_a_vehicle_needs_its_route_and_speed(tmp_path):
+    path = tmp_path / "fleet.json"
+    fleet = watcher(path, [STATIC, TRUCK])
+    write(path, [{**STATIC, "type": "truck", "speed_kmh": 50}, TRUCK])
+    assert fleet.poll() is None
+    assert fleet.devices[0]["type"] == "static"
+
+
+@pytest.fixture
+def live(monkeypatch):
+    """STATIC and TRUCK as the fmc230 fleet, with connections recorded instead of made"""
+    fridges = [fmc.prepare_fridge(copy.deepcopy(device)) for device in (STATIC, TRUCK)]
+    fridges[1]["route"] = [tuple(point) for point in fridges[1]["route"]]
+    monkeypatch.setattr(fmc, "FRIDGES", fridges)
+    connected = []
+    monkeypatch.setattr(fmc, "connect_fridge", lambda fridge, use_mqtt5=False: (connected.append(fridge["imei"]) or object(), None))
+    return fridges, connected
+
+
+def test_reload_applies_a_diff_in_place(tmp_path, live):
+    fridges, connected = live
+    truck = fridges[1]
+    fleet = fmc.MovingFleet(fridges)
+    fleet.advance(600)
+    progress = truck["progress"]
+    path = tmp_path / "fleet.json"
+    fleet_watcher = watcher(path, [STATIC, TRUCK])
+
+    write(path, [{**STATIC, "type": "truck", "speed_kmh": 40, "route": [[-33.9, 18.4], [-34.0, 18.6]], "token": "T"},
+                 {**TRUCK, "speed_kmh": 90}, {**STATIC, "imei": "3", "name": "New shop"}])
+    changes = fleet_watcher.poll()
+    fmc.reload_fleet(changes, {}, {})
+
+    by_imei = {fridge["imei"]: fridge for fridge in fmc.FRIDGES}
+    assert sorted(by_imei) == ["1", "2", "3"]
+    assert by_imei["2"] is truck and by_imei["2"]["speed_kmh"] == 90 and by_imei["2"]["progress"] == progress
+    assert by_imei["1"]["type"] == "truck" and by_imei["1"]["progress"] == 0 and by_imei["1"]["hold"] == 0.0
+    assert connected == ["1"]  # a type change gives the device a new session; only it has a token
+    moving = fmc.MovingFleet(fmc.FRIDGES)
+    moving.advance()
+    assert sorted(fridge["imei"] for fridge in moving.fridges) == ["1", "2"]
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from fleetsim.freezer_fleet import PARAMETERS, STATE, FreezerFleet
+
+
+def test_parameters_take_a_fleet_value_or_one_per_unit():
+    fleet = FreezerFleet(3, seed=1, min_temp=[-25.0, -24.0, -23.0], door_open_probability=0.5)
+    np.testing.assert_array_equal(fleet.min_temp, [-25.0, -24.0, -23.0])
+    np.testing.assert_array_equal(fleet.door_open_probability, [0.5] * 3)
+    np.testing.assert_array_equal(fleet.max_temp, [PARAMETERS["max_temp"]] * 3)
+    with pytest.raises(ValueError, match="Unknown freezer parameters"):
+        FreezerFleet(3, target=-20)
+
+
+def test_step_switches_the_compressor_at_min_and_max_temp():
+    fleet = FreezerFleet(1000, seed=2)
+    switched_on = switched_off = 0
+    for _ in range(400):
+        was_on = fleet.compressor_on.copy()
+        fleet.step()
+        on, off = fleet.compressor_on & ~was_on, ~fleet.compressor_on & was_on
+        assert (fleet.current_temp[on] == PARAMETERS["max_temp"]).all() and (fleet.current_temp[off] == PARAMETERS["min_temp"]).all()
+        assert (fleet.current_temp <= PARAMETERS["max_temp"]).all()
+        switched_on += int(on.sum())
+        switched_off += int(off.sum())
+        assert (fleet.current_humidity >= 40.0).all() and (fleet.current_humidity <= 60.0).all()
+        assert (fleet.power_consumption[~fleet.compressor_on] == PARAMETERS["idle_power"]).all()
+    assert switched_on > 0 and switched_off > 0
+
+
+def test_start_up_surge_draws_peak_power_for_two_minutes():
+    fleet = FreezerFleet(1, seed=3, temp_variation=0.0)
+    fleet.current_temp[:] = PARAMETERS["max_temp"] - 0.01
+    fleet.step()
+    assert fleet.compressor_on[0] and fleet.power_consumption[0] == PARAMETERS["peak_power"]
+    for _ in range(4):
+        fleet.step()
+    assert fleet.is_startup_surge[0] and fleet.power_consumption[0] == PARAMETERS["peak_power"]
+    fleet.step()
+    assert not fleet.is_startup_surge[0] and fleet.power_consumption[0] != PARAMETERS["peak_power"]
+
+
+def test_state_round_trip():
+    fleet = FreezerFleet(50, seed=4, max_temp=np.linspace(-18, -16, 50))
+    for _ in range(20):
+        fleet.step()
+    state = fleet.state()
+    assert state["min_temp"].shape == (1,) and state["max_temp"].shape == (50,)
+    resumed = FreezerFleet.from_state(state)
+    assert resumed.now == fleet.now
+    for name in STATE + tuple(PARAMETERS):
+        np.testing.assert_array_equal(getattr(resumed, name), getattr(fleet, name))
+
+
+@pytest.mark.parametrize("min_temp, max_temp", [(-20.0, -20.0), (-17.0, -23.0), ([-23.0, -20.0], [-17.0, -20.0])])
+def test_min_temp_must_be_below_max_temp(min_temp, max_temp):
+    with pytest.raises(ValueError, match="min_temp must be below max_temp"):
+        FreezerFleet(2, min_temp=min_temp, max_temp=max_temp)
+
+
+def test_advance_jumps_through_compressor_cycles_in_closed_form():
+    fleet = FreezerFleet(500, seed=5, temp_variation=0.0)
+    fleet.advance(7 * 24 * 3600)
+    assert fleet.now == 7 * 24 * 3600
+    assert (fleet.current_temp >= PARAMETERS["min_temp"] - 1e-9).all()
+    assert (fleet.current_temp <= PARAMETERS["max_temp"] + 1e-9).all()
+    assert not (fleet.is_startup_surge & (fleet.now - fleet.compressor_start_time > 120)).any()
+
+
+def test_advance_follows_the_linear_rates_through_a_switch():
+    fleet = FreezerFleet(2, seed=6, temp_variation=0.0, door_open_probability=0.0)
+    fleet.current_temp[:] = [-20.0, -17.08]  # the second reaches max_temp after 30 s
+    fleet.advance(300)
+    np.testing.assert_allclose(fleet.current_temp, [-20.0 + 0.08 * 10, -17.0 - 0.15 * 9])
+    np.testing.assert_array_equal(fleet.compressor_on, [False, True])
+    np.testing.assert_allclose(fleet.compressor_start_time, [0.0, 30.0])
+    np.testing.assert_array_equal(fleet.is_startup_surge, [False, False])
+    np.testing.assert_allclose(fleet.compressor_temp, [PARAMETERS["compressor_min_temp"], PARAMETERS["compressor_max_temp"]])
+
+
+@pytest.mark.parametrize("ticks", [1, 5, 37, 400])
+def test_advance_matches_stepping_without_random_variation(ticks):
+    parameters = dict(temp_variation=0.0, door_open_probability=0.0, cooling_rate=np.linspace(0.1, 0.5, 40),
+                      warming_rate=np.linspace(0.05, 0.3, 40))
+    stepped, jumped = FreezerFleet(40, seed=7, **parameters), FreezerFleet(40, seed=7, **parameters)
+    for fleet in (stepped, jumped):
+        fleet.current_temp[:] = np.linspace(-23.0, -17.0, 40)
+        fleet.compressor_on[::3] = True
+    for _ in range(ticks):
+        stepped.step(30)
+    jumped.advance(ticks * 30)
+    assert jumped.now == stepped.now
+    for name in ("current_temp", "compressor_temp", "compressor_start_time"):
+        np.testing.assert_allclose(getattr(jumped, name), getattr(stepped, name), err_msg=name)
+    for name in ("compressor_on", "is_startup_surge"):
+        np.testing.assert_array_equal(getattr(jumped, name), getattr(stepped, name), err_msg=name)
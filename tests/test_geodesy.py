@@ -0,0 +1,16 @@
+import numpy as np
+import pytest
+
+from fleetsim import geodesy
+
+POINTS = [(-33.9249, 18.4241, -29.6641, 17.8866), (51.5, -0.12, 40.7, -74.0), (10.0, 179.5, 10.5, -179.5), (1.0, 2.0, 1.0, 2.0)]
+
+
+@pytest.mark.parametrize("lat1, lng1, lat2, lng2", POINTS)
+def test_scalar_helpers_match_the_array_versions(lat1, lng1, lat2, lng2):
+    assert geodesy.scalar_haversine(lat1, lng1, lat2, lng2) == pytest.approx(float(geodesy.haversine(lat1, lng1, lat2, lng2)))
+    if (lat1, lng1) != (lat2, lng2):
+        assert geodesy.scalar_initial_bearing(lat1, lng1, lat2, lng2) == pytest.approx(float(geodesy.initial_bearing(lat1, lng1, lat2, lng2)))
+    for fraction in (0.0, 0.3, 1.0):
+        np.testing.assert_allclose(geodesy.scalar_slerp(lat1, lng1, lat2, lng2, fraction),
+                                   geodesy.slerp(lat1, lng1, lat2, lng2, fraction), atol=1e-9)
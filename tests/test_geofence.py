@@ -0,0 +1,112 @@
+import copy
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import fmc230_simulator as fmc
+from fleetsim import checkpoint, events, geofence
+
+CAPE_TOWN = (-33.9249, 18.4241)
+
+
+def site(site_id, lat, lng, kind="depot", radius_km=0.5):
+    return {"id": site_id, "kind": kind, "lat": lat, "lng": lng, "radius_km": radius_km}
+
+
+@pytest.fixture
+def fridges(monkeypatch):
+    fridges = [fmc.prepare_fridge(fridge) for fridge in copy.deepcopy(fmc.FRIDGES)]
+    monkeypatch.setattr(fmc, "FRIDGES", fridges)
+    return fridges
+
+
+def test_query_finds_points_inside_and_across_the_antimeridian():
+    index = geofence.GeofenceIndex([site("a", 0.0, 0.0), site("b", 10.0, 179.999, radius_km=5.0)])
+    points, sites = index.query([0.0, 0.001, 1.0, 10.0], [0.0, 0.0, 1.0, -179.999])
+    assert list(zip(points.tolist(), sites.tolist())) == [(0, 0), (1, 0), (3, 1)]
+    assert [found["id"] for found in index.sites_at(10.0, -179.999)] == ["b"]
+
+
+def test_enter_dwell_and_exit():
+    tracker = geofence.GeofenceTracker(geofence.GeofenceIndex([site("depot", 0.0, 0.0)]), ["truck"])
+    assert tracker.update([1.0], [1.0], now=0.0) == []
+    [(unit, entered_site, entered, dwell)] = tracker.update([0.0], [0.0], now=100.0)
+    assert (unit, entered_site["id"], entered, dwell) == ("truck", "depot", True, 0.0)
+    assert tracker.update([0.001], [0.0], now=200.0) == []
+    assert [found["id"] for found in tracker.sites_of(0)] == ["depot"]
+    [(unit, _, entered, dwell)] = tracker.update([1.0], [1.0], now=400.0)
+    assert (unit, entered, dwell) == ("truck", False, 300.0)
+
+
+def test_update_one_matches_update():
+    index = geofence.GeofenceIndex([site("a", 0.0, 0.0), site("b", 0.002, 0.0)])
+    one = geofence.GeofenceTracker(index, ["x", "y"])
+    many = geofence.GeofenceTracker(index, ["x", "y"])
+    for lat in (1.0, 0.0, 0.001, 0.002, 1.0):
+        changes = one.update_one(1, lat, 0.0, now=lat) + one.update_one(0, -lat, 0.0, now=lat)
+        expected = many.update([-lat, lat], [0.0, 0.0], now=lat)
+        assert sorted((unit, s["id"], entered) for unit, s, entered, _ in changes) == \
+            sorted((unit, s["id"], entered) for unit, s, entered, _ in expected)
+
+
+def test_one_place_can_hold_sites_of_several_kinds():
+    index = geofence.GeofenceIndex([site("cpt", *CAPE_TOWN, kind="port", radius_km=1.0), site("cpt", *CAPE_TOWN),
+                                    site("cpt", *CAPE_TOWN, kind="port", radius_km=1.0)])
+    assert sorted(found["kind"] for found in index.sites_at(*CAPE_TOWN)) == ["depot", "port"]
+
+
+def test_reload_carries_membership_over_by_kind_and_id():
+    sites = [site("cpt", *CAPE_TOWN, kind="port"), site("cpt", *CAPE_TOWN)]
+    old = geofence.GeofenceTracker(geofence.GeofenceIndex(sites), ["a", "b"])
+    old.update([CAPE_TOWN[0], 0.0], [CAPE_TOWN[1], 0.0], now=10.0)
+    new = geofence.GeofenceTracker(geofence.GeofenceIndex(sites[1:]), ["b", "a"], old)
+    assert [(found["kind"], found["id"]) for found in new.sites_of(1)] == [("depot", "cpt")]
+    [(unit, _, entered, dwell)] = new.update([0.0, 0.0], [0.0, 0.0], now=70.0)
+    assert (unit, entered, dwell) == ("a", False, 60.0)
+
+
+def test_seed_enters_without_events():
+    tracker = geofence.GeofenceTracker(geofence.GeofenceIndex([site("depot", 0.0, 0.0)]), ["truck"])
+    tracker.seed([0.0], [0.0], now=0.0)
+    assert tracker.update([0.0], [0.0], now=30.0) == []
+    [(_, _, entered, dwell)] = tracker.update([1.0], [1.0], now=90.0)
+    assert (entered, dwell) == (False, 90.0)
+
+
+def test_trucks_halt_at_a_depot_that_is_also_a_port(fridges):
+    fleet = fmc.MovingFleet(fridges)
+    tracker = fmc.make_geofences(SimpleNamespace(geofence=True), fleet)
+    truck = fleet.rows["356938035643813"]
+    assert sorted(found["kind"] for found in tracker.sites_of(truck)) == ["depot", "port"]  # seeded at its route start
+
+    fleet.advance(600)
+    outbox = events.PublishQueue()
+    fmc.check_geofences(outbox, fleet, tracker)
+    assert tracker.sites_of(truck) == []
+    assert fleet.hold[truck] == 0
+    fleet.lat[truck], fleet.lng[truck] = CAPE_TOWN
+    fmc.check_geofences(outbox, fleet, tracker)
+
+    entries = [packet["state"]["reported"] for _, fridge, packet in outbox.drain()
+               if fridge["imei"] == "356938035643813" and packet["state"]["reported"]["155"] == 1]
+    assert [entry["geofence"] for entry in entries] == ["-33.9249,18.4241"] * 2  # the port fence and the depot fence
+    assert fleet.hold[truck] >= fmc.DWELL_SECONDS["depot"][0]
+
+
+def test_checkpoint_keeps_the_remaining_halt(fridges, tmp_path):
+    moving = {fridge["imei"]: fridge for fridge in fridges if fridge["type"] != "static"}
+    fleet = fmc.MovingFleet(fridges)
+    fleet.advance(600)
+    fleet.stop(fleet.rows["356938035643813"], 1800)
+    fleet.advance(30)
+    path = tmp_path / "fleet.npz"
+    checkpoint.save(path, checkpoint.columns(moving, fmc.MOVING_STATE))
+
+    resumed = [fmc.prepare_fridge(fridge) for fridge in copy.deepcopy(fmc.FRIDGES)]
+    restored = checkpoint.restore({fridge["imei"]: fridge for fridge in resumed}, checkpoint.load(path), fmc.MOVING_STATE)
+    assert restored == len(moving)
+    again = fmc.MovingFleet(resumed)
+    np.testing.assert_array_equal(again.hold, fleet.hold)
+    np.testing.assert_array_equal(again.progress, fleet.progress)
+    assert again.hold[again.rows["356938035643813"]] == 1770
@@ -0,0 +1,64 @@
+import copy
+import json
+import os
+
+import pytest
+
+import fmc230_simulator as fmc
+from conftest import REPO_DIR
+
+
+@pytest.fixture
+def fridges():
+    return {fridge["type"]: fmc.prepare_fridge(fridge) for fridge in copy.deepcopy(fmc.FRIDGES)}
+
+
+@pytest.mark.parametrize("profile", list(fmc.IO_PROFILES))
+def test_each_profile_sends_exactly_its_fields_in_order(profile, fridges):
+    generate = fmc.compile_generator(fmc.IO_PROFILES[profile])
+    for fridge in fridges.values():
+        reported = generate(fridge)["state"]["reported"]
+        assert list(reported) == fmc.IO_PROFILES[profile]
+
+
+def test_minimal_profile_matches_the_sample_packet(fridges):
+    with open(os.path.join(REPO_DIR, "sample_minimal_packet.json"), encoding="utf-8") as f:
+        sample = json.load(f)["state"]["reported"]
+    reported = fmc.compile_generator(fmc.IO_PROFILES["minimal"])(fridges["static"])["state"]["reported"]
+    assert list(reported) == list(sample)
+    assert reported["latlng"] == f"{fridges['static']['lat']},{fridges['static']['lng']}"
+
+
+def test_shared_values_are_computed_once_and_only_when_used(monkeypatch, fridges):
+    def unused(fridge, values):
+        raise AssertionError("computed a shared value no field uses")
+    monkeypatch.setitem(fmc.SHARED_VALUES, "speed", unused)
+    monkeypatch.setitem(fmc.SHARED_VALUES, "sensor_battery", unused)
+    generate = fmc.compile_generator(["10800", "pr", "10836"])
+    for _ in range(50):
+        reported = generate(fridges["static"])["state"]["reported"]
+        door_opens = reported["10836"]
+        assert reported["10800"] == int((-18 + door_opens * 0.5) * 100)  # temp follows the same door_opens
+        assert reported["pr"] == (1 if door_opens > 0 else 0)
+
+
+def test_static_fridges_report_no_speed_and_halted_vehicles_stop(fridges):
+    generate = fmc.compile_generator(["sp", "240"])
+    assert generate(fridges["static"])["state"]["reported"] == {"sp": 0, "240": 0}
+    fridges["boat"]["hold"] = 600.0
+    assert generate(fridges["boat"])["state"]["reported"]["sp"] == 0
+    fridges["boat"]["hold"] = 0.0
+    assert generate(fridges["boat"])["state"]["reported"]["sp"] > 0
+
+
+def test_unknown_io_elements_are_rejected():
+    with pytest.raises(ValueError, match="Unknown IO elements: 99999"):
+        fmc.compile_generator(["ts", "99999"])
+
+
+def test_generators_are_compiled_once_per_profile_and_picked_per_fridge(monkeypatch, fridges):
+    assert fmc.packet_generator("eye4") is fmc.packet_generator("eye4")
+    monkeypatch.setitem(fmc.DEVICE_PROFILES, "truck", "minimal")
+    assert list(fmc.generate_packet(fridges["truck"])["state"]["reported"]) == fmc.IO_PROFILES["minimal"]
+    fridges["truck"]["profile"] = "eye4"
+    assert list(fmc.generate_packet(fridges["truck"])["state"]["reported"]) == fmc.IO_PROFILES["eye4"]
@@ -0,0 +1,95 @@
+import itertools
+from types import SimpleNamespace
+
+from fleetsim import metrics
+
+
+class FakeClient:
+    """paho stand-in: publish() returns the next mid with a fixed return code"""
+    def __init__(self, rc=0):
+        self.rc = rc
+        self.mids = itertools.count(1)
+
+    def publish(self, topic, payload, **kwargs):
+        return SimpleNamespace(rc=self.rc, mid=next(self.mids))
+
+
+def values(metric, device_type):
+    return metric.values.get((("device_type", device_type),), 0)
+
+
+def test_counter_renders_one_labelled_line_per_label_set():
+    counter = metrics.Counter("test_things_total", "Things", ("device_type",))
+    metrics.REGISTRY.remove(counter)
+    counter.inc(device_type="boat")
+    counter.inc(2, device_type="boat")
+    counter.inc(device_type="truck")
+    assert counter.render() == ['test_things_total{device_type="boat"} 3', 'test_things_total{device_type="truck"} 1']
+
+
+def test_histogram_renders_cumulative_buckets_count_and_sum():
+    histogram = metrics.Histogram("test_seconds", "Seconds", ("device_type",), buckets=(0.1, 1.0))
+    metrics.REGISTRY.remove(histogram)
+    for value in (0.05, 0.5, 2.0):
+        histogram.observe(value, device_type="static")
+    assert histogram.render() == [
+        'test_seconds_bucket{device_type="static",le="0.1"} 1',
+        'test_seconds_bucket{device_type="static",le="1.0"} 2',
+        'test_seconds_bucket{device_type="static",le="+Inf"} 3',
+        'test_seconds_count{device_type="static"} 3',
+        'test_seconds_sum{device_type="static"} 2.55',
+    ]
+
+
+def test_render_adds_help_and_type_for_every_registered_metric():
+    text = metrics.render()
+    assert "# HELP sim_messages_published_total Publishes confirmed by on_publish" in text
+    assert "# TYPE sim_publish_latency_seconds histogram\n" in text
+    assert text.endswith("\n")
+
+
+def test_acks_match_publishes_in_either_order():
+    tracker = metrics.PublishTracker("test_ack_order")
+    client = FakeClient()
+    tracker.publish(client, "a", "topic", "payload")
+    assert len(tracker.pending) == 1
+    tracker.acked("a", 1)
+    assert len(tracker.pending) == 0
+
+    tracker.acked("a", 2)  # on_publish ran before publish() returned
+    tracker.publish(client, "a", "topic", "payload")
+    assert len(tracker.pending) == 0
+    assert not tracker.early_acks
+    assert values(metrics.MESSAGES_PUBLISHED, "test_ack_order") == 2
+    assert values(metrics.PUBLISH_LATENCY, "test_ack_order")[1] == 2
+    assert values(metrics.BYTES_SENT, "test_ack_order") == 2 * len("topicpayload")
+
+
+def test_qos0_without_a_connection_and_full_queues_are_dropped():
+    tracker = metrics.PublishTracker("test_dropped")
+    tracker.publish(FakeClient(rc=4), "a", "topic", "payload")  # MQTT_ERR_NO_CONN
+    tracker.publish(FakeClient(rc=4), "a", "topic", "payload", qos=1)  # kept by paho for the reconnect
+    tracker.publish(FakeClient(rc=metrics.MQTT_ERR_QUEUE_SIZE), "a", "topic", "payload", qos=1)
+    assert values(metrics.MESSAGES_DROPPED, "test_dropped") == 2
+    assert len(tracker.pending) == 1
+
+
+def test_reconnects_count_unacknowledged_qos1_as_retried_and_unsent_qos0_as_dropped():
+    tracker = metrics.PublishTracker("test_retried")
+    client = FakeClient()
+    tracker.connected("a")
+    tracker.publish(client, "a", "topic", "payload", qos=1)
+    tracker.publish(client, "a", "topic", "payload", qos=2)
+    tracker.publish(client, "a", "topic", "payload")
+    tracker.publish(client, "b", "topic", "payload", qos=1)
+
+    tracker.disconnected("a")
+    assert values(metrics.MESSAGES_DROPPED, "test_retried") == 1
+    assert len(tracker.pending) == 3
+
+    tracker.connected("a")
+    assert values(metrics.RECONNECTS, "test_retried") == 1
+    assert values(metrics.MESSAGES_RETRIED, "test_retried") == 2
+    tracker.acked("a", 1)
+    tracker.acked("a", 2)
+    assert len(tracker.pending) == 1
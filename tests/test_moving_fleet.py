@@ -0,0 +1,34 @@
+import copy
+
+import numpy as np
+
+import fmc230_simulator as fmc
+
+
+def moving_fleet():
+    return fmc.MovingFleet([fmc.prepare_fridge(fridge) for fridge in copy.deepcopy(fmc.FRIDGES)])
+
+
+def test_positions_at_the_end_of_a_tick_match_the_next_advance():
+    fleet = moving_fleet()
+    # Long enough for the trucks to cross waypoints and turn round at both route ends
+    for _ in range(2000):
+        fleet.advance(300)
+        lat, lng = fleet.positions_at(300)
+        halfway = fleet.positions_at(150)
+        fleet.advance(300)
+        np.testing.assert_allclose(lat, fleet.lat, atol=1e-9)
+        np.testing.assert_allclose(lng, fleet.lng, atol=1e-9)
+        assert np.all(np.isfinite(halfway))
+    assert (fleet.direction < 0).any()
+
+
+def test_a_vehicle_halted_mid_tick_stays_put():
+    fleet = moving_fleet()
+    fleet.advance()
+    truck = fleet.rows["356938035643813"]
+    fleet.stop(truck, 60)
+    lat, lng = fleet.positions_at(fmc.PUBLISH_INTERVAL)
+    assert (lat[truck], lng[truck]) == (fleet.lat[truck], fleet.lng[truck])
+    fleet.advance()
+    assert (fleet.lat[truck], fleet.lng[truck]) == (lat[truck], lng[truck])
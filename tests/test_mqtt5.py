@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+from fleetsim import mqtt5
+
+TOPIC = "teltonika/356938035643809/from"
+
+
+class Client:
+    def max_inflight_messages_set(self, inflight):
+        self.inflight = inflight
+
+
+def connected_session(alias_maximum=10, receive_maximum=5):
+    session = mqtt5.Session()
+    client = Client()
+    session.connected(client, SimpleNamespace(TopicAliasMaximum=alias_maximum, ReceiveMaximum=receive_maximum))
+    return session, client
+
+
+def test_qos0_publishes_send_the_topic_once_then_only_the_alias():
+    session, client = connected_session()
+    assert client.inflight == 5
+    topic, properties = session.publish_args(TOPIC)
+    assert (topic, properties.TopicAlias, properties.MessageExpiryInterval) == (TOPIC, 1, mqtt5.MESSAGE_EXPIRY)
+    topic, properties = session.publish_args(TOPIC)
+    assert (topic, properties.TopicAlias) == ("", 1)
+
+
+def test_qos1_and_2_publishes_keep_the_full_topic_for_resends():
+    session, _ = connected_session()
+    for qos in (1, 2, 1):
+        topic, properties = session.publish_args(TOPIC, qos)
+        assert topic == TOPIC and not hasattr(properties, "TopicAlias")
+    topic, properties = session.publish_args(TOPIC, 0)
+    assert (topic, properties.TopicAlias) == (TOPIC, 1)  # announced on the first QoS 0 publish
+
+
+def test_aliases_start_over_on_reconnect_and_respect_the_broker_maximum():
+    session, client = connected_session(alias_maximum=1)
+    session.publish_args(TOPIC)
+    topic, properties = session.publish_args("other/topic")
+    assert topic == "other/topic" and not hasattr(properties, "TopicAlias")  # no alias left for it
+    session.connected(client, SimpleNamespace(TopicAliasMaximum=1))
+    assert session.publish_args(TOPIC)[0] == TOPIC
+
+
+def test_an_aliased_publish_saves_the_topic_bytes():
+    _, properties = connected_session()[0].publish_args(TOPIC)
+    assert mqtt5.publish_packet_size(TOPIC, 300, 0, properties) - mqtt5.publish_packet_size("", 300, 0, properties) == len(TOPIC)
+    assert mqtt5.publish_packet_size(TOPIC, 300, 1) == mqtt5.publish_packet_size(TOPIC, 300, 0) + 2  # packet identifier
+
+
+def test_reset_aliases_forgets_every_alias():
+    session, _ = connected_session()
+    session.publish_args(TOPIC)
+    session.reset_aliases(1)
+    assert (session.alias_maximum, session.aliases, session.announced) == (1, {}, set())
+    assert session.publish_args(TOPIC)[0] == TOPIC
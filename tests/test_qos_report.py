@@ -0,0 +1,45 @@
+import threading
+
+import paho.mqtt.client as mqtt
+import pytest
+
+from fleetsim import qos_report
+from fleetsim.broker import StandInBroker
+
+
+@pytest.fixture(scope="module")
+def broker():
+    return StandInBroker("127.0.0.1", 0).start()
+
+
+@pytest.mark.parametrize("protocol", [mqtt.MQTTv311, mqtt.MQTTv5])
+def test_broker_completes_every_qos_flow(broker, protocol):
+    done = threading.Event()
+    acked = []
+    client = mqtt.Client(client_id=f"broker_test_{protocol}", protocol=protocol)
+    client.on_publish = lambda client, userdata, mid: (acked.append(mid), len(acked) == 3 and done.set())
+    client.connect(broker.host, broker.port, 60)
+    client.loop_start()
+    try:
+        before = dict(broker.received)
+        for qos in (0, 1, 2):
+            client.publish("teltonika/test/from", b"{}", qos=qos)
+        assert done.wait(5)
+    finally:
+        client.disconnect()
+        client.loop_stop()
+    assert [broker.received[qos] - before.get(qos, 0) for qos in (0, 1, 2)] == [1, 1, 1]
+
+
+@pytest.mark.parametrize("qos", [0, 1, 2])
+def test_run_level_reports_acked_throughput_within_the_inflight_window(broker, qos):
+    clients, window = 2, 5
+    result = qos_report.run_level(qos, broker.host, broker.port, clients, 0.3, window)
+    assert result["acked"] > 0
+    assert result["rate"] > 0
+    assert result["retried"] == result["dropped"] == 0
+    # publishing stops once clients * window are in flight, one round of publishes may overshoot
+    assert result["acked"] <= result["sent"] <= result["acked"] + clients * (window + 1)
+    _, count, total = result["latency"]
+    assert count >= result["acked"]
+    assert total > 0
@@ -0,0 +1,75 @@
+import json
+import sys
+
+import pytest
+
+from conftest import load_script
+
+translations = load_script("Translations/translate_language_packs.py")
+
+
+def build(monkeypatch, tmp_path, source, *locales, window=500):
+    path = tmp_path / "en_US.json"
+    path.write_text(json.dumps(source), encoding="utf-8")
+    monkeypatch.setattr(sys, "argv", ["translate_language_packs.py", "--backend", "offline", "--no-memory",
+                                      "--source", str(path), "--output-dir", str(tmp_path / "out"),
+                                      "--window", str(window), "--locales", *locales])
+    translations.main()
+
+
+def read(tmp_path, name):
+    return json.loads((tmp_path / "out" / name).read_text(encoding="utf-8"))
+
+
+@pytest.fixture
+def source():
+    return {f"group{g}": {f"key{i}": f"Text {g} {i}" for i in range(300)} for g in range(10)}
+
+
+def test_inserted_and_reordered_keys_keep_translations_and_manual_fixes(monkeypatch, tmp_path, source, capsys):
+    build(monkeypatch, tmp_path, source, "sv_SE")
+    pack = read(tmp_path, "locale.constant-sv_SE.json")
+    fixes = [(f"group{g}", f"key{i}") for g in range(10) for i in (1, 150, 299)]
+    for group, key in fixes:
+        pack[group][key] = "Manual fix"
+    (tmp_path / "out" / "locale.constant-sv_SE.json").write_text(json.dumps(pack), encoding="utf-8")
+
+    # Three keys inserted at the front, the groups and one group's keys in reverse order
+    reordered = {"new": {"a": "A", "b": "B", "c": "C"}, **dict(reversed(list(source.items())))}
+    reordered["group3"] = dict(reversed(list(reordered["group3"].items())))
+    capsys.readouterr()
+    build(monkeypatch, tmp_path, reordered, "sv_SE")
+
+    assert "3000 keys kept, 3 to translate" in capsys.readouterr().out
+    pack = read(tmp_path, "locale.constant-sv_SE.json")
+    assert list(pack) == list(reordered)
+    assert all(pack[group][key] == "Manual fix" for group, key in fixes)
+    assert pack["new"]["a"] != "A"
+
+
+def test_changed_text_is_retranslated(monkeypatch, tmp_path, source):
+    build(monkeypatch, tmp_path, source, "sv_SE")
+    pack = read(tmp_path, "locale.constant-sv_SE.json")
+    pack["group0"]["key0"] = pack["group0"]["key1"] = "Manual fix"
+    (tmp_path / "out" / "locale.constant-sv_SE.json").write_text(json.dumps(pack), encoding="utf-8")
+
+    source["group0"]["key0"] = "Changed text"
+    build(monkeypatch, tmp_path, source, "sv_SE")
+
+    pack = read(tmp_path, "locale.constant-sv_SE.json")
+    assert pack["group0"]["key0"] not in ("Manual fix", "Changed text")
+    assert pack["group0"]["key1"] == "Manual fix"
+
+
+def test_combined_manifest_keeps_the_locales_not_rebuilt(monkeypatch, tmp_path, source):
+    build(monkeypatch, tmp_path, source, "sv_SE", "fi_FI")
+    manifest = read(tmp_path, "locale.manifest.json")
+    assert list(manifest) == ["sv_SE", "fi_FI"]
+    assert len(manifest["sv_SE"]) == 3000 and "group0.key0" in manifest["sv_SE"]
+
+    source["group0"]["key0"] = "Changed text"
+    build(monkeypatch, tmp_path, source, "sv_SE")
+    rebuilt = read(tmp_path, "locale.manifest.json")
+    assert list(rebuilt) == ["sv_SE", "fi_FI"]
+    assert rebuilt["sv_SE"]["group0.key0"] == translations.value_hash("Changed text")
+    assert rebuilt["fi_FI"] == manifest["fi_FI"]